@@ -0,0 +1,993 @@
+"""
+Memcached clients for asyncio, requires python 3.5 or newer.
+
+:py:class:`.AsyncClient` has the same methods as :py:class:`.Client`, as
+coroutines. Each client keeps a single connection, implemented as an
+``asyncio.Protocol``: requests are written as soon as they are made and
+their replies are parsed incrementally, in order, as data arrives, so any
+number of coroutines can share the connection without waiting for each
+other's replies.
+
+:py:class:`.AsyncPooledClient` and :py:class:`.AsyncHashClient` are the
+counterparts of :py:class:`.PooledClient` and :py:class:`.HashClient`.
+"""
+import asyncio
+import collections
+import logging
+import socket
+import time
+
+import six
+
+from pymemcache.client.base import (
+    Client,
+    STAT_TYPES,
+    _ReplyParser,
+    _check_key,
+    _parse_delete_result,
+    _parse_incr_result,
+    _parse_store_result,
+)
+from pymemcache.client.rendezvous import RendezvousHash
+from pymemcache.exceptions import (
+    MemcacheError,
+    MemcacheUnexpectedCloseError,
+    MemcacheUnknownError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _StatsParser(object):
+    """Incremental parser for the response to a "stats" command."""
+
+    def __init__(self, client):
+        self.client = client
+        self.result = {}
+        self.done = False
+        self.wanted = 0
+
+    def feed(self, buf):
+        while not self.done:
+            index = buf.find(b'\r\n')
+            if index == -1:
+                return buf
+            line = buf[:index]
+            buf = buf[index + 2:]
+
+            self.client._raise_errors(line, b'stats')
+            if line == b'END':
+                self.done = True
+            elif line.startswith(b'STAT'):
+                key_value = line.split()
+                self.result[key_value[1]] = key_value[2]
+            elif line.startswith(b'ITEM'):
+                # For 'stats cachedump' commands
+                key_value = line.split()
+                self.result[key_value[1]] = b' '.join(key_value[2:])
+            else:
+                raise MemcacheUnknownError(line[:32])
+        return buf
+
+
+class _MemcacheProtocol(asyncio.Protocol):
+    """
+    The connection of an :py:class:`.AsyncClient`.
+
+    Every request that expects a reply queues its parser, replies are fed
+    to the parser at the head of the queue. A reply that fails to parse
+    leaves the connection out of sync, so the connection is closed and
+    every queued request fails, as the blocking client closes its socket
+    on any error.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.closed = False
+        self._pending = collections.deque()
+        self._chunks = []
+        self._received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self._fail_pending(MemcacheUnexpectedCloseError())
+
+    def send(self, cmd, parser):
+        """
+        Writes cmd and returns a future of parser's result, or of None when
+        no reply is expected.
+        """
+        if self.closed:
+            raise MemcacheUnexpectedCloseError()
+
+        future = asyncio.get_event_loop().create_future()
+        self.transport.write(cmd)
+        if parser is None:
+            future.set_result(None)
+        elif parser.done:
+            future.set_result(parser.result)
+        else:
+            self._pending.append((parser, future))
+        return future
+
+    def data_received(self, data):
+        # Like multiplex.Request.read, only hand the data to the parser once
+        # it can make progress.
+        self._chunks.append(data)
+        self._received += len(data)
+
+        while self._pending:
+            parser, future = self._pending[0]
+            if self._received < parser.wanted:
+                return
+
+            try:
+                buf = parser.feed(b''.join(self._chunks))
+            except Exception as e:
+                self._pending.popleft()
+                if not future.done():
+                    future.set_exception(e)
+                self.abort()
+                return
+
+            self._chunks = [buf]
+            self._received = len(buf)
+            if not parser.done:
+                return
+
+            self._pending.popleft()
+            # the caller may have been cancelled, the reply still had to be
+            # consumed to keep the connection in sync
+            if not future.done():
+                future.set_result(parser.result)
+
+        if self._received:
+            self.abort()
+
+    def abort(self):
+        self.closed = True
+        self._fail_pending(MemcacheUnexpectedCloseError())
+        if self.transport is not None:
+            self.transport.close()
+
+    def _fail_pending(self, error):
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+
+class AsyncClient(object):
+    """
+    An asyncio memcached client.
+
+    The arguments are interpreted as for :py:class:`.Client`, except that
+    ``socket_module`` isn't supported. The connection is opened by the first
+    request, and again by the next request after it was closed by an error.
+    ``timeout`` applies to every request as a whole; when it expires the
+    connection is closed and ``socket.timeout`` is raised.
+    """
+
+    def __init__(self,
+                 server,
+                 serializer=None,
+                 deserializer=None,
+                 connect_timeout=None,
+                 timeout=None,
+                 no_delay=False,
+                 ignore_exc=False,
+                 key_prefix=b'',
+                 default_noreply=True,
+                 allow_unicode_keys=False):
+        self.server = server
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.no_delay = no_delay
+        self.ignore_exc = ignore_exc
+        self.default_noreply = default_noreply
+        # Builds the commands and parses the replies, it never connects.
+        self._commands = Client(server,
+                                serializer=serializer,
+                                deserializer=deserializer,
+                                key_prefix=key_prefix,
+                                default_noreply=default_noreply,
+                                allow_unicode_keys=allow_unicode_keys)
+        self.key_prefix = self._commands.key_prefix
+        self._protocol = None
+        self._connecting = None
+
+    def check_key(self, key):
+        """Checks key and add key_prefix."""
+        return self._commands.check_key(key)
+
+    async def _connect(self):
+        loop = asyncio.get_event_loop()
+        host, port = self.server
+        transport, protocol = await asyncio.wait_for(
+            loop.create_connection(_MemcacheProtocol, host, port),
+            self.connect_timeout
+        )
+        if self.no_delay:
+            sock = transport.get_extra_info('socket')
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._protocol = protocol
+        return protocol
+
+    async def _get_protocol(self):
+        if self._protocol is not None and not self._protocol.closed:
+            return self._protocol
+
+        # concurrent requests share a single connection attempt
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._connect())
+        connecting = self._connecting
+        try:
+            return await asyncio.shield(connecting)
+        finally:
+            if connecting.done() and self._connecting is connecting:
+                self._connecting = None
+
+    def close(self):
+        """Close the connection to memcached, if it is open."""
+        if self._protocol is not None:
+            self._protocol.abort()
+        self._protocol = None
+
+    async def _request(self, cmd, parser):
+        protocol = await self._get_protocol()
+        future = protocol.send(cmd, parser)
+        if self.timeout is None:
+            return await future
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # the reply may still come, we can't tell it from the next one
+            if protocol is self._protocol:
+                self.close()
+            raise socket.timeout('timed out')
+
+    async def _reply(self, cmd, name, convert):
+        parser = _ReplyParser(self._commands, name, [name], convert)
+        result = await self._request(cmd, parser)
+        return result[name]
+
+    async def _fetch(self, name, keys, expect_cas):
+        cmd, parser = self._commands._prepare_fetch(name, keys, expect_cas)
+        try:
+            return await self._request(cmd, parser)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if self.ignore_exc:
+                return {}
+            raise
+
+    async def _store_cmd(self, name, key, expire, noreply, data, cas=None):
+        checked_key = self.check_key(key)
+        cmd = self._commands._build_store_cmd(name, checked_key, expire,
+                                              noreply, data, cas)
+        if noreply:
+            await self._request(cmd, None)
+            return True
+        return await self._reply(
+            cmd, name, lambda line: _parse_store_result(line, name)
+        )
+
+    async def set(self, key, value, expire=0, noreply=None):
+        """The memcached "set" command, see :py:meth:`.Client.set`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        return await self._store_cmd(b'set', key, expire, noreply, value)
+
+    async def set_many(self, values, expire=0, noreply=None):
+        """
+        Sets multiple values, the commands are all sent before any of the
+        replies are read. See :py:meth:`.Client.set_many`.
+        """
+        if not values:
+            return True
+        cmd, parser = self._commands._prepare_set_many(values, expire,
+                                                       noreply)
+        return await self._request(cmd, parser)
+
+    set_multi = set_many
+
+    async def add(self, key, value, expire=0, noreply=None):
+        """The memcached "add" command, see :py:meth:`.Client.add`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        return await self._store_cmd(b'add', key, expire, noreply, value)
+
+    async def replace(self, key, value, expire=0, noreply=None):
+        """The memcached "replace" command, see :py:meth:`.Client.replace`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        return await self._store_cmd(b'replace', key, expire, noreply, value)
+
+    async def append(self, key, value, expire=0, noreply=None):
+        """The memcached "append" command, see :py:meth:`.Client.append`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        return await self._store_cmd(b'append', key, expire, noreply, value)
+
+    async def prepend(self, key, value, expire=0, noreply=None):
+        """The memcached "prepend" command, see :py:meth:`.Client.prepend`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        return await self._store_cmd(b'prepend', key, expire, noreply, value)
+
+    async def cas(self, key, value, cas, expire=0, noreply=False):
+        """The memcached "cas" command, see :py:meth:`.Client.cas`."""
+        return await self._store_cmd(b'cas', key, expire, noreply, value, cas)
+
+    async def get(self, key, default=None):
+        """The memcached "get" command, see :py:meth:`.Client.get`."""
+        result = await self._fetch(b'get', [key], False)
+        return result.get(key, default)
+
+    async def get_many(self, keys):
+        """The memcached "get" command, see :py:meth:`.Client.get_many`."""
+        if not keys:
+            return {}
+        return await self._fetch(b'get', keys, False)
+
+    get_multi = get_many
+
+    async def gets(self, key, default=None, cas_default=None):
+        """The memcached "gets" command, see :py:meth:`.Client.gets`."""
+        result = await self._fetch(b'gets', [key], True)
+        return result.get(key, (default, cas_default))
+
+    async def gets_many(self, keys):
+        """The memcached "gets" command, see :py:meth:`.Client.gets_many`."""
+        if not keys:
+            return {}
+        return await self._fetch(b'gets', keys, True)
+
+    async def delete(self, key, noreply=None):
+        """The memcached "delete" command, see :py:meth:`.Client.delete`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        cmd = b'delete ' + self.check_key(key)
+        if noreply:
+            await self._request(cmd + b' noreply\r\n', None)
+            return True
+        return await self._reply(cmd + b'\r\n', b'delete',
+                                 _parse_delete_result)
+
+    async def delete_many(self, keys, noreply=None):
+        """
+        Deletes multiple keys, the commands are all sent before any of the
+        replies are read. See :py:meth:`.Client.delete_many`.
+        """
+        if not keys:
+            return True
+        cmd, parser = self._commands._prepare_delete_many(keys, noreply)
+        await self._request(cmd, parser)
+        return True
+
+    delete_multi = delete_many
+
+    async def _incr_cmd(self, name, key, value, noreply):
+        cmd = (name + b' ' + self.check_key(key) + b' ' +
+               six.text_type(value).encode('ascii'))
+        if noreply:
+            await self._request(cmd + b' noreply\r\n', None)
+            return None
+        return await self._reply(cmd + b'\r\n', name, _parse_incr_result)
+
+    async def incr(self, key, value, noreply=False):
+        """The memcached "incr" command, see :py:meth:`.Client.incr`."""
+        return await self._incr_cmd(b'incr', key, value, noreply)
+
+    async def decr(self, key, value, noreply=False):
+        """The memcached "decr" command, see :py:meth:`.Client.decr`."""
+        return await self._incr_cmd(b'decr', key, value, noreply)
+
+    async def touch(self, key, expire=0, noreply=None):
+        """The memcached "touch" command, see :py:meth:`.Client.touch`."""
+        if noreply is None:
+            noreply = self.default_noreply
+        cmd = (b'touch ' + self.check_key(key) + b' ' +
+               six.text_type(expire).encode('ascii'))
+        if noreply:
+            await self._request(cmd + b' noreply\r\n', None)
+            return True
+        return await self._reply(cmd + b'\r\n', b'touch',
+                                 lambda line: line == b'TOUCHED')
+
+    async def touch_many(self, keys, expire=0, noreply=None):
+        """
+        Touches multiple keys, the commands are all sent before any of the
+        replies are read. See :py:meth:`.Client.touch_many`.
+        """
+        if not keys:
+            return {}
+        cmd, parser = self._commands._prepare_touch_many(keys, expire,
+                                                         noreply)
+        return await self._request(cmd, parser)
+
+    async def incr_many(self, values, noreply=False):
+        """
+        Increments multiple keys, the commands are all sent before any of the
+        replies are read. See :py:meth:`.Client.incr_many`.
+        """
+        if not values:
+            return {}
+        cmd, parser = self._commands._prepare_incr_many(values, noreply)
+        return await self._request(cmd, parser)
+
+    async def stats(self, *args):
+        """The memcached "stats" command, see :py:meth:`.Client.stats`."""
+        cmd = b' '.join([b'stats'] + [self.check_key(arg) for arg in args])
+        result = await self._request(cmd + b'\r\n',
+                                     _StatsParser(self._commands))
+
+        for key, value in six.iteritems(result):
+            converter = STAT_TYPES.get(key, int)
+            try:
+                result[key] = converter(value)
+            except Exception:
+                pass
+
+        return result
+
+    async def version(self):
+        """The memcached "version" command."""
+        result = await self._reply(b'version\r\n', b'version',
+                                   lambda line: line)
+        if not result.startswith(b'VERSION '):
+            raise MemcacheUnknownError(
+                "Received unexpected response: %s" % (result, ))
+        return result[8:]
+
+    async def flush_all(self, delay=0, noreply=None):
+        """The memcached "flush_all" command."""
+        if noreply is None:
+            noreply = self.default_noreply
+        cmd = b'flush_all ' + six.text_type(delay).encode('ascii')
+        if noreply:
+            await self._request(cmd + b' noreply\r\n', None)
+            return True
+        return await self._reply(cmd + b'\r\n', b'flush_all',
+                                 lambda line: line == b'OK')
+
+    async def quit(self):
+        """The memcached "quit" command, closes the connection."""
+        await self._request(b'quit\r\n', None)
+        self.close()
+
+
+class AsyncPooledClient(object):
+    """
+    A bounded pool of :py:class:`.AsyncClient` connections.
+
+    Every request checks out a connection of its own, the clients that fail
+    are closed and replaced. Once ``max_pool_size`` connections are in use
+    requests wait for one to be released, or raise a RuntimeError after
+    ``acquire_timeout`` seconds when it is set.
+
+    Further arguments are interpreted as for :py:class:`.AsyncClient`.
+    """
+
+    def __init__(self,
+                 server,
+                 serializer=None,
+                 deserializer=None,
+                 connect_timeout=None,
+                 timeout=None,
+                 no_delay=False,
+                 ignore_exc=False,
+                 key_prefix=b'',
+                 max_pool_size=None,
+                 acquire_timeout=None,
+                 default_noreply=True,
+                 allow_unicode_keys=False):
+        self.server = server
+        self.ignore_exc = ignore_exc
+        self.max_pool_size = max_pool_size or 2 ** 31
+        self.acquire_timeout = acquire_timeout
+        self._client_kwargs = {
+            'serializer': serializer,
+            'deserializer': deserializer,
+            'connect_timeout': connect_timeout,
+            'timeout': timeout,
+            'no_delay': no_delay,
+            # We need to know when it fails *always* so that we
+            # can remove/destroy it from the pool...
+            'ignore_exc': False,
+            'key_prefix': key_prefix,
+            'default_noreply': default_noreply,
+            'allow_unicode_keys': allow_unicode_keys,
+        }
+        # Checks the keys, it never connects.
+        self._commands = Client(server, key_prefix=key_prefix,
+                                allow_unicode_keys=allow_unicode_keys)
+        self._free = collections.deque()
+        self._used = set()
+        self._available = None
+
+    def check_key(self, key):
+        """Checks key and add key_prefix."""
+        return self._commands.check_key(key)
+
+    def _new_client(self):
+        return AsyncClient(self.server, **self._client_kwargs)
+
+    def close(self):
+        for client in list(self._free) + list(self._used):
+            client.close()
+        self._free.clear()
+        self._used.clear()
+
+    async def _acquire(self):
+        if self._available is None:
+            # created here to bind it to the running loop
+            self._available = asyncio.Condition()
+
+        async with self._available:
+            await asyncio.wait_for(
+                self._available.wait_for(self._can_acquire),
+                self.acquire_timeout
+            )
+            if self._free:
+                client = self._free.pop()
+            else:
+                client = self._new_client()
+            self._used.add(client)
+            return client
+
+    def _can_acquire(self):
+        return bool(self._free) or len(self._used) < self.max_pool_size
+
+    async def _release(self, client, failed):
+        self._used.discard(client)
+        if failed:
+            client.close()
+        else:
+            self._free.append(client)
+        async with self._available:
+            self._available.notify()
+
+    async def _call(self, name, *args, **kwargs):
+        try:
+            client = await self._acquire()
+        except asyncio.TimeoutError:
+            raise RuntimeError('Too many objects, %s >= %s'
+                               % (len(self._used), self.max_pool_size))
+
+        failed = True
+        try:
+            result = await getattr(client, name)(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            await self._release(client, failed)
+
+    async def _fetch(self, name, default, *args):
+        try:
+            return await self._call(name, *args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if self.ignore_exc:
+                return default
+            raise
+
+    async def set(self, key, value, expire=0, noreply=None):
+        return await self._call('set', key, value, expire, noreply)
+
+    async def set_many(self, values, expire=0, noreply=None):
+        return await self._call('set_many', values, expire, noreply)
+
+    set_multi = set_many
+
+    async def replace(self, key, value, expire=0, noreply=None):
+        return await self._call('replace', key, value, expire, noreply)
+
+    async def append(self, key, value, expire=0, noreply=None):
+        return await self._call('append', key, value, expire, noreply)
+
+    async def prepend(self, key, value, expire=0, noreply=None):
+        return await self._call('prepend', key, value, expire, noreply)
+
+    async def cas(self, key, value, cas, expire=0, noreply=False):
+        return await self._call('cas', key, value, cas, expire, noreply)
+
+    async def get(self, key, default=None):
+        return await self._fetch('get', default, key, default)
+
+    async def get_many(self, keys):
+        return await self._fetch('get_many', {}, keys)
+
+    get_multi = get_many
+
+    async def gets(self, key):
+        return await self._fetch('gets', (None, None), key)
+
+    async def gets_many(self, keys):
+        return await self._fetch('gets_many', {}, keys)
+
+    async def delete(self, key, noreply=None):
+        return await self._call('delete', key, noreply)
+
+    async def delete_many(self, keys, noreply=None):
+        return await self._call('delete_many', keys, noreply)
+
+    delete_multi = delete_many
+
+    async def add(self, key, value, expire=0, noreply=None):
+        return await self._call('add', key, value, expire, noreply)
+
+    async def incr(self, key, value, noreply=False):
+        return await self._call('incr', key, value, noreply)
+
+    async def decr(self, key, value, noreply=False):
+        return await self._call('decr', key, value, noreply)
+
+    async def touch(self, key, expire=0, noreply=None):
+        return await self._call('touch', key, expire, noreply)
+
+    async def touch_many(self, keys, expire=0, noreply=None):
+        return await self._call('touch_many', keys, expire, noreply)
+
+    async def incr_many(self, values, noreply=False):
+        return await self._call('incr_many', values, noreply)
+
+    async def stats(self, *args):
+        return await self._call('stats', *args)
+
+    async def version(self):
+        return await self._call('version')
+
+    async def flush_all(self, delay=0, noreply=None):
+        return await self._call('flush_all', delay, noreply)
+
+
+class AsyncHashClient(object):
+    """
+    An asyncio client for a cluster of memcached servers.
+
+    Keys are routed with the same hashers as :py:class:`.HashClient`, and
+    servers that fail are retried and marked dead in the same way, through
+    ``retry_attempts``, ``retry_timeout`` and ``dead_timeout``. The per
+    server batches of the multi-key commands are sent concurrently with
+    ``asyncio.gather``.
+
+    The arguments are interpreted as for :py:class:`.HashClient`, with
+    :py:class:`.AsyncPooledClient` used when ``use_pooling`` is set and
+    :py:class:`.AsyncClient` otherwise.
+    """
+
+    def __init__(
+        self,
+        servers,
+        hasher=RendezvousHash,
+        serializer=None,
+        deserializer=None,
+        connect_timeout=None,
+        timeout=None,
+        no_delay=False,
+        key_prefix=b'',
+        max_pool_size=None,
+        retry_attempts=2,
+        retry_timeout=1,
+        dead_timeout=60,
+        use_pooling=False,
+        ignore_exc=False,
+        allow_unicode_keys=False
+    ):
+        self.clients = {}
+        self.retry_attempts = retry_attempts
+        self.retry_timeout = retry_timeout
+        self.dead_timeout = dead_timeout
+        self.use_pooling = use_pooling
+        self.key_prefix = key_prefix
+        self.ignore_exc = ignore_exc
+        self.allow_unicode_keys = allow_unicode_keys
+        self._failed_clients = {}
+        self._dead_clients = {}
+        self._server_weights = {}
+        self._last_dead_check_time = time.time()
+
+        self.hasher = hasher()
+
+        self.default_kwargs = {
+            'connect_timeout': connect_timeout,
+            'timeout': timeout,
+            'no_delay': no_delay,
+            'key_prefix': key_prefix,
+            'serializer': serializer,
+            'deserializer': deserializer,
+            'allow_unicode_keys': allow_unicode_keys,
+        }
+
+        if use_pooling is True:
+            self.default_kwargs['max_pool_size'] = max_pool_size
+
+        for server in servers:
+            self.add_server(*server)
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+    def add_server(self, server, port, weight=None):
+        key = '%s:%s' % (server, port)
+
+        if weight is None:
+            weight = self._server_weights.get((server, port), 1)
+        self._server_weights[(server, port)] = weight
+
+        if self.use_pooling:
+            client = AsyncPooledClient((server, port), **self.default_kwargs)
+        else:
+            client = AsyncClient((server, port), **self.default_kwargs)
+
+        self.clients[key] = client
+        if weight == 1:
+            self.hasher.add_node(key)
+        else:
+            self.hasher.add_node(key, weight)
+
+    def remove_server(self, server, port):
+        dead_time = time.time()
+        self._failed_clients.pop((server, port), None)
+        if (server, port) in self._dead_clients:
+            # another coroutine failing on it already removed it
+            return
+        self._dead_clients[(server, port)] = dead_time
+        key = '%s:%s' % (server, port)
+        self.hasher.remove_node(key)
+
+    def _get_client(self, key):
+        if len(self._dead_clients) > 0:
+            current_time = time.time()
+            ldc = self._last_dead_check_time
+            # we have dead clients and we have reached the
+            # timeout retry
+            if current_time - ldc > self.dead_timeout:
+                for server, dead_time in list(self._dead_clients.items()):
+                    if current_time - dead_time > self.dead_timeout:
+                        logger.debug(
+                            'bringing server back into rotation %s',
+                            server
+                        )
+                        self._dead_clients.pop(server)
+                        self.add_server(*server)
+                        self._last_dead_check_time = current_time
+
+        _check_key(key, self.allow_unicode_keys, self.key_prefix)
+        server = self.hasher.get_node(key)
+        # We've ran out of servers to try
+        if server is None:
+            if self.ignore_exc is True:
+                return
+            raise MemcacheError('All servers seem to be down right now')
+
+        return self.clients[server]
+
+    async def _safely_run_func(self, client, func, default_val, *args,
+                               **kwargs):
+        try:
+            if not self._should_try_server(client.server):
+                return default_val
+
+            result = await func(*args, **kwargs)
+            # we were successful, lets remove it from the failed clients
+            self._failed_clients.pop(client.server, None)
+            return result
+
+        # Connecting to the server fail, we should enter
+        # retry mode
+        except socket.error:
+            self._mark_failed_server(client.server)
+
+            # if we haven't enabled ignore_exc, don't move on gracefully, just
+            # raise the exception
+            if not self.ignore_exc:
+                raise
+
+            return default_val
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # any exceptions that aren't socket.error we need to handle
+            # gracefully as well
+            if not self.ignore_exc:
+                raise
+
+            return default_val
+
+    def _should_try_server(self, server):
+        if server in self._failed_clients:
+            # This server is currently failing, lets check if it is in
+            # retry or marked as dead
+            failed_metadata = self._failed_clients[server]
+
+            # we haven't tried our max amount yet, if it has been enough
+            # time lets just retry using it
+            if failed_metadata['attempts'] < self.retry_attempts:
+                failed_time = failed_metadata['failed_time']
+                if time.time() - failed_time > self.retry_timeout:
+                    logger.debug('retrying failed server: %s', server)
+                    return True
+                return False
+            else:
+                # We've reached our max retry attempts, we need to mark
+                # the sever as dead
+                logger.debug('marking server as dead: %s', server)
+                self.remove_server(*server)
+
+        return True
+
+    def _mark_failed_server(self, server):
+        # This client has never failed, lets mark it for failure
+        if server not in self._failed_clients:
+            self._failed_clients[server] = {
+                'failed_time': time.time(),
+                'attempts': 0,
+            }
+            # We aren't allowing any retries, we should mark the server as
+            # dead immediately
+            if self.retry_attempts <= 0:
+                logger.debug("marking server as dead %s", server)
+                self.remove_server(*server)
+        # This client has failed previously, we need to update the metadata
+        # to reflect that we have attempted it again
+        else:
+            failed_metadata = self._failed_clients[server]
+            failed_metadata['attempts'] += 1
+            failed_metadata['failed_time'] = time.time()
+
+    async def _run_cmd(self, cmd, key, default_val, *args, **kwargs):
+        client = self._get_client(key)
+
+        if client is None:
+            return default_val
+
+        return await self._safely_run_func(
+            client, getattr(client, cmd), default_val, key, *args, **kwargs
+        )
+
+    def _group_keys(self, keys):
+        client_batches = {}
+        missing = []
+
+        for key in keys:
+            client = self._get_client(key)
+
+            if client is None:
+                missing.append(key)
+                continue
+
+            if client.server not in client_batches:
+                client_batches[client.server] = []
+
+            client_batches[client.server].append(key)
+
+        return client_batches, missing
+
+    async def _run_grouped(self, cmd, client_batches, default_val, args,
+                           kwargs):
+        calls = []
+        for server, keys in client_batches.items():
+            client = self.clients['%s:%s' % server]
+            calls.append(self._safely_run_func(
+                client, getattr(client, cmd), default_val, keys,
+                *args, **kwargs
+            ))
+
+        return await asyncio.gather(*calls)
+
+    async def set(self, key, *args, **kwargs):
+        return await self._run_cmd('set', key, False, *args, **kwargs)
+
+    async def get(self, key, *args, **kwargs):
+        return await self._run_cmd('get', key, None, *args, **kwargs)
+
+    async def incr(self, key, *args, **kwargs):
+        return await self._run_cmd('incr', key, False, *args, **kwargs)
+
+    async def decr(self, key, *args, **kwargs):
+        return await self._run_cmd('decr', key, False, *args, **kwargs)
+
+    async def set_many(self, values, *args, **kwargs):
+        client_batches, missing = self._group_keys(values)
+        end = [False for _ in missing]
+
+        for server, keys in client_batches.items():
+            client_batches[server] = dict((key, values[key]) for key in keys)
+
+        end.extend(await self._run_grouped('set_many', client_batches, False,
+                                           args, kwargs))
+        return all(end)
+
+    set_multi = set_many
+
+    async def get_many(self, keys, gets=False, *args, **kwargs):
+        client_batches, missing = self._group_keys(keys)
+        end = dict((key, False) for key in missing)
+
+        if gets:
+            get_cmd = 'gets_many'
+        else:
+            get_cmd = 'get_many'
+
+        for result in await self._run_grouped(get_cmd, client_batches, {},
+                                              args, kwargs):
+            end.update(result)
+
+        return end
+
+    get_multi = get_many
+
+    async def gets(self, key, *args, **kwargs):
+        return await self._run_cmd('gets', key, None, *args, **kwargs)
+
+    async def gets_many(self, keys, *args, **kwargs):
+        return await self.get_many(keys, True, *args, **kwargs)
+
+    gets_multi = gets_many
+
+    async def add(self, key, *args, **kwargs):
+        return await self._run_cmd('add', key, False, *args, **kwargs)
+
+    async def prepend(self, key, *args, **kwargs):
+        return await self._run_cmd('prepend', key, False, *args, **kwargs)
+
+    async def append(self, key, *args, **kwargs):
+        return await self._run_cmd('append', key, False, *args, **kwargs)
+
+    async def delete(self, key, *args, **kwargs):
+        return await self._run_cmd('delete', key, False, *args, **kwargs)
+
+    async def delete_many(self, keys, *args, **kwargs):
+        client_batches, _ = self._group_keys(keys)
+        await self._run_grouped('delete_many', client_batches, False, args,
+                                kwargs)
+        return True
+
+    delete_multi = delete_many
+
+    async def touch(self, key, *args, **kwargs):
+        return await self._run_cmd('touch', key, False, *args, **kwargs)
+
+    async def touch_many(self, keys, *args, **kwargs):
+        client_batches, missing = self._group_keys(keys)
+        end = dict((key, False) for key in keys)
+
+        for result in await self._run_grouped('touch_many', client_batches,
+                                              {}, args, kwargs):
+            end.update(result)
+
+        return end
+
+    async def incr_many(self, values, *args, **kwargs):
+        client_batches, missing = self._group_keys(values)
+        end = dict((key, False) for key in values)
+
+        for server, keys in client_batches.items():
+            client_batches[server] = dict((key, values[key]) for key in keys)
+
+        for result in await self._run_grouped('incr_many', client_batches,
+                                              {}, args, kwargs):
+            end.update(result)
+
+        return end
+
+    async def cas(self, key, *args, **kwargs):
+        return await self._run_cmd('cas', key, False, *args, **kwargs)
+
+    async def replace(self, key, *args, **kwargs):
+        return await self._run_cmd('replace', key, False, *args, **kwargs)
+
+    async def flush_all(self):
+        await asyncio.gather(*[
+            self._safely_run_func(client, client.flush_all, False)
+            for client in self.clients.values()
+        ])
@@ -12,10 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import errno
+import logging
 import socket
 import six
 
-from pymemcache import pool
+from pymemcache import fork, pool
+from pymemcache.client.read_through import _MISSING, ReadThroughMixin
+from pymemcache.client.single_flight import SingleFlight
+from pymemcache.executor import CommandExecutor, FuturesMixin
+from pymemcache.serde import ABSENT
 
 from pymemcache.exceptions import (
     MemcacheClientError,
@@ -26,8 +31,10 @@ from pymemcache.exceptions import (
     MemcacheUnexpectedCloseError
 )
 
+logger = logging.getLogger(__name__)
 
 RECV_SIZE = 4096
+
 VALID_STORE_RESULTS = {
     b'set':     (b'STORED',),
     b'add':     (b'STORED', b'NOT_STORED'),
@@ -116,7 +123,7 @@ def _check_key(key, allow_unicode_keys, key_prefix=b''):
     return key
 
 
-class Client(object):
+class Client(ReadThroughMixin):
     """
     A client for a single memcached server.
 
@@ -226,7 +233,9 @@ class Client(object):
 
         Notes:
           The constructor does not make a connection to memcached. The first
-          call to a method on the object will do that.
+          call to a method on the object will do that. A connection opened
+          before the process forks is dropped in the child, which opens its
+          own.
         """
         self.server = server
         self.serializer = serializer
@@ -244,12 +253,23 @@ class Client(object):
         self.key_prefix = key_prefix
         self.default_noreply = default_noreply
         self.allow_unicode_keys = allow_unicode_keys
+        fork.register(self)
 
     def check_key(self, key):
         """Checks key and add key_prefix."""
         return _check_key(key, allow_unicode_keys=self.allow_unicode_keys,
                           key_prefix=self.key_prefix)
 
+    def _ensure_connected(self):
+        fork.check(self)
+        if not self.sock:
+            self._connect()
+
+    def _after_fork(self):
+        # The parent still uses the socket, closing our copy of it doesn't
+        # affect the connection.
+        self.close()
+
     def _connect(self):
         sock = self.socket_module.socket(self.socket_module.AF_INET,
                                          self.socket_module.SOCK_STREAM)
@@ -529,14 +549,8 @@ class Client(object):
         if not keys:
             return True
 
-        if noreply is None:
-            noreply = self.default_noreply
-
-        # TODO: make this more performant by sending all keys first, then
-        # waiting for all values.
-        for key in keys:
-            self.delete(key, noreply)
-
+        cmd, parser = self._prepare_delete_many(keys, noreply)
+        self._pipelined_cmd(cmd, parser)
         return True
 
     delete_multi = delete_many
@@ -618,6 +632,50 @@ class Client(object):
             return True
         return result == b'TOUCHED'
 
+    def touch_many(self, keys, expire=0, noreply=None):
+        """
+        A convenience function to touch multiple keys, the commands are all
+        sent before any of the replies are read.
+
+        Args:
+          keys: list(str), see class docs for details.
+          expire: optional int, number of seconds until the items are expired
+                  from the cache, or zero for no expiry (the default).
+          noreply: optional bool, True to not wait for the reply (defaults to
+                   self.default_noreply).
+
+        Returns:
+          A dict in which the keys are elements of the "keys" argument list
+          and the values are True if the expiration time was updated and
+          False if the key wasn't found (always True if noreply is True).
+        """
+        if not keys:
+            return {}
+
+        cmd, parser = self._prepare_touch_many(keys, expire, noreply)
+        return self._pipelined_cmd(cmd, parser)
+
+    def incr_many(self, values, noreply=False):
+        """
+        A convenience function to increment multiple keys, the commands are
+        all sent before any of the replies are read.
+
+        Args:
+          values: dict(str, int), a dict of keys and the amount by which to
+                  increment each of them.
+          noreply: optional bool, False to wait for the reply (the default).
+
+        Returns:
+          A dict in which the keys are the keys of the "values" argument and
+          the values are the new values of the keys, or None if the key
+          wasn't found (always None if noreply is True).
+        """
+        if not values:
+            return {}
+
+        cmd, parser = self._prepare_incr_many(values, noreply)
+        return self._pipelined_cmd(cmd, parser)
+
     def stats(self, *args):
         """
         The memcached "stats" command.
@@ -719,8 +777,7 @@ class Client(object):
             cmd = name + b' ' + b' '.join(checked_keys) + b'\r\n'
 
         try:
-            if not self.sock:
-                self._connect()
+            self._ensure_connected()
 
             self.sock.sendall(cmd)
 
@@ -768,11 +825,32 @@ class Client(object):
 
     def _store_cmd(self, name, key, expire, noreply, data, cas=None):
         key = self.check_key(key)
-        if not self.sock:
-            self._connect()
+        self._ensure_connected()
+
+        cmd = self._build_store_cmd(name, key, expire, noreply, data, cas)
+
+        try:
+            self.sock.sendall(cmd)
+
+            if noreply:
+                return True
+
+            buf = b''
+            buf, line = _readline(self.sock, buf)
+            self._raise_errors(line, name)
+            return _parse_store_result(line, name)
+        except Exception:
+            self.close()
+            raise
 
+    def _build_store_cmd(self, name, key, expire, noreply, data, cas=None):
         if self.serializer:
             data, flags = self.serializer(key, data)
+        elif data is ABSENT:
+            # it would be stored as the bytes of its repr
+            raise MemcacheIllegalInputError(
+                'Storing ABSENT requires a serializer, see pymemcache.serde'
+            )
         else:
             flags = 0
 
@@ -793,35 +871,82 @@ class Client(object):
                b' ' + six.text_type(expire).encode('ascii') +
                b' ' + six.text_type(len(data)).encode('ascii') + extra +
                b'\r\n' + data + b'\r\n')
+        return cmd
 
-        try:
-            self.sock.sendall(cmd)
+    def _prepare_get_many(self, keys):
+        return self._prepare_fetch(b'get', keys, False)
+
+    def _prepare_gets_many(self, keys):
+        return self._prepare_fetch(b'gets', keys, True)
 
+    def _prepare_fetch(self, name, keys, expect_cas):
+        checked_keys = dict((self.check_key(k), k) for k in keys)
+        cmd = name + b' ' + b' '.join(checked_keys) + b'\r\n'
+        return cmd, _FetchParser(self, name, checked_keys, expect_cas)
+
+    def _prepare_set_many(self, values, expire=0, noreply=None):
+        if noreply is None:
+            noreply = self.default_noreply
+        cmds = []
+        for key, value in six.iteritems(values):
+            checked_key = self.check_key(key)
+            cmds.append(self._build_store_cmd(b'set', checked_key, expire,
+                                              noreply, value))
+        keys = [] if noreply else list(values)
+        parser = _ReplyParser(self, b'set', keys,
+                              lambda line: _parse_store_result(line, b'set'),
+                              result=True)
+        return b''.join(cmds), parser
+
+    def _prepare_delete_many(self, keys, noreply=None):
+        if noreply is None:
+            noreply = self.default_noreply
+        cmds = []
+        for key in keys:
+            cmd = b'delete ' + self.check_key(key)
             if noreply:
-                return True
+                cmd += b' noreply'
+            cmds.append(cmd + b'\r\n')
+        parser = _ReplyParser(self, b'delete', [] if noreply else keys,
+                              _parse_delete_result, result=True)
+        return b''.join(cmds), parser
 
-            buf = b''
-            buf, line = _readline(self.sock, buf)
-            self._raise_errors(line, name)
+    def _prepare_touch_many(self, keys, expire=0, noreply=None):
+        if noreply is None:
+            noreply = self.default_noreply
+        cmds = []
+        for key in keys:
+            cmd = (b'touch ' + self.check_key(key) + b' ' +
+                   six.text_type(expire).encode('ascii'))
+            if noreply:
+                cmd += b' noreply'
+            cmds.append(cmd + b'\r\n')
+        if noreply:
+            parser = _ReplyParser(self, b'touch', [], None,
+                                  result=dict((key, True) for key in keys))
+        else:
+            parser = _ReplyParser(self, b'touch', keys,
+                                  lambda line: line == b'TOUCHED')
+        return b''.join(cmds), parser
 
-            if line in VALID_STORE_RESULTS[name]:
-                if line == b'STORED':
-                    return True
-                if line == b'NOT_STORED':
-                    return False
-                if line == b'NOT_FOUND':
-                    return None
-                if line == b'EXISTS':
-                    return False
-            else:
-                raise MemcacheUnknownError(line[:32])
-        except Exception:
-            self.close()
-            raise
+    def _prepare_incr_many(self, values, noreply=False):
+        cmds = []
+        for key, value in six.iteritems(values):
+            cmd = (b'incr ' + self.check_key(key) + b' ' +
+                   six.text_type(value).encode('ascii'))
+            if noreply:
+                cmd += b' noreply'
+            cmds.append(cmd + b'\r\n')
+        if noreply:
+            parser = _ReplyParser(self, b'incr', [], None,
+                                  result=dict((key, None) for key in values))
+        else:
+            parser = _ReplyParser(self, b'incr', list(values),
+                                  _parse_incr_result)
+        return b''.join(cmds), parser
 
     def _misc_cmd(self, cmd, cmd_name, noreply):
-        if not self.sock:
-            self._connect()
+        self._ensure_connected()
 
         try:
             self.sock.sendall(cmd)
@@ -837,6 +962,24 @@ class Client(object):
             self.close()
             raise
 
+    def _pipelined_cmd(self, cmd, parser):
+        self._ensure_connected()
+
+        try:
+            self.sock.sendall(cmd)
+
+            buf = b''
+            while not parser.done:
+                data = _recv(self.sock, RECV_SIZE)
+                if not data:
+                    raise MemcacheUnexpectedCloseError()
+                buf = parser.feed(buf + data)
+
+            return parser.result
+        except Exception:
+            self.close()
+            raise
+
     def __setitem__(self, key, value):
         self.set(key, value, noreply=True)
 
@@ -850,7 +993,7 @@ class Client(object):
         self.delete(key, noreply=True)
 
 
-class PooledClient(object):
+class PooledClient(FuturesMixin, ReadThroughMixin):
     """A thread-safe pool of clients (with the same client api).
 
     Args:
@@ -861,6 +1004,29 @@ class PooledClient(object):
                       be called to create a lock or sempahore that can
                       protect the pool from concurrent access (for example a
                       eventlet lock or semaphore could be used instead)
+      thread_affinity: hand each thread the client it used last when it is
+                       still free, see :py:class:`.ObjectPool`.
+      acquire_timeout: seconds to wait for a free client once
+                       ``max_pool_size`` clients exist, instead of raising
+                       the runtime error right away.
+      min_idle: number of clients to create, and connect, up front. Idle
+                clients are never closed below this number, but clients
+                that are destroyed after a failure aren't replaced until
+                they are needed.
+      max_idle: maximum number of idle clients to keep, clients released
+                beyond it are closed.
+      idle_timeout: seconds after which idle clients are closed, checked
+                    when clients are taken from or returned to the pool.
+      max_lifetime: seconds after which clients are closed once they are
+                    released, so connections get renewed.
+      executor_workers: number of threads running the commands of the
+                        ``submit_*`` methods, see
+                        :py:class:`.CommandExecutor`.
+      executor_queue_size: maximum number of submitted commands waiting for
+                           a thread, None for no limit.
+      single_flight: coalesce concurrent ``get`` calls for the same key with
+                     a :py:class:`.SingleFlight`, so they share a single
+                     request and a single client from the pool.
 
     Further arguments are interpreted as for :py:class:`.Client` constructor.
     """
@@ -878,7 +1044,16 @@ class PooledClient(object):
                  max_pool_size=None,
                  lock_generator=None,
                  default_noreply=True,
-                 allow_unicode_keys=False):
+                 allow_unicode_keys=False,
+                 thread_affinity=False,
+                 acquire_timeout=None,
+                 min_idle=0,
+                 max_idle=None,
+                 idle_timeout=None,
+                 max_lifetime=None,
+                 executor_workers=4,
+                 executor_queue_size=None,
+                 single_flight=False):
         self.server = server
         self.serializer = serializer
         self.deserializer = deserializer
@@ -898,7 +1073,23 @@ class PooledClient(object):
             self._create_client,
             after_remove=lambda client: client.close(),
             max_size=max_pool_size,
-            lock_generator=lock_generator)
+            lock_generator=lock_generator,
+            thread_affinity=thread_affinity,
+            acquire_timeout=acquire_timeout,
+            min_idle=min_idle,
+            max_idle=max_idle,
+            idle_timeout=idle_timeout,
+            max_lifetime=max_lifetime)
+        self.command_executor = CommandExecutor(executor_workers,
+                                                executor_queue_size)
+        self.single_flight = SingleFlight() if single_flight else None
+
+        # clients that fail to connect here connect on first use instead
+        for client in self.client_pool.free:
+            try:
+                client._connect()
+            except socket.error as e:
+                logger.warning('connecting to %s failed: %s', self.server, e)
 
     def check_key(self, key):
         """Checks key and add key_prefix."""
@@ -922,8 +1113,17 @@ class PooledClient(object):
         return client
 
     def close(self):
+        self.command_executor.shutdown()
         self.client_pool.clear()
 
+    def pool_stats(self):
+        """
+        Returns the counters of the client pool, see
+        :py:meth:`.ObjectPool.stats`. A high number of destroys means
+        clients are reconnecting after errors.
+        """
+        return self.client_pool.stats()
+
     def set(self, key, value, expire=0, noreply=None):
         with self.client_pool.get_and_release(destroy_on_fail=True) as client:
             return client.set(key, value, expire=expire, noreply=noreply)
@@ -952,12 +1152,21 @@ class PooledClient(object):
                               expire=expire, noreply=noreply)
 
     def get(self, key, default=None):
+        if self.single_flight is None:
+            return self._get(key, default)
+
+        value = self.single_flight.do(key, self._get, key, _MISSING)
+        if value is _MISSING:
+            return default
+        return value
+
+    def _get(self, key, default):
         with self.client_pool.get_and_release(destroy_on_fail=True) as client:
             try:
                 return client.get(key, default)
             except Exception:
                 if self.ignore_exc:
-                    return None
+                    return default
                 else:
                     raise
 
@@ -1019,6 +1228,14 @@ class PooledClient(object):
         with self.client_pool.get_and_release(destroy_on_fail=True) as client:
             return client.touch(key, expire=expire, noreply=noreply)
 
+    def touch_many(self, keys, expire=0, noreply=None):
+        with self.client_pool.get_and_release(destroy_on_fail=True) as client:
+            return client.touch_many(keys, expire=expire, noreply=noreply)
+
+    def incr_many(self, values, noreply=False):
+        with self.client_pool.get_and_release(destroy_on_fail=True) as client:
+            return client.incr_many(values, noreply=noreply)
+
     def stats(self, *args):
         with self.client_pool.get_and_release(destroy_on_fail=True) as client:
             try:
@@ -1057,6 +1274,138 @@ class PooledClient(object):
         self.delete(key, noreply=True)
 
 
+def _parse_store_result(line, name):
+    if line not in VALID_STORE_RESULTS[name]:
+        raise MemcacheUnknownError(line[:32])
+    if line == b'STORED':
+        return True
+    if line == b'NOT_STORED':
+        return False
+    if line == b'NOT_FOUND':
+        return None
+    if line == b'EXISTS':
+        return False
+
+
+def _parse_delete_result(line):
+    if line == b'DELETED':
+        return True
+    if line == b'NOT_FOUND':
+        return False
+    raise MemcacheUnknownError(line[:32])
+
+
+def _parse_incr_result(line):
+    if line == b'NOT_FOUND':
+        return None
+    return int(line)
+
+
+class _FetchParser(object):
+    """Incremental parser for the response to a "get" or "gets" command.
+
+    This is the non-blocking counterpart of the response loop in
+    Client._fetch_cmd: instead of reading from the socket itself it is fed
+    whatever data has arrived so far, see ``feed``.
+    """
+
+    def __init__(self, client, name, checked_keys, expect_cas):
+        self.client = client
+        self.name = name
+        self.checked_keys = checked_keys
+        self.expect_cas = expect_cas
+        self.result = {}
+        self.done = False
+        # Number of bytes the next call to feed needs to make progress, zero
+        # while waiting for a line.
+        self.wanted = 0
+        self._header = None
+
+    def feed(self, buf):
+        """Consumes as much of buf as possible, returns the unused bytes."""
+        while not self.done:
+            if self._header is not None:
+                if len(buf) < self.wanted:
+                    return buf
+                key, flags, size, cas = self._header
+                value = buf[:size]
+                buf = buf[size + 2:]
+                self._header = None
+                self.wanted = 0
+
+                key = self.checked_keys[key]
+                if self.client.deserializer:
+                    value = self.client.deserializer(key, value, int(flags))
+
+                if self.expect_cas:
+                    self.result[key] = (value, cas)
+                else:
+                    self.result[key] = value
+                continue
+
+            index = buf.find(b'\r\n')
+            if index == -1:
+                return buf
+            line = buf[:index]
+            buf = buf[index + 2:]
+
+            self.client._raise_errors(line, self.name)
+            if line == b'END':
+                self.done = True
+            elif line.startswith(b'VALUE'):
+                cas = None
+                if self.expect_cas:
+                    _, key, flags, size, cas = line.split()
+                else:
+                    try:
+                        _, key, flags, size = line.split()
+                    except Exception as e:
+                        raise ValueError("Unable to parse line %s: %s"
+                                         % (line, str(e)))
+                self._header = (key, flags, int(size), cas)
+                self.wanted = int(size) + 2
+            else:
+                raise MemcacheUnknownError(line[:32])
+        return buf
+
+
+class _ReplyParser(object):
+    """Incremental parser for the single line replies of pipelined commands.
+
+    Every key in keys is expected to get one reply line, in order, which is
+    converted with convert(line). The converted replies are kept in
+    ``replies``, ``result`` is what the equivalent Client method returns
+    (the replies themselves unless given).
+    """
+
+    def __init__(self, client, name, keys, convert, result=None):
+        self.client = client
+        self.name = name
+        self.keys = list(keys)
+        self.convert = convert
+        self.replies = {}
+        self.result = self.replies if result is None else result
+        self.done = not self.keys
+        self.wanted = 0
+        self._received = 0
+
+    def feed(self, buf):
+        """Consumes as much of buf as possible, returns the unused bytes."""
+        while not self.done:
+            index = buf.find(b'\r\n')
+            if index == -1:
+                return buf
+            line = buf[:index]
+            buf = buf[index + 2:]
+
+            self.client._raise_errors(line, self.name)
+            key = self.keys[self._received]
+            self.replies[key] = self.convert(line)
+            self._received += 1
+            self.done = self._received == len(self.keys)
+        return buf
+
+
 def _readline(sock, buf):
     """Read line of text from the socket.
 
@@ -0,0 +1,148 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    A per server circuit breaker.
+
+    The outcome of every request in the last ``window`` seconds is kept.
+    Once at least ``min_requests`` were made and the share of them that
+    failed, or took longer than ``slow_call_duration``, reaches
+    ``failure_rate`` the breaker opens and rejects requests. After
+    ``open_timeout`` seconds it goes half open and admits a single probe
+    request: the breaker closes again if the probe succeeds, and re-opens if
+    it fails.
+
+    ``on_state_change`` is called with (server, old_state, new_state) on
+    every transition.
+    """
+    def __init__(self, server, window=10, min_requests=5, failure_rate=0.5,
+                 slow_call_duration=None, open_timeout=5,
+                 on_state_change=None):
+        if not 0 < failure_rate <= 1:
+            raise ValueError('"failure_rate" must be in (0, 1]')
+        self.server = server
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.open_timeout = open_timeout
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self._opened_time = None
+        self._probing = False
+        self._outcomes = collections.deque()
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns True if a request may be sent to the server. In the half open
+        state only the first caller is let through until its outcome is
+        recorded.
+        """
+        transitions = []
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() - self._opened_time < self.open_timeout:
+                    return False
+                transitions.append(self._transition(HALF_OPEN))
+            allowed = not self._probing
+            self._probing = True
+        self._notify(transitions)
+        return allowed
+
+    def record_success(self, duration=None):
+        slow = (
+            self.slow_call_duration is not None and
+            duration is not None and
+            duration > self.slow_call_duration
+        )
+        self._record(slow)
+
+    def record_failure(self, duration=None):
+        self._record(True)
+
+    def cancel(self):
+        """
+        Gives up the half open probe without an outcome, for requests that
+        failed before talking to the server.
+        """
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.time())
+            requests = len(self._outcomes)
+            return {
+                'state': self.state,
+                'requests': requests,
+                'failures': self._failures,
+                'failure_rate': (
+                    float(self._failures) / requests if requests else 0.0
+                ),
+            }
+
+    def _record(self, failed):
+        transitions = []
+        with self._lock:
+            now = time.time()
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                self._outcomes.clear()
+                self._failures = 0
+                if failed:
+                    transitions.append(self._open(now))
+                else:
+                    transitions.append(self._transition(CLOSED))
+            elif self.state == CLOSED:
+                self._outcomes.append((now, failed))
+                self._failures += failed
+                self._expire(now)
+
+                requests = len(self._outcomes)
+                if (
+                    requests >= self.min_requests and
+                    self._failures >= self.failure_rate * requests
+                ):
+                    transitions.append(self._open(now))
+        self._notify(transitions)
+
+    def _expire(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now):
+        self._opened_time = now
+        self._outcomes.clear()
+        self._failures = 0
+        return self._transition(OPEN)
+
+    def _transition(self, state):
+        old_state, self.state = self.state, state
+        return old_state, state
+
+    def _notify(self, transitions):
+        # Called without holding the lock so listeners may query the breaker
+        for old_state, state in transitions:
+            logger.debug('circuit breaker for %s went from %s to %s',
+                         self.server, old_state, state)
+            if self.on_state_change is None:
+                continue
+            try:
+                self.on_state_change(self.server, old_state, state)
+            except Exception:
+                logger.exception('circuit breaker listener failed')
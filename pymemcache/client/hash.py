@@ -1,15 +1,158 @@
+import collections
+import copy
 import socket
+import threading
 import time
 import logging
+import weakref
 
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+from pymemcache import fork
+from pymemcache.client import multiplex
 from pymemcache.client.base import Client, PooledClient, _check_key
+from pymemcache.client.read_through import _MISSING, ReadThroughMixin
 from pymemcache.client.rendezvous import RendezvousHash
-from pymemcache.exceptions import MemcacheError
+from pymemcache.client.single_flight import SingleFlight
+from pymemcache.exceptions import MemcacheError, MemcacheServerError
+from pymemcache.executor import CommandExecutor, FuturesMixin
 
 logger = logging.getLogger(__name__)
 
+# Hedge delay used until enough reads were timed to know their p95.
+DEFAULT_HEDGE_DELAY = 0.05
+
+# Returned by _safely_run_func for hedged reads that didn't get a reply.
+_NO_REPLY = object()
+
+
+class RouteCache(object):
+    """
+    A bounded LRU cache of key to node routing decisions.
+
+    Every membership change bumps the generation of the cache and drops all
+    of the cached routes. Routes computed under an older generation are
+    discarded instead of stored, so a lookup racing with ``add_server`` or
+    ``remove_server`` can't cache a stale node.
+    """
+    def __init__(self, max_size):
+        if max_size <= 0:
+            raise ValueError('"max_size" must be a positive integer')
+        self.max_size = max_size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._routes = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a tuple of (node, generation), node is None on a miss.
+        """
+        with self._lock:
+            try:
+                node = self._routes.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None, self.generation
+            self._routes[key] = node
+            self.hits += 1
+            return node, self.generation
+
+    def set(self, key, node, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._routes[key] = node
+            if len(self._routes) > self.max_size:
+                self._routes.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._routes.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._routes),
+                'max_size': self.max_size,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            }
+
+
+class LatencyTracker(object):
+    """
+    Keeps the last ``size`` request durations and reports a percentile of
+    them. The percentile is only recomputed every ``size // 10`` samples so
+    reading it stays cheap.
+    """
+    def __init__(self, size=1000, percentile=95, min_samples=20):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=size)
+        self._refresh_every = max(size // 10, 1)
+        self._added = 0
+        self._value = None
+
+    def add(self, duration):
+        self._samples.append(duration)
+        self._added += 1
+        if self._added % self._refresh_every == 0 or self._value is None:
+            self._refresh()
+
+    def value(self):
+        """
+        Returns the percentile, or None until min_samples were added.
+        """
+        return self._value
+
+    def _refresh(self):
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return
+        index = int(len(samples) * self.percentile / 100.0)
+        self._value = samples[min(index, len(samples) - 1)]
+
+
+class HealthChecker(threading.Thread):
+    """
+    A daemon thread that periodically probes the failed and dead servers of a
+    :py:class:`.HashClient`, see ``HashClient._check_servers``.
+
+    Only a weak reference to the client is kept, the thread exits once the
+    client has been garbage collected or ``stop`` is called.
+    """
+    def __init__(self, client, interval):
+        super(HealthChecker, self).__init__(name='pymemcache-health-checker')
+        self.daemon = True
+        self.interval = interval
+        self._client = weakref.ref(client)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            client = self._client()
+            if client is None:
+                return
+            try:
+                client._check_servers()
+            except Exception:
+                logger.exception('health check failed')
+            del client
+
+    def stop(self):
+        self._stopped.set()
+
 
-class HashClient(object):
+class HashClient(FuturesMixin, ReadThroughMixin):
     """
     A client for communicating with a cluster of memcached servers
     """
@@ -31,13 +174,28 @@ class HashClient(object):
         dead_timeout=60,
         use_pooling=False,
         ignore_exc=False,
-        allow_unicode_keys=False
+        allow_unicode_keys=False,
+        route_cache_size=None,
+        parallel_workers=0,
+        use_selectors=False,
+        health_check_interval=None,
+        circuit_breaker=None,
+        replicas=1,
+        hedge_delay=None,
+        hot_keys=None,
+        migration_window=None,
+        migration_backfill_expire=None,
+        executor_workers=4,
+        executor_queue_size=None,
+        single_flight=False
     ):
         """
         Constructor.
 
         Args:
-          servers: list(tuple(hostname, port))
+          servers: list(tuple(hostname, port)) or
+                   list(tuple(hostname, port, weight)), servers with a higher
+                   weight receive a proportionally larger share of the keys.
           hasher: optional class three functions ``get_node``, ``add_node``,
                   and ``remove_node``
                   defaults to Rendezvous (HRW) hash.
@@ -52,6 +210,85 @@ class HashClient(object):
                                  attempts.
           dead_timeout (float): Time in seconds before attempting to add a node
                                 back in the pool.
+          route_cache_size (int): Number of key to server routes to remember
+                                  in a :py:class:`.RouteCache`, so hot keys
+                                  skip the hasher. The cache is emptied
+                                  whenever servers are added or removed.
+                                  default: None (disabled)
+          parallel_workers (int): Size of the thread pool used to send the
+                                  per server batches of ``get_many`` at the
+                                  same time, so a multiget costs the slowest
+                                  server instead of the sum of all of them.
+                                  Requires ``concurrent.futures`` (the
+                                  ``futures`` package on python 2).
+                                  default: 0 (batches are sent one by one)
+          use_selectors (bool): send the per server batches of ``get_many``,
+                                ``set_many`` and ``delete_many`` on
+                                non-blocking sockets and multiplex the
+                                replies with ``selectors``, so they are all in
+                                flight at the same time on a single thread.
+                                Requires ``selectors`` (the ``selectors34``
+                                package on python 2). default: False
+          health_check_interval (float): Time in seconds between probes of
+                                         failed and dead servers, with the
+                                         "version" command, from a
+                                         background :py:class:`.HealthChecker`
+                                         thread. When enabled requests skip
+                                         failing servers instead of retrying
+                                         them, and servers are only brought
+                                         back into rotation after a
+                                         successful probe.
+                                         default: None (disabled)
+          circuit_breaker: optional callable taking a (hostname, port) tuple
+                           and returning a breaker for that server, such as
+                           :py:class:`.CircuitBreaker` or a
+                           ``functools.partial`` of it. It replaces the
+                           ``retry_attempts``, ``retry_timeout`` and
+                           ``dead_timeout`` handling: servers stay in the
+                           hash and requests to them fail fast, returning
+                           the default value, while their breaker is open.
+                           The breakers are available from
+                           ``circuit_breakers``. default: None
+          replicas (int): Number of servers every key is stored on, the top
+                          scoring servers of the hasher, which must provide
+                          ``get_nodes``. ``set``, ``set_many``, ``delete``
+                          and ``delete_many`` go to every replica, other
+                          writes go to the first one and delete the key from
+                          the others. Reads go to the first replica, except
+                          for ``hedged_get`` and ``hedged_get_many``.
+                          default: 1
+          hedge_delay (float): Time in seconds that hedged reads wait for the
+                               first replica before also asking the second
+                               one. default: None (the p95 of recent hedged
+                               reads)
+          hot_keys: optional :py:class:`.HotKeyCache`. ``get`` and
+                    ``get_many`` then sample the keys they read and serve
+                    the hot ones from memory for a short time, instead of
+                    sending every read of them to the same server. Writes
+                    through this client drop the local copy, writes from
+                    other clients are seen once it expires. default: None
+          migration_window (float): Time in seconds after ``add_server``
+                                    during which reads that miss fall back
+                                    to the server that owned the key before
+                                    the new one was added, so the keys it
+                                    takes over don't all miss at once.
+                                    Deletes also go to that server while the
+                                    window lasts. default: None (disabled)
+          migration_backfill_expire (int): Expire time used to copy values
+                                           found on the previous owner to
+                                           the new one during a migration.
+                                           default: None (no backfill)
+          executor_workers (int): Number of threads running the commands of
+                                  the ``submit_*`` methods, see
+                                  :py:class:`.CommandExecutor`, which
+                                  require ``use_pooling``. default: 4
+          executor_queue_size (int): Maximum number of submitted commands
+                                     waiting for a thread.
+                                     default: None (no limit)
+          single_flight (bool): Coalesce concurrent ``get`` calls for the
+                                same key with a :py:class:`.SingleFlight`,
+                                so they share a single request.
+                                default: False
 
         Further arguments are interpreted as for :py:class:`.Client`
         constructor.
@@ -61,14 +298,56 @@ class HashClient(object):
         self.retry_timeout = retry_timeout
         self.dead_timeout = dead_timeout
         self.use_pooling = use_pooling
+        self.use_selectors = use_selectors
         self.key_prefix = key_prefix
         self.ignore_exc = ignore_exc
         self.allow_unicode_keys = allow_unicode_keys
         self._failed_clients = {}
         self._dead_clients = {}
+        self._server_weights = {}
         self._last_dead_check_time = time.time()
+        self._health_checker = None
+        self._circuit_breaker = circuit_breaker
+        self.circuit_breakers = {}
+        self.replicas = replicas
+        self.hedge_delay = hedge_delay
+        self._read_latency = LatencyTracker()
+        self._hedge_executor = None
+        self.hot_keys = hot_keys
+        self.migration_backfill_expire = migration_backfill_expire
+        self._migration = None
+        # servers given to the constructor don't start a migration
+        self.migration_window = None
+        if use_pooling:
+            self.command_executor = CommandExecutor(executor_workers,
+                                                    executor_queue_size)
+        else:
+            # the plain clients can't be shared with the executor's threads
+            self.command_executor = None
+        self.single_flight = SingleFlight() if single_flight else None
 
         self.hasher = hasher()
+        if replicas > 1 and not hasattr(self.hasher, 'get_nodes'):
+            raise ValueError('replicas requires a hasher with get_nodes')
+        self.route_cache = None
+        if route_cache_size:
+            self.route_cache = RouteCache(route_cache_size)
+
+        self._executor = None
+        self._parallel_workers = parallel_workers
+        if parallel_workers:
+            if futures is None:
+                raise ImportError(
+                    'parallel_workers requires concurrent.futures, install '
+                    'the "futures" package on python 2'
+                )
+            self._executor = futures.ThreadPoolExecutor(parallel_workers)
+
+        if use_selectors and multiplex.selectors is None:
+            raise ImportError(
+                'use_selectors requires selectors, install the "selectors34" '
+                'package on python 2'
+            )
 
         self.default_kwargs = {
             'connect_timeout': connect_timeout,
@@ -87,12 +366,63 @@ class HashClient(object):
                 'lock_generator': lock_generator
             })
 
-        for server, port in servers:
-            self.add_server(server, port)
+        for server in servers:
+            self.add_server(*server)
+        self.migration_window = migration_window
+
+        if health_check_interval:
+            self._health_checker = HealthChecker(self, health_check_interval)
+            self._health_checker.start()
+        fork.register(self)
+
+    def _after_fork(self):
+        # The clients drop their own sockets, but our threads only exist in
+        # the parent and their locks may have been held when it forked.
+        if self._executor is not None:
+            self._executor = futures.ThreadPoolExecutor(
+                self._parallel_workers
+            )
+        self._hedge_executor = None
+        if self._health_checker is not None:
+            self._health_checker = HealthChecker(
+                self, self._health_checker.interval
+            )
+            self._health_checker.start()
+        if self.route_cache is not None:
+            self.route_cache = RouteCache(self.route_cache.max_size)
+
+    def close(self):
+        """
+        Stops the background threads and closes all of the clients.
+        """
+        if self._health_checker is not None:
+            self._health_checker.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown()
+        if self.command_executor is not None:
+            self.command_executor.shutdown()
+        for client in self.clients.values():
+            client.close()
+
+    def check_key(self, key):
+        """Checks key and add key_prefix."""
+        return _check_key(key, allow_unicode_keys=self.allow_unicode_keys,
+                          key_prefix=self.key_prefix)
 
-    def add_server(self, server, port):
+    def add_server(self, server, port, weight=None):
         key = '%s:%s' % (server, port)
 
+        # remember the weight so that servers brought back into rotation
+        # after being marked dead keep their share of the keys
+        if weight is None:
+            weight = self._server_weights.get((server, port), 1)
+        self._server_weights[(server, port)] = weight
+
+        if self.migration_window:
+            self._start_migration()
+
         if self.use_pooling:
             client = PooledClient(
                 (server, port),
@@ -102,7 +432,104 @@ class HashClient(object):
             client = Client((server, port), **self.default_kwargs)
 
         self.clients[key] = client
-        self.hasher.add_node(key)
+        if (
+            self._circuit_breaker is not None and
+            (server, port) not in self.circuit_breakers
+        ):
+            self.circuit_breakers[(server, port)] = self._circuit_breaker(
+                (server, port)
+            )
+
+        if weight == 1:
+            # keep supporting hashers that don't know about weights
+            self.hasher.add_node(key)
+        else:
+            self.hasher.add_node(key, weight)
+
+        if self.route_cache is not None:
+            self.route_cache.invalidate()
+
+    def _start_migration(self):
+        # Keep the node set from before the first of several quick
+        # membership changes, that is where the keys still are.
+        if self._migration_hasher() is None:
+            hasher = copy.deepcopy(self.hasher)
+        else:
+            hasher = self._migration[0]
+        self._migration = (hasher, time.time() + self.migration_window)
+
+    def _migration_hasher(self):
+        """
+        Returns the hasher from before the migration in progress, if any.
+        """
+        if self._migration is None:
+            return None
+
+        hasher, deadline = self._migration
+        if time.time() > deadline:
+            self._migration = None
+            return None
+        return hasher
+
+    def _group_by_previous_owner(self, keys):
+        """
+        Groups the keys whose owner changed in the migration in progress by
+        the server that owned them before.
+        """
+        hasher = self._migration_hasher()
+        client_batches = {}
+        if hasher is None:
+            return client_batches
+
+        for key in keys:
+            previous = self.clients.get(hasher.get_node(key))
+            if (
+                previous is None or
+                previous.server in self._dead_clients or
+                previous is self._get_client(key)
+            ):
+                continue
+
+            if previous.server not in client_batches:
+                client_batches[previous.server] = []
+
+            client_batches[previous.server].append(key)
+
+        return client_batches
+
+    def _get_from_previous_owners(self, keys):
+        """
+        Reads keys that missed from their owner before the migration in
+        progress, and backfills the values found when configured.
+        """
+        client_batches = self._group_by_previous_owner(keys)
+        if not client_batches:
+            return {}
+
+        # The fallback is best effort, a miss stays a miss if the previous
+        # owner can't be read.
+        found = {}
+        try:
+            results = self._run_grouped('get_many', client_batches, {}, (), {})
+        except Exception:
+            logger.debug('reading from previous owners failed', exc_info=True)
+            return found
+
+        for result in results:
+            found.update(result)
+
+        if found and self.migration_backfill_expire is not None:
+            self.set_many(found, self.migration_backfill_expire, noreply=True)
+        return found
+
+    def _delete_from_previous_owners(self, keys):
+        client_batches = self._group_by_previous_owner(keys)
+        try:
+            self._run_grouped('delete_many', client_batches, False, (),
+                              {'noreply': True})
+        except Exception:
+            logger.debug('deleting from previous owners failed',
+                         exc_info=True)
 
     def remove_server(self, server, port):
         dead_time = time.time()
@@ -111,9 +538,12 @@ class HashClient(object):
         key = '%s:%s' % (server, port)
         self.hasher.remove_node(key)
 
+        if self.route_cache is not None:
+            self.route_cache.invalidate()
+
     def _get_client(self, key):
-        _check_key(key, self.allow_unicode_keys, self.key_prefix)
-        if len(self._dead_clients) > 0:
+        fork.check(self)
+        if len(self._dead_clients) > 0 and self._health_checker is None:
             current_time = time.time()
             ldc = self._last_dead_check_time
             # we have dead clients and we have reached the
@@ -128,6 +558,13 @@ class HashClient(object):
                         self.add_server(*server)
                         self._last_dead_check_time = current_time
 
+        if self.route_cache is not None:
+            server, generation = self.route_cache.get(key)
+            if server is not None:
+                # only keys that passed _check_key are ever cached
+                return self.clients[server]
+
+        _check_key(key, self.allow_unicode_keys, self.key_prefix)
         server = self.hasher.get_node(key)
         # We've ran out of servers to try
         if server is None:
@@ -135,70 +572,27 @@ class HashClient(object):
                 return
             raise MemcacheError('All servers seem to be down right now')
 
+        if self.route_cache is not None:
+            self.route_cache.set(key, server, generation)
+
         client = self.clients[server]
         return client
 
     def _safely_run_func(self, client, func, default_val, *args, **kwargs):
         try:
-            if client.server in self._failed_clients:
-                # This server is currently failing, lets check if it is in
-                # retry or marked as dead
-                failed_metadata = self._failed_clients[client.server]
-
-                # we haven't tried our max amount yet, if it has been enough
-                # time lets just retry using it
-                if failed_metadata['attempts'] < self.retry_attempts:
-                    failed_time = failed_metadata['failed_time']
-                    if time.time() - failed_time > self.retry_timeout:
-                        logger.debug(
-                            'retrying failed server: %s', client.server
-                        )
-                        result = func(*args, **kwargs)
-                        # we were successful, lets remove it from the failed
-                        # clients
-                        self._failed_clients.pop(client.server)
-                        return result
-                    return default_val
-                else:
-                    # We've reached our max retry attempts, we need to mark
-                    # the sever as dead
-                    logger.debug('marking server as dead: %s', client.server)
-                    self.remove_server(*client.server)
+            if not self._should_try_server(client.server):
+                return default_val
 
+            start = time.time()
             result = func(*args, **kwargs)
+            # we were successful, lets remove it from the failed clients
+            self._mark_server_ok(client.server, time.time() - start)
             return result
 
         # Connecting to the server fail, we should enter
         # retry mode
         except socket.error:
-            # This client has never failed, lets mark it for failure
-            if (
-                    client.server not in self._failed_clients and
-                    self.retry_attempts > 0
-            ):
-                self._failed_clients[client.server] = {
-                    'failed_time': time.time(),
-                    'attempts': 0,
-                }
-            # We aren't allowing any retries, we should mark the server as
-            # dead immediately
-            elif (
-                client.server not in self._failed_clients and
-                self.retry_attempts <= 0
-            ):
-                self._failed_clients[client.server] = {
-                    'failed_time': time.time(),
-                    'attempts': 0,
-                }
-                logger.debug("marking server as dead %s", client.server)
-                self.remove_server(*client.server)
-            # This client has failed previously, we need to update the metadata
-            # to reflect that we have attempted it again
-            else:
-                failed_metadata = self._failed_clients[client.server]
-                failed_metadata['attempts'] += 1
-                failed_metadata['failed_time'] = time.time()
-                self._failed_clients[client.server] = failed_metadata
+            self._mark_failed_server(client.server)
 
             # if we haven't enabled ignore_exc, don't move on gracefully, just
             # raise the exception
@@ -206,7 +600,9 @@ class HashClient(object):
                 raise
 
             return default_val
-        except Exception:
+        except Exception as e:
+            self._mark_server_error(client.server, e)
+
             # any exceptions that aren't socket.error we need to handle
             # gracefully as well
             if not self.ignore_exc:
@@ -214,6 +610,263 @@ class HashClient(object):
 
             return default_val
 
+    def _mark_server_ok(self, server, duration):
+        if self.circuit_breakers:
+            self.circuit_breakers[server].record_success(duration)
+            return
+
+        self._failed_clients.pop(server, None)
+
+    def _mark_server_error(self, server, error):
+        # Errors other than socket.error only matter to the circuit breaker:
+        # server errors count against the server, any other reply from
+        # memcached shows it is up, and errors raised before talking to the
+        # server say nothing about it.
+        if not self.circuit_breakers:
+            return
+
+        breaker = self.circuit_breakers[server]
+        if isinstance(error, MemcacheServerError):
+            breaker.record_failure()
+        elif isinstance(error, MemcacheError):
+            breaker.record_success()
+        else:
+            breaker.cancel()
+
+    def _should_try_server(self, server):
+        if self.circuit_breakers:
+            return self.circuit_breakers[server].allow()
+
+        if server in self._failed_clients:
+            # This server is currently failing, lets check if it is in
+            # retry or marked as dead
+            failed_metadata = self._failed_clients[server]
+
+            # the health checker decides when it is back
+            if self._health_checker is not None:
+                return False
+
+            # we haven't tried our max amount yet, if it has been enough
+            # time lets just retry using it
+            if failed_metadata['attempts'] < self.retry_attempts:
+                failed_time = failed_metadata['failed_time']
+                if time.time() - failed_time > self.retry_timeout:
+                    logger.debug('retrying failed server: %s', server)
+                    return True
+                return False
+            else:
+                # We've reached our max retry attempts, we need to mark
+                # the sever as dead
+                logger.debug('marking server as dead: %s', server)
+                self.remove_server(*server)
+
+        return True
+
+    def _mark_failed_server(self, server):
+        if self.circuit_breakers:
+            self.circuit_breakers[server].record_failure()
+            return
+
+        # This client has never failed, lets mark it for failure
+        if (
+                server not in self._failed_clients and
+                self.retry_attempts > 0
+        ):
+            self._failed_clients[server] = {
+                'failed_time': time.time(),
+                'attempts': 0,
+            }
+        # We aren't allowing any retries, we should mark the server as
+        # dead immediately
+        elif (
+            server not in self._failed_clients and
+            self.retry_attempts <= 0
+        ):
+            self._failed_clients[server] = {
+                'failed_time': time.time(),
+                'attempts': 0,
+            }
+            logger.debug("marking server as dead %s", server)
+            self.remove_server(*server)
+        # This client has failed previously, we need to update the metadata
+        # to reflect that we have attempted it again
+        else:
+            failed_metadata = self._failed_clients[server]
+            failed_metadata['attempts'] += 1
+            failed_metadata['failed_time'] = time.time()
+            self._failed_clients[server] = failed_metadata
+
+    def _check_servers(self):
+        """
+        Probes every failed and dead server, used by the health checker.
+
+        Failed servers that answer are cleared, the others are marked dead
+        once they run out of retry attempts. Dead servers that answer are
+        brought back into rotation.
+        """
+        for server in list(self._failed_clients):
+            if self._probe_server(server):
+                logger.debug('server is healthy again %s', server)
+                self._failed_clients.pop(server, None)
+                continue
+
+            self._mark_failed_server(server)
+            failed_metadata = self._failed_clients.get(server)
+            if (
+                failed_metadata is not None and
+                failed_metadata['attempts'] >= self.retry_attempts
+            ):
+                logger.debug('marking server as dead: %s', server)
+                self.remove_server(*server)
+
+        for server in list(self._dead_clients):
+            if self._probe_server(server):
+                logger.debug('bringing server back into rotation %s', server)
+                self._dead_clients.pop(server, None)
+                self.add_server(*server)
+
+    def _probe_server(self, server):
+        # Use a connection of our own, the server's clients may be in use
+        client = Client(
+            server,
+            connect_timeout=self.default_kwargs['connect_timeout'],
+            timeout=self.default_kwargs['timeout'],
+            no_delay=self.default_kwargs['no_delay'],
+            socket_module=self.default_kwargs['socket_module'],
+        )
+        try:
+            client.version()
+            return True
+        except Exception:
+            return False
+        finally:
+            client.close()
+
+    def _run_batches(self, batches):
+        """
+        Runs a list of (client, cmd, default_val, args, kwargs) batches
+        through _safely_run_func and returns their results in order.
+
+        With ``use_selectors`` the batches are multiplexed on the calling
+        thread, see _run_multiplexed. When a thread pool is configured all but
+        one of the batches are handed to it and the last one runs on the
+        calling thread. We always wait for every batch to finish, even when
+        one of them raises, so no client is still in use by a worker when we
+        return.
+        """
+        if self.use_selectors and len(batches) > 1:
+            return self._run_multiplexed(batches)
+
+        if self._executor is None or len(batches) < 2:
+            return [
+                self._safely_run_func(client, getattr(client, cmd),
+                                      default_val, *args, **kwargs)
+                for client, cmd, default_val, args, kwargs in batches
+            ]
+
+        pending = [
+            self._executor.submit(self._safely_run_func, client,
+                                  getattr(client, cmd), default_val,
+                                  *args, **kwargs)
+            for client, cmd, default_val, args, kwargs in batches[:-1]
+        ]
+        client, cmd, default_val, args, kwargs = batches[-1]
+        try:
+            last = self._safely_run_func(client, getattr(client, cmd),
+                                         default_val, *args, **kwargs)
+        finally:
+            futures.wait(pending)
+
+        return [f.result() for f in pending] + [last]
+
+    def _run_multiplexed(self, batches):
+        """
+        Sends every batch as one pipelined command on its server's socket
+        and reads all of the responses at the same time, with the same
+        failure handling as _safely_run_func.
+        """
+        results = [default_val for _, _, default_val, _, _ in batches]
+        requests = []
+        error = None
+
+        try:
+            for i, (client, cmd, default_val, args, kwargs) in enumerate(
+                batches
+            ):
+                if not self._should_try_server(client.server):
+                    continue
+
+                if isinstance(client, PooledClient):
+                    try:
+                        connection = client.client_pool.get()
+                    except Exception as e:
+                        # settles a half-open probe allowed above
+                        self._mark_server_error(client.server, e)
+                        error = error or e
+                        continue
+                else:
+                    connection = client
+
+                prepare = getattr(connection, '_prepare_' + cmd)
+                try:
+                    data, parser = prepare(*args, **kwargs)
+                except Exception as e:
+                    if isinstance(client, PooledClient):
+                        client.client_pool.release(connection)
+                    self._mark_server_error(client.server, e)
+                    error = error or e
+                    continue
+                requests.append(
+                    (i, client, multiplex.Request(connection, data, parser))
+                )
+        except BaseException:
+            # don't leak the connections checked out for earlier batches
+            for _, client, request in requests:
+                if isinstance(client, PooledClient):
+                    client.client_pool.release(request.client)
+            raise
+
+        multiplex.run_requests([request for _, _, request in requests])
+
+        for i, client, request in requests:
+            if isinstance(client, PooledClient):
+                if request.error is None:
+                    client.client_pool.release(request.client)
+                else:
+                    client.client_pool.destroy(request.client)
+
+            if request.error is None:
+                self._mark_server_ok(client.server, request.duration)
+                results[i] = request.parser.result
+                continue
+
+            if isinstance(request.error, socket.error):
+                self._mark_failed_server(client.server)
+            else:
+                self._mark_server_error(client.server, request.error)
+            error = error or request.error
+
+        if error is not None and not self.ignore_exc:
+            raise error
+
+        return results
+
+    def _get_clients(self, key):
+        """
+        Returns the clients of every replica of key, the first one being the
+        client _get_client returns.
+        """
+        client = self._get_client(key)
+
+        if client is None:
+            return []
+
+        if self.replicas == 1:
+            return [client]
+
+        nodes = self.hasher.get_nodes(key, self.replicas)
+        return [self.clients[node] for node in nodes]
+
     def _run_cmd(self, cmd, key, default_val, *args, **kwargs):
         client = self._get_client(key)
 
@@ -227,84 +880,202 @@ class HashClient(object):
             client, func, default_val, *args, **kwargs
         )
 
+    def _run_replicated(self, cmd, key, default_val, *args, **kwargs):
+        """
+        Runs cmd on every replica of key, returns the first one's result.
+        """
+        if self.hot_keys is not None:
+            self.hot_keys.invalidate(key)
+        if self.replicas == 1:
+            return self._run_cmd(cmd, key, default_val, *args, **kwargs)
+
+        clients = self._get_clients(key)
+        if not clients:
+            return default_val
+
+        args = list(args)
+        args.insert(0, key)
+        results = [
+            self._safely_run_func(client, getattr(client, cmd), default_val,
+                                  *args, **kwargs)
+            for client in clients
+        ]
+        return results[0]
+
+    def _run_invalidating(self, cmd, key, default_val, *args, **kwargs):
+        """
+        Runs cmd on the first replica of key and deletes key from the other
+        ones, so they can't serve a stale value.
+        """
+        if self.hot_keys is not None:
+            self.hot_keys.invalidate(key)
+        if self.replicas == 1:
+            return self._run_cmd(cmd, key, default_val, *args, **kwargs)
+
+        clients = self._get_clients(key)
+        if not clients:
+            return default_val
+
+        args = list(args)
+        args.insert(0, key)
+        result = self._safely_run_func(
+            clients[0], getattr(clients[0], cmd), default_val,
+            *args, **kwargs
+        )
+        for client in clients[1:]:
+            self._safely_run_func(client, client.delete, False, key,
+                                  noreply=True)
+        return result
+
     def set(self, key, *args, **kwargs):
-        return self._run_cmd('set', key, False, *args, **kwargs)
+        return self._run_replicated('set', key, False, *args, **kwargs)
 
     def get(self, key, *args, **kwargs):
-        return self._run_cmd('get', key, None, *args, **kwargs)
+        if self.single_flight is None:
+            return self._get(key, *args, **kwargs)
+
+        default = args[0] if args else kwargs.get('default')
+        value = self.single_flight.do(key, self._get, key, _MISSING)
+        if value is _MISSING:
+            return default
+        return value
+
+    def _get(self, key, *args, **kwargs):
+        default = args[0] if args else kwargs.get('default')
+        if self.hot_keys is None and self._migration is None:
+            return self._run_cmd('get', key, default, *args, **kwargs)
+
+        if self.hot_keys is not None:
+            found, value = self.hot_keys.lookup(key)
+            if found:
+                return value
+
+        value = self._run_cmd('get', key, _MISSING, _MISSING)
+        if value is _MISSING:
+            value = self._get_from_previous_owners([key]).get(key, _MISSING)
+        if value is _MISSING:
+            return default
+
+        if self.hot_keys is not None:
+            self.hot_keys.store(key, value)
+        return value
 
     def incr(self, key, *args, **kwargs):
-        return self._run_cmd('incr', key, False, *args, **kwargs)
+        return self._run_invalidating('incr', key, False, *args, **kwargs)
 
     def decr(self, key, *args, **kwargs):
-        return self._run_cmd('decr', key, False, *args, **kwargs)
+        return self._run_invalidating('decr', key, False, *args, **kwargs)
 
-    def set_many(self, values, *args, **kwargs):
+    def _group_keys(self, keys, replicated=False):
+        """
+        Groups keys by the server they hash to, returns a dict of server to
+        list of keys and the list of keys that no server is available for.
+        With replicated, keys are added to the group of each of their
+        replicas.
+        """
         client_batches = {}
-        end = []
+        missing = []
 
-        for key, value in values.items():
-            client = self._get_client(key)
+        for key in keys:
+            if replicated and self.replicas > 1:
+                clients = self._get_clients(key)
+            else:
+                clients = [self._get_client(key)]
 
-            if client is None:
-                end.append(False)
+            if clients == [None] or not clients:
+                missing.append(key)
                 continue
 
-            if client.server not in client_batches:
-                client_batches[client.server] = {}
+            for client in clients:
+                if client.server not in client_batches:
+                    client_batches[client.server] = []
+
+                client_batches[client.server].append(key)
 
-            client_batches[client.server][key] = value
+        return client_batches, missing
 
-        for server, values in client_batches.items():
+    def _run_grouped(self, cmd, client_batches, default_val, args, kwargs):
+        batches = []
+        for server, keys in client_batches.items():
             client = self.clients['%s:%s' % server]
             new_args = list(args)
-            new_args.insert(0, values)
-            result = self._safely_run_func(
-                client,
-                client.set_many, False, *new_args, **kwargs
-            )
-            end.append(result)
+            new_args.insert(0, keys)
+            batches.append((client, cmd, default_val, new_args, kwargs))
 
-        return all(end)
+        return self._run_batches(batches)
 
-    set_multi = set_many
+    def _invalidate_replicas(self, keys):
+        if self.replicas == 1:
+            return
 
-    def get_many(self, keys, gets=False, *args, **kwargs):
         client_batches = {}
-        end = {}
-
         for key in keys:
-            client = self._get_client(key)
+            for client in self._get_clients(key)[1:]:
+                if client.server not in client_batches:
+                    client_batches[client.server] = []
 
-            if client is None:
-                end[key] = False
-                continue
+                client_batches[client.server].append(key)
 
-            if client.server not in client_batches:
-                client_batches[client.server] = []
+        self._run_grouped('delete_many', client_batches, False, (),
+                          {'noreply': True})
 
-            client_batches[client.server].append(key)
+    def set_many(self, values, *args, **kwargs):
+        if self.hot_keys is not None:
+            self.hot_keys.invalidate_many(values)
+
+        client_batches, missing = self._group_keys(values, replicated=True)
+        end = [False for _ in missing]
 
         for server, keys in client_batches.items():
-            client = self.clients['%s:%s' % server]
-            new_args = list(args)
-            new_args.insert(0, keys)
+            client_batches[server] = dict((key, values[key]) for key in keys)
 
-            if gets:
-                get_func = client.gets_many
-            else:
-                get_func = client.get_many
+        end.extend(
+            self._run_grouped('set_many', client_batches, False, args, kwargs)
+        )
 
-            result = self._safely_run_func(
-                client,
-                get_func, {}, *new_args, **kwargs
-            )
+        return all(end)
+
+    set_multi = set_many
+
+    def get_many(self, keys, gets=False, *args, **kwargs):
+        use_hot_keys = self.hot_keys is not None and not gets
+        end = {}
+        if use_hot_keys:
+            keys, end = self.hot_keys.lookup_many(keys)
+
+        client_batches, missing = self._group_keys(keys)
+        end.update((key, False) for key in missing)
+
+        if gets:
+            get_cmd = 'gets_many'
+        else:
+            get_cmd = 'get_many'
+
+        for result in self._run_grouped(get_cmd, client_batches, {},
+                                        args, kwargs):
             end.update(result)
+            if use_hot_keys:
+                self.hot_keys.store_many(result)
+
+        if not gets and self._migration is not None:
+            found = self._get_from_previous_owners(
+                [key for key in keys if key not in end]
+            )
+            end.update(found)
+            if use_hot_keys:
+                self.hot_keys.store_many(found)
 
         return end
 
     get_multi = get_many
 
+    def get_many_async(self, keys, *args, **kwargs):
+        """
+        Returns a future of the result of ``get_many``, run on the command
+        executor.
+        """
+        return self.submit_get_many(keys, *args, **kwargs)
+
     def gets(self, key, *args, **kwargs):
         return self._run_cmd('gets', key, None, *args, **kwargs)
 
@@ -313,31 +1084,188 @@ class HashClient(object):
 
     gets_multi = gets_many
 
+    def hedged_get(self, key, default=None):
+        """
+        Like get, but if the first replica of key hasn't replied within the
+        hedge delay the second replica is asked as well, and the first
+        reply wins.
+        """
+        end, _ = self._hedged_fetch([key])
+        return end.get(key, default)
+
+    def hedged_get_many(self, keys):
+        """
+        Like get_many, but the keys of servers that haven't replied within
+        the hedge delay are also requested from their second replica, and
+        the first reply for each key wins.
+        """
+        end, missing = self._hedged_fetch(keys)
+        for key in missing:
+            end[key] = False
+        return end
+
+    def _hedged_fetch(self, keys):
+        if not self.use_pooling:
+            # the losing request keeps using its client after we return
+            raise ValueError('hedged reads require use_pooling')
+        if futures is None:
+            raise ImportError(
+                'hedged reads require concurrent.futures, install the '
+                '"futures" package on python 2'
+            )
+
+        if self._hedge_executor is None:
+            self._hedge_executor = futures.ThreadPoolExecutor(
+                max(self.replicas, 2) * 4
+            )
+
+        replicas = {}
+        missing = []
+        for key in keys:
+            clients = self._get_clients(key)
+            if clients:
+                replicas[key] = clients
+            else:
+                missing.append(key)
+
+        pending = {}
+
+        def submit(index, keys):
+            client_batches = {}
+            for key in keys:
+                if len(replicas[key]) <= index:
+                    continue
+                client = replicas[key][index]
+                if client.server not in client_batches:
+                    client_batches[client.server] = []
+                client_batches[client.server].append(key)
+
+            for server, keys in client_batches.items():
+                client = self.clients['%s:%s' % server]
+                future = self._hedge_executor.submit(
+                    self._hedge_call, client, keys
+                )
+                pending[future] = keys
+
+        submit(0, replicas)
+        delay = self.hedge_delay
+        if delay is None:
+            delay = self._read_latency.value() or DEFAULT_HEDGE_DELAY
+        deadline = time.time() + delay
+        hedged = False
+        end = {}
+        done_keys = set()
+        error = None
+
+        while pending and len(done_keys) < len(replicas):
+            timeout = None
+            if not hedged:
+                timeout = max(deadline - time.time(), 0)
+            done, _ = futures.wait(list(pending), timeout,
+                                   return_when=futures.FIRST_COMPLETED)
+
+            failed = False
+            for future in done:
+                batch_keys = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = error or e
+                    result = _NO_REPLY
+                if result is _NO_REPLY:
+                    failed = True
+                    continue
+                for key in batch_keys:
+                    if key not in done_keys:
+                        done_keys.add(key)
+                        if key in result:
+                            end[key] = result[key]
+
+            if not hedged and (failed or time.time() >= deadline):
+                hedged = True
+                submit(1, [k for k in replicas if k not in done_keys])
+
+        if error is not None and len(done_keys) < len(replicas):
+            raise error
+
+        return end, missing
+
+    def _hedge_call(self, client, keys):
+        start = time.time()
+        result = self._safely_run_func(client, client.get_many, _NO_REPLY,
+                                       keys)
+        if result is not _NO_REPLY:
+            self._read_latency.add(time.time() - start)
+        return result
+
     def add(self, key, *args, **kwargs):
-        return self._run_cmd('add', key, False, *args, **kwargs)
+        return self._run_invalidating('add', key, False, *args, **kwargs)
 
     def prepend(self, key, *args, **kwargs):
-        return self._run_cmd('prepend', key, False, *args, **kwargs)
+        return self._run_invalidating('prepend', key, False, *args, **kwargs)
 
     def append(self, key, *args, **kwargs):
-        return self._run_cmd('append', key, False, *args, **kwargs)
+        return self._run_invalidating('append', key, False, *args, **kwargs)
 
     def delete(self, key, *args, **kwargs):
-        return self._run_cmd('delete', key, False, *args, **kwargs)
+        if self._migration is not None:
+            self._delete_from_previous_owners([key])
+        return self._run_replicated('delete', key, False, *args, **kwargs)
 
     def delete_many(self, keys, *args, **kwargs):
-        for key in keys:
-            self._run_cmd('delete', key, False, *args, **kwargs)
+        if self.hot_keys is not None:
+            self.hot_keys.invalidate_many(keys)
+        if self._migration is not None:
+            self._delete_from_previous_owners(keys)
+
+        client_batches, _ = self._group_keys(keys, replicated=True)
+        self._run_grouped('delete_many', client_batches, False, args, kwargs)
         return True
 
     delete_multi = delete_many
 
+    def touch(self, key, *args, **kwargs):
+        return self._run_cmd('touch', key, False, *args, **kwargs)
+
+    def touch_many(self, keys, *args, **kwargs):
+        client_batches, missing = self._group_keys(keys)
+        end = dict((key, False) for key in missing)
+
+        for keys in client_batches.values():
+            end.update(dict((key, False) for key in keys))
+
+        for result in self._run_grouped('touch_many', client_batches, {},
+                                        args, kwargs):
+            end.update(result)
+
+        return end
+
+    def incr_many(self, values, *args, **kwargs):
+        if self.hot_keys is not None:
+            self.hot_keys.invalidate_many(values)
+
+        client_batches, missing = self._group_keys(values)
+        end = dict((key, False) for key in missing)
+
+        for server, keys in client_batches.items():
+            end.update(dict((key, False) for key in keys))
+            client_batches[server] = dict((key, values[key]) for key in keys)
+
+        for result in self._run_grouped('incr_many', client_batches, {},
+                                        args, kwargs):
+            end.update(result)
+
+        self._invalidate_replicas(values)
+        return end
+
     def cas(self, key, *args, **kwargs):
-        return self._run_cmd('cas', key, False, *args, **kwargs)
+        return self._run_invalidating('cas', key, False, *args, **kwargs)
 
     def replace(self, key, *args, **kwargs):
-        return self._run_cmd('replace', key, False, *args, **kwargs)
+        return self._run_invalidating('replace', key, False, *args, **kwargs)
 
     def flush_all(self):
+        if self.hot_keys is not None:
+            self.hot_keys.clear()
         for _, client in self.clients.items():
             self._safely_run_func(client, client.flush_all, False)
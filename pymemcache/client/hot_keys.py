@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+
+
+class HotKeyCache(object):
+    """
+    Detects hot keys from a sample of reads and serves them from memory.
+
+    A ``sample_rate`` share of the looked up keys is counted with the
+    space-saving algorithm, which tracks at most ``capacity`` keys. A key is
+    hot when its count is at least ``threshold`` of all the sampled reads
+    (once ``min_samples`` reads were sampled). Values of hot keys are kept
+    in process for ``ttl`` seconds, so other clients' writes to them are
+    only seen once that expires. Counts are halved every ``decay_interval``
+    seconds so keys cool down once they stop being read.
+    """
+    def __init__(self, capacity=100, threshold=0.01, ttl=1,
+                 sample_rate=0.01, min_samples=100, decay_interval=60):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.sample_rate = sample_rate
+        self.min_samples = min_samples
+        self.decay_interval = decay_interval
+        self.hits = 0
+        self.misses = 0
+        self._counts = {}
+        self._sampled = 0
+        self._cache = {}
+        self._last_decay = time.time()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """
+        Returns a tuple of (found, value) for key.
+        """
+        if random.random() < self.sample_rate:
+            self._sample(key)
+
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            self.hits += 1
+            return True, entry[1]
+        self.misses += 1
+        return False, None
+
+    def lookup_many(self, keys):
+        """
+        Returns the keys that were not found and a dict of the found ones.
+        """
+        remaining = []
+        found = {}
+        for key in keys:
+            hit, value = self.lookup(key)
+            if hit:
+                found[key] = value
+            else:
+                remaining.append(key)
+        return remaining, found
+
+    def store(self, key, value):
+        if not self.is_hot(key):
+            return
+        with self._lock:
+            self._cache[key] = (time.time() + self.ttl, value)
+
+    def store_many(self, values):
+        for key, value in values.items():
+            self.store(key, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def invalidate_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def is_hot(self, key):
+        count = self._counts.get(key)
+        return (
+            count is not None and
+            self._sampled >= self.min_samples and
+            count >= self.threshold * self._sampled
+        )
+
+    def hot_keys(self):
+        """
+        Returns a list of (key, estimated share of reads) for the hot keys,
+        hottest first.
+        """
+        with self._lock:
+            sampled = float(self._sampled)
+            keys = [
+                (key, count / sampled)
+                for key, count in self._counts.items()
+                if self.is_hot(key)
+            ]
+        return sorted(keys, key=lambda item: item[1], reverse=True)
+
+    def _sample(self, key):
+        with self._lock:
+            now = time.time()
+            if now - self._last_decay > self.decay_interval:
+                self._decay(now)
+
+            self._sampled += 1
+            if key in self._counts:
+                self._counts[key] += 1
+            elif len(self._counts) < self.capacity:
+                self._counts[key] = 1
+            else:
+                # space-saving: the new key takes over the smallest counter
+                smallest = min(self._counts, key=self._counts.get)
+                count = self._counts.pop(smallest)
+                self._cache.pop(smallest, None)
+                self._counts[key] = count + 1
+
+    def _decay(self, now):
+        self._last_decay = now
+        self._sampled //= 2
+        for key in list(self._counts):
+            self._counts[key] //= 2
+            if not self._counts[key]:
+                del self._counts[key]
+                self._cache.pop(key, None)
+        for key, (expires, _) in list(self._cache.items()):
+            if expires <= now:
+                del self._cache[key]
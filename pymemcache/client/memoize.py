@@ -0,0 +1,141 @@
+"""
+Decorators caching the results of functions in memcached.
+
+``memoize`` caches the result of each call, keyed by its arguments::
+
+    @memoize(client, expire=300)
+    def load_user(user_id):
+        ...
+
+``memoize_many`` is for functions taking a list of ids and returning a dict
+of id to result. They are called once with all of the ids that aren't
+cached, after a single ``get_many``::
+
+    @memoize_many(client, expire=300)
+    def load_users(user_ids):
+        ...
+
+Keys are made of a prefix, the module and name of the function by default,
+and of the arguments, rendered by ``key_fn``. Keys that the client's
+``check_key`` rejects, because they are too long or contain spaces for
+instance, are replaced by a hash of themselves.
+"""
+import functools
+import hashlib
+
+import six
+
+from pymemcache.client.read_through import _MISSING, _found
+from pymemcache.exceptions import MemcacheIllegalInputError
+from pymemcache.serde import ABSENT
+
+
+def default_key_fn(*args, **kwargs):
+    """
+    Renders the arguments of a call as a string, with ``repr``.
+    """
+    parts = [repr(arg) for arg in args]
+    parts.extend('%s=%r' % item for item in sorted(kwargs.items()))
+    return ','.join(parts)
+
+
+def _prefix(func, prefix):
+    if prefix is not None:
+        return prefix
+    return '%s.%s' % (func.__module__, func.__name__)
+
+
+def make_key(client, prefix, args_key):
+    """
+    Returns the key ``prefix:args_key``, or ``prefix:<sha1 of args_key>``
+    when the client's ``check_key`` rejects the former, as bytes.
+    """
+    if isinstance(prefix, six.text_type):
+        prefix = prefix.encode('utf8')
+    if isinstance(args_key, six.text_type):
+        args_key = args_key.encode('utf8')
+
+    key = prefix + b':' + args_key
+    try:
+        client.check_key(key)
+        return key
+    except MemcacheIllegalInputError:
+        pass
+
+    key = prefix + b':' + hashlib.sha1(args_key).hexdigest().encode('ascii')
+    client.check_key(key)
+    return key
+
+
+def memoize(client, expire=0, key_fn=default_key_fn, prefix=None):
+    """
+    Caches the results of the decorated function in ``client`` for
+    ``expire`` seconds, keyed by ``key_fn(*args, **kwargs)``. None results
+    aren't cached.
+    """
+    def decorator(func):
+        func_prefix = _prefix(func, prefix)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(client, func_prefix, key_fn(*args, **kwargs))
+            value = client.get(key, _MISSING)
+            if value is not _MISSING and value is not ABSENT:
+                return value
+
+            value = func(*args, **kwargs)
+            if value is not None:
+                client.set(key, value, expire=expire)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def memoize_many(client, expire=0, key_fn=default_key_fn, prefix=None):
+    """
+    Caches the results of a function taking a list of ids, and returning a
+    dict of id to result, in ``client`` for ``expire`` seconds.
+
+    Each id is cached under ``key_fn(id, *args, **kwargs)``, with the other
+    arguments of the call. The function is only called with the ids that
+    weren't cached, and not at all when they all were. Ids missing from, or
+    None in, the dicts it returns aren't cached.
+    """
+    def decorator(func):
+        func_prefix = _prefix(func, prefix)
+
+        @functools.wraps(func)
+        def wrapper(ids, *args, **kwargs):
+            keys = dict(
+                (id_, make_key(client, func_prefix,
+                               key_fn(id_, *args, **kwargs)))
+                for id_ in ids
+            )
+            found = _found(client, client.get_many(list(set(keys.values()))))
+
+            result = {}
+            missing = []
+            for id_, key in six.iteritems(keys):
+                value = found.get(key, _MISSING)
+                if value is not _MISSING and value is not ABSENT:
+                    result[id_] = value
+                else:
+                    missing.append(id_)
+
+            if missing:
+                computed = func(missing, *args, **kwargs)
+                values = dict(
+                    (keys[id_], value)
+                    for id_, value in six.iteritems(computed)
+                    if id_ in keys and value is not None
+                )
+                if values:
+                    client.set_many(values, expire=expire)
+                result.update(computed)
+            return result
+
+        return wrapper
+
+    return decorator
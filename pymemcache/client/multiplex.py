@@ -0,0 +1,173 @@
+"""
+Single threaded, non-blocking I/O across many memcached servers.
+
+Each :py:class:`.Request` holds the full (possibly pipelined) command for one
+server and an incremental parser for its response. ``run_requests`` writes
+every command to its socket and multiplexes the reads with ``selectors``, so
+the batches of a multi-server call are in flight at the same time.
+"""
+import errno
+import socket
+import time
+
+try:
+    import selectors
+except ImportError:
+    try:
+        import selectors34 as selectors
+    except ImportError:
+        selectors = None
+
+from pymemcache.client.base import RECV_SIZE
+from pymemcache.exceptions import MemcacheUnexpectedCloseError
+
+
+RETRY_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class Request(object):
+    """
+    A command sent to the server of ``client`` on its own socket.
+
+    After ``run_requests`` returns either ``error`` is set, and the client
+    has been closed, or ``parser.result`` holds the response and
+    ``duration`` the time it took to get it, in seconds.
+    """
+    def __init__(self, client, cmd, parser):
+        self.client = client
+        self.cmd = cmd
+        self.parser = parser
+        self.error = None
+        self.deadline = None
+        self.started = None
+        self.duration = None
+        self._sent = 0
+        self._chunks = []
+        self._received = 0
+
+    @property
+    def sock(self):
+        return self.client.sock
+
+    @property
+    def sending(self):
+        return self._sent < len(self.cmd)
+
+    @property
+    def finished(self):
+        return self.error is not None or (
+            not self.sending and self.parser.done
+        )
+
+    def start(self):
+        self.started = time.time()
+        self.client._ensure_connected()
+        self.client.sock.setblocking(False)
+        self._touch()
+
+    def write(self):
+        try:
+            self._sent += self.sock.send(self.cmd[self._sent:])
+        except socket.error as e:
+            if e.errno not in RETRY_ERRNOS:
+                raise
+        self._touch()
+
+    def read(self):
+        try:
+            data = self.sock.recv(RECV_SIZE)
+        except socket.error as e:
+            if e.errno not in RETRY_ERRNOS:
+                raise
+            return
+        if not data:
+            raise MemcacheUnexpectedCloseError()
+        self._touch()
+
+        # Avoid copying the buffer for every chunk of a large value, only
+        # hand the data to the parser once it can make progress.
+        self._chunks.append(data)
+        self._received += len(data)
+        if self._received >= self.parser.wanted:
+            buf = self.parser.feed(b''.join(self._chunks))
+            self._chunks = [buf]
+            self._received = len(buf)
+
+    def fail(self, error):
+        self.error = error
+        self.client.close()
+
+    def finish(self):
+        if self.error is None:
+            self.client.sock.settimeout(self.client.timeout)
+
+    def _touch(self):
+        if self.client.timeout is not None:
+            self.deadline = time.time() + self.client.timeout
+
+
+def run_requests(requests):
+    """
+    Runs every request to completion (or failure) on the calling thread.
+
+    The ``timeout`` of each request's client bounds how long it may go
+    without making any progress, as it would for blocking socket calls.
+    """
+    if selectors is None:
+        raise ImportError(
+            'selectors is required, install the "selectors34" package on '
+            'python 2'
+        )
+
+    selector = selectors.DefaultSelector()
+    pending = set()
+    try:
+        for request in requests:
+            try:
+                request.start()
+            except Exception as e:
+                request.fail(e)
+                continue
+            events = selectors.EVENT_READ
+            if request.sending:
+                events |= selectors.EVENT_WRITE
+            selector.register(request.sock, events, request)
+            pending.add(request)
+
+        while pending:
+            deadlines = [r.deadline for r in pending if r.deadline is not None]
+            wait = None
+            if deadlines:
+                wait = max(min(deadlines) - time.time(), 0)
+
+            for key, mask in selector.select(wait):
+                request = key.data
+                try:
+                    if mask & selectors.EVENT_WRITE:
+                        request.write()
+                        if not request.sending:
+                            selector.modify(request.sock,
+                                            selectors.EVENT_READ, request)
+                    if mask & selectors.EVENT_READ:
+                        request.read()
+                except Exception as e:
+                    selector.unregister(request.sock)
+                    request.fail(e)
+
+            now = time.time()
+            for request in list(pending):
+                if request.finished:
+                    if request.error is None:
+                        request.duration = now - request.started
+                        selector.unregister(request.sock)
+                    pending.discard(request)
+                elif request.deadline is not None and now > request.deadline:
+                    selector.unregister(request.sock)
+                    request.fail(socket.timeout('timed out'))
+                    pending.discard(request)
+    finally:
+        for request in pending:
+            request.fail(MemcacheUnexpectedCloseError())
+        selector.close()
+        for request in requests:
+            request.finish()
@@ -0,0 +1,176 @@
+import threading
+import time
+
+import six
+
+from pymemcache.client.read_through import _found
+from pymemcache.exceptions import MemcacheError
+from pymemcache.serde import ABSENT
+
+
+def _to_bytes(key):
+    if isinstance(key, six.text_type):
+        return key.encode('utf8')
+    return key
+
+
+class Namespace(object):
+    """
+    A group of keys that can be invalidated at once.
+
+    Keys are stored under ``<name>:<generation>:<key>`` in ``client``, where
+    the generation is a counter stored under ``<name>``. ``invalidate``
+    increments the counter, so the keys of the previous generation aren't
+    read anymore and expire or get evicted on their own.
+
+    The generation is cached in process for ``generation_ttl`` seconds, so
+    invalidations take up to that long to be seen by other clients. Once it
+    expires it is fetched again in the same ``get_many`` as the keys read,
+    using the cached generation, and the keys are only read a second time
+    when it changed meanwhile.
+
+    The counter starts from the current time in milliseconds, rather than
+    from 0, so the generations of a counter that was evicted are not reused.
+    """
+
+    def __init__(self, client, name, generation_ttl=1):
+        self.client = client
+        self.name = _to_bytes(name)
+        self.generation_ttl = generation_ttl
+        self._generation = None
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def _cached_generation(self):
+        """
+        Returns the cached generation and whether it is still fresh.
+        """
+        with self._lock:
+            return self._generation, time.time() < self._expires
+
+    def _remember(self, generation):
+        with self._lock:
+            self._generation = generation
+            self._expires = time.time() + self.generation_ttl
+
+    def _parse(self, value):
+        if value is None or value is False:
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _fetch_generation(self):
+        generation = self._parse(self.client.get(self.name))
+        if generation is None:
+            initial = str(int(time.time() * 1000)).encode('ascii')
+            self.client.add(self.name, initial, noreply=False)
+            generation = self._parse(self.client.get(self.name))
+            if generation is None:
+                # the servers are failing, don't remember it
+                return int(initial)
+        self._remember(generation)
+        return generation
+
+    def generation(self):
+        """
+        Returns the current generation of the namespace.
+        """
+        generation, fresh = self._cached_generation()
+        if fresh:
+            return generation
+        return self._fetch_generation()
+
+    def key(self, key, generation=None):
+        """
+        Returns the key under which key is stored in the namespace.
+        """
+        if generation is None:
+            generation = self.generation()
+        return (self.name + b':' + str(generation).encode('ascii') + b':' +
+                _to_bytes(key))
+
+    def invalidate(self):
+        """
+        Starts a new generation, all of the keys stored so far are dropped.
+
+        Raises a MemcacheError when the counter couldn't be incremented,
+        which clients with ``ignore_exc`` report by returning False.
+        """
+        generation = self.client.incr(self.name, 1, noreply=False)
+        if generation is None:
+            # the counter was evicted, start a new one
+            self._fetch_generation()
+        elif (
+            isinstance(generation, bool) or
+            not isinstance(generation, six.integer_types)
+        ):
+            raise MemcacheError('Invalidating namespace %r failed' %
+                                (self.name,))
+        else:
+            self._remember(generation)
+
+    def get(self, key, default=None):
+        result = self.get_many([key])
+        return result.get(key, default)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        generation, fresh = self._cached_generation()
+        if generation is None:
+            generation = self._fetch_generation()
+            fresh = True
+
+        names = dict((self.key(key, generation), key) for key in keys)
+        if fresh:
+            found = self.client.get_many(list(names))
+        else:
+            found = self.client.get_many([self.name] + list(names))
+            current = self._parse(found.pop(self.name, None))
+            if current is None:
+                current = self._fetch_generation()
+            else:
+                self._remember(current)
+            if current != generation:
+                names = dict((self.key(key, current), key) for key in keys)
+                found = self.client.get_many(list(names))
+
+        return dict(
+            (names[name], value)
+            for name, value in six.iteritems(_found(self.client, found))
+            if name in names and value is not ABSENT
+        )
+
+    get_multi = get_many
+
+    def set(self, key, value, *args, **kwargs):
+        return self.client.set(self.key(key), value, *args, **kwargs)
+
+    def set_many(self, values, *args, **kwargs):
+        generation = self.generation()
+        values = dict((self.key(key, generation), value)
+                      for key, value in six.iteritems(values))
+        return self.client.set_many(values, *args, **kwargs)
+
+    set_multi = set_many
+
+    def add(self, key, value, *args, **kwargs):
+        return self.client.add(self.key(key), value, *args, **kwargs)
+
+    def delete(self, key, *args, **kwargs):
+        return self.client.delete(self.key(key), *args, **kwargs)
+
+    def delete_many(self, keys, *args, **kwargs):
+        generation = self.generation()
+        return self.client.delete_many(
+            [self.key(key, generation) for key in keys], *args, **kwargs
+        )
+
+    delete_multi = delete_many
+
+    def incr(self, key, *args, **kwargs):
+        return self.client.incr(self.key(key), *args, **kwargs)
+
+    def decr(self, key, *args, **kwargs):
+        return self.client.decr(self.key(key), *args, **kwargs)
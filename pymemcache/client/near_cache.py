@@ -0,0 +1,254 @@
+import collections
+import sys
+import threading
+import time
+
+import six
+
+from pymemcache.client.read_through import _MISSING
+from pymemcache.serde import ABSENT
+
+
+def _normalize_key(key):
+    if isinstance(key, six.text_type):
+        return key.encode('utf8')
+    return key
+
+
+def _default_sizeof(value):
+    if isinstance(value, (bytes, six.text_type)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class NearCacheClient(object):
+    """
+    Serves reads from an in-process cache in front of another client.
+
+    Wraps a :py:class:`.Client`, :py:class:`.PooledClient` or
+    :py:class:`.HashClient`. ``get`` and ``get_many`` return the values
+    cached locally and only send the keys that aren't to ``client``. Values
+    are kept for ``ttl`` seconds, which is either a number or a callable
+    taking the key and returning its ttl (None to not cache it). The least
+    recently used values are evicted beyond ``max_items`` values or
+    ``max_bytes`` bytes, as measured by ``sizeof`` (lengths of bytes and
+    strings, ``sys.getsizeof`` of other values, by default).
+
+    Writes through this client drop the value from the local cache, but
+    writes by other clients and processes are only seen once it expires, so
+    ``ttl`` bounds how stale reads can be. None and False values, which
+    clients return when servers fail, aren't cached.
+
+    With ``negative_ttl``, misses are cached for that many seconds as well,
+    so reads of keys that are known to be absent don't reach memcached.
+    Clients with ``ignore_exc`` return failed reads as misses, so they are
+    rejected with it. :py:class:`.HashClient` does the same for the keys of
+    servers it skips while they are failing, whose misses are cached too,
+    so ``negative_ttl`` should be kept short with it.
+    Values stored as :py:data:`~pymemcache.serde.ABSENT` are read as misses
+    and cached as such for ``ttl`` seconds.
+
+    Other methods are passed through to ``client``.
+    """
+
+    def __init__(self, client, ttl=60, max_items=1000, max_bytes=None,
+                 sizeof=_default_sizeof, negative_ttl=None):
+        if max_items is not None and max_items <= 0:
+            raise ValueError('"max_items" must be a positive integer')
+        if negative_ttl and getattr(client, 'ignore_exc', False):
+            raise ValueError('"negative_ttl" requires a client without '
+                             '"ignore_exc", its misses may be failures')
+        self.client = client
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # key -> (expires, size, value), least recently used first
+        self._values = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _lookup(self, key, now):
+        entry = self._values.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= now:
+            self._pop(key)
+            return _MISSING
+        # move it to the most recently used end
+        del self._values[key]
+        self._values[key] = entry
+        return entry[2]
+
+    def _store(self, key, value, now, ttl=None):
+        if value is None or value is False:
+            return
+        if ttl is None:
+            ttl = self.ttl(key) if callable(self.ttl) else self.ttl
+        if not ttl:
+            return
+        size = 0 if value is ABSENT else self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self._pop(key)
+        self._values[key] = (now + ttl, size, value)
+        self.bytes += size
+        while (
+            (self.max_items is not None and
+             len(self._values) > self.max_items) or
+            (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            self._pop(next(iter(self._values)))
+            self.evictions += 1
+
+    def _pop(self, key):
+        entry = self._values.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._pop(_normalize_key(key))
+
+    def invalidate_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pop(_normalize_key(key))
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.bytes = 0
+
+    def near_cache_stats(self):
+        """
+        Returns a dict of the local cache's sizes and counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._values),
+                'bytes': self.bytes,
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            }
+
+    def get(self, key, default=None):
+        local_key = _normalize_key(key)
+        with self._lock:
+            value = self._lookup(local_key, time.time())
+            if value is not _MISSING:
+                self.hits += 1
+                return default if value is ABSENT else value
+            self.misses += 1
+
+        value = self.client.get(key, _MISSING)
+        if value is _MISSING:
+            if self.negative_ttl:
+                with self._lock:
+                    self._store(local_key, ABSENT, time.time(),
+                                self.negative_ttl)
+            return default
+        with self._lock:
+            self._store(local_key, value, time.time())
+        return default if value is ABSENT else value
+
+    def get_many(self, keys):
+        found = {}
+        remaining = []
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                value = self._lookup(_normalize_key(key), now)
+                if value is _MISSING:
+                    remaining.append(key)
+                    continue
+                self.hits += 1
+                if value is not ABSENT:
+                    found[key] = value
+            self.misses += len(remaining)
+
+        if not remaining:
+            return found
+
+        fetched = self.client.get_many(remaining)
+        with self._lock:
+            now = time.time()
+            for key in remaining:
+                value = fetched.get(key, _MISSING)
+                if value is not _MISSING:
+                    self._store(_normalize_key(key), value, now)
+                elif self.negative_ttl:
+                    self._store(_normalize_key(key), ABSENT, now,
+                                self.negative_ttl)
+        for key, value in six.iteritems(fetched):
+            if value is not ABSENT:
+                found[key] = value
+        return found
+
+    get_multi = get_many
+
+    def _write(self, cmd, keys, *args, **kwargs):
+        # dropped again afterwards in case a concurrent get stored the old
+        # value meanwhile
+        self.invalidate_many(keys)
+        try:
+            return getattr(self.client, cmd)(*args, **kwargs)
+        finally:
+            self.invalidate_many(keys)
+
+    def set(self, key, *args, **kwargs):
+        return self._write('set', [key], key, *args, **kwargs)
+
+    def set_many(self, values, *args, **kwargs):
+        return self._write('set_many', values, values, *args, **kwargs)
+
+    set_multi = set_many
+
+    def add(self, key, *args, **kwargs):
+        return self._write('add', [key], key, *args, **kwargs)
+
+    def replace(self, key, *args, **kwargs):
+        return self._write('replace', [key], key, *args, **kwargs)
+
+    def append(self, key, *args, **kwargs):
+        return self._write('append', [key], key, *args, **kwargs)
+
+    def prepend(self, key, *args, **kwargs):
+        return self._write('prepend', [key], key, *args, **kwargs)
+
+    def cas(self, key, *args, **kwargs):
+        return self._write('cas', [key], key, *args, **kwargs)
+
+    def delete(self, key, *args, **kwargs):
+        return self._write('delete', [key], key, *args, **kwargs)
+
+    def delete_many(self, keys, *args, **kwargs):
+        return self._write('delete_many', keys, keys, *args, **kwargs)
+
+    delete_multi = delete_many
+
+    def incr(self, key, *args, **kwargs):
+        return self._write('incr', [key], key, *args, **kwargs)
+
+    def decr(self, key, *args, **kwargs):
+        return self._write('decr', [key], key, *args, **kwargs)
+
+    def incr_many(self, values, *args, **kwargs):
+        return self._write('incr_many', values, values, *args, **kwargs)
+
+    def flush_all(self, *args, **kwargs):
+        self.clear()
+        return self.client.flush_all(*args, **kwargs)
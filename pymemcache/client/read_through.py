@@ -0,0 +1,304 @@
+import logging
+import math
+import random
+import time
+
+import six
+
+from pymemcache.serde import ABSENT, Envelope
+
+logger = logging.getLogger(__name__)
+
+# Passed as the default of get to tell misses apart from stored values.
+# Defined here, as the clients of base.py import this module, and shared
+# with them and the other wrappers.
+_MISSING = object()
+
+LOCK_SUFFIX = b'.lock'
+XFETCH_SUFFIX = b'.xfetch'
+
+
+def _suffixed(key, suffix):
+    if isinstance(key, six.text_type):
+        return key + suffix.decode('ascii')
+    return key + suffix
+
+
+def _present(value):
+    return None if value is ABSENT else value
+
+
+def _found(client, values):
+    """
+    Drops the False values that HashClient.get_many returns for the keys of
+    servers that are down. They can't be told apart from stored False
+    values, so they are read again with get, which returns its default on
+    failures.
+    """
+    found = {}
+    for key, value in six.iteritems(values):
+        if value is False:
+            value = client.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+        found[key] = value
+    return found
+
+
+def _should_recompute(meta, beta, now):
+    """
+    XFetch: recompute ahead of the expiry with a probability that grows as
+    it gets closer, scaled by how long the value took to compute.
+    """
+    if meta is None:
+        return False
+    if isinstance(meta, bytes):
+        meta = meta.decode('ascii', 'replace')
+    try:
+        delta, expiry = [float(part) for part in meta.split()]
+    except (AttributeError, ValueError):
+        return False
+    # 1 - random() is in (0, 1], so the log is defined
+    return now - delta * beta * math.log(1 - random.random()) >= expiry
+
+
+class ReadThroughMixin(object):
+    """
+    ``get_or_set`` and ``get_many_or_set`` read-through methods, built on a
+    client's ``get``, ``get_many``, ``add``, ``set``, ``set_many`` and
+    ``delete``.
+
+    On a miss only the caller that manages to ``add`` the key's lock key
+    runs the loader, so a single process across the cluster rebuilds a
+    value. Other callers poll for the value for up to ``lock_wait`` seconds,
+    and load it themselves after that, or right away when the lock can't be
+    read either, which happens when the servers are failing.
+
+    With ``beta`` each value is stored with the time it took to compute and
+    its expiry, in a ``.xfetch`` key, and is recomputed early with the XFetch
+    probability (beta=1 is the usual choice, higher values recompute
+    earlier). Callers that don't get the lock keep serving the current
+    value meanwhile. It needs an ``expire``.
+
+    ``get_or_refresh`` serves values past their soft expiry, with clients
+    using an :py:class:`.EnvelopeSerde`, while they are refreshed.
+
+    With ``negative_expire``, keys the loaders return None for, or leave
+    out, are stored as :py:data:`~pymemcache.serde.ABSENT` for that many
+    seconds, and read as None without calling the loaders again. It needs a
+    serializer that handles it, like the ones of :py:mod:`pymemcache.serde`,
+    clients without a serializer raise a MemcacheIllegalInputError. None
+    values are never stored otherwise.
+    """
+
+    def get_or_set(self, key, loader, expire=0, beta=None, lock_expire=30,
+                   lock_wait=5, poll_interval=0.05, negative_expire=None):
+        """
+        Returns the value of key, calling ``loader()`` and storing its result
+        when it is missing.
+        """
+        use_xfetch = beta is not None and expire
+        if use_xfetch:
+            meta_key = _suffixed(key, XFETCH_SUFFIX)
+            found = _found(self, self.get_many([key, meta_key]))
+            value = found.get(key, _MISSING)
+            if value is not _MISSING and not _should_recompute(
+                found.get(meta_key), beta, time.time()
+            ):
+                return _present(value)
+        else:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return _present(value)
+
+        stale = value
+        lock_key = _suffixed(key, LOCK_SUFFIX)
+        deadline = time.time() + lock_wait
+        while True:
+            if self.add(lock_key, b'1', expire=lock_expire, noreply=False):
+                try:
+                    return self._load(key, loader, expire, use_xfetch,
+                                      negative_expire)
+                finally:
+                    self.delete(lock_key, noreply=True)
+
+            if stale is not _MISSING:
+                return _present(stale)
+            if self.get(lock_key) is None or time.time() >= deadline:
+                return self._load(key, loader, expire, use_xfetch,
+                                  negative_expire)
+
+            time.sleep(poll_interval)
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return _present(value)
+
+    def _load(self, key, loader, expire, use_xfetch, negative_expire):
+        start = time.time()
+        value = loader()
+        if value is None:
+            if negative_expire:
+                self.set(key, ABSENT, expire=negative_expire)
+        elif use_xfetch:
+            now = time.time()
+            meta = '%r %r' % (now - start, now + expire)
+            self.set_many({
+                key: value,
+                _suffixed(key, XFETCH_SUFFIX): meta.encode('ascii'),
+            }, expire=expire)
+        else:
+            self.set(key, value, expire=expire)
+        return value
+
+    def get_many_or_set(self, keys, batch_loader, expire=0, beta=None,
+                        lock_expire=30, lock_wait=5, poll_interval=0.05,
+                        negative_expire=None):
+        """
+        Returns a dict of the values of keys, calling
+        ``batch_loader(missing_keys)`` for the missing ones. It returns a
+        dict of the values it found, which are stored.
+        """
+        keys = list(keys)
+        use_xfetch = beta is not None and expire
+        if use_xfetch:
+            meta_keys = dict((key, _suffixed(key, XFETCH_SUFFIX))
+                             for key in keys)
+            found = _found(self, self.get_many(keys + list(meta_keys.values())))
+            now = time.time()
+            result = {}
+            stale = {}
+            for key in keys:
+                if key not in found:
+                    continue
+                if _should_recompute(found.get(meta_keys[key]), beta, now):
+                    stale[key] = found[key]
+                else:
+                    result[key] = found[key]
+        else:
+            result = _found(self, self.get_many(keys))
+            stale = {}
+
+        missing = [key for key in keys if key not in result]
+        deadline = time.time() + lock_wait
+        while missing:
+            locked = []
+            waiting = []
+            for key in missing:
+                lock_key = _suffixed(key, LOCK_SUFFIX)
+                if self.add(lock_key, b'1', expire=lock_expire,
+                            noreply=False):
+                    locked.append(key)
+                elif key in stale:
+                    result[key] = stale[key]
+                else:
+                    waiting.append(key)
+
+            if locked:
+                try:
+                    result.update(self._load_many(locked, batch_loader,
+                                                  expire, use_xfetch,
+                                                  negative_expire))
+                finally:
+                    self.delete_many(
+                        [_suffixed(key, LOCK_SUFFIX) for key in locked],
+                        noreply=True
+                    )
+
+            if not waiting:
+                break
+
+            lock_keys = [_suffixed(key, LOCK_SUFFIX) for key in waiting]
+            locks = _found(self, self.get_many(lock_keys))
+            if not locks or time.time() >= deadline:
+                result.update(self._load_many(waiting, batch_loader, expire,
+                                              use_xfetch, negative_expire))
+                break
+
+            time.sleep(poll_interval)
+            result.update(_found(self, self.get_many(waiting)))
+            missing = [key for key in waiting if key not in result]
+
+        return dict((key, value) for key, value in six.iteritems(result)
+                    if value is not ABSENT)
+
+    def _load_many(self, keys, batch_loader, expire, use_xfetch,
+                   negative_expire):
+        start = time.time()
+        values = batch_loader(keys) or {}
+        if negative_expire:
+            absent = dict((key, ABSENT) for key in keys
+                          if values.get(key) is None)
+            if absent:
+                self.set_many(absent, expire=negative_expire)
+        values = dict((key, value) for key, value in six.iteritems(values)
+                      if value is not None)
+        if not values:
+            return {}
+
+        to_set = dict(values)
+        if use_xfetch:
+            now = time.time()
+            meta = ('%r %r' % (now - start, now + expire)).encode('ascii')
+            for key in values:
+                to_set[_suffixed(key, XFETCH_SUFFIX)] = meta
+        self.set_many(to_set, expire=expire)
+        return values
+
+    def get_or_refresh(self, key, loader, expire=0, lock_expire=30,
+                       lock_wait=5, poll_interval=0.05,
+                       negative_expire=None):
+        """
+        Stale-while-revalidate read, for clients using an
+        :py:class:`.EnvelopeSerde`.
+
+        Returns the value of key, which is loaded as with ``get_or_set``
+        when it is missing. Once the value is past its soft expiry, it is
+        still returned but the caller that takes the lock key refreshes it,
+        on the client's ``command_executor`` when it has one, which only
+        the clients with pooled connections do. Clients that can't be
+        shared with another thread, like :py:class:`.Client` or a
+        :py:class:`.HashClient` without ``use_pooling``, refresh it before
+        returning. Errors of the loader
+        during refreshes are logged and the stale value is served.
+        ``expire`` should be longer than the soft ttl.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.get_or_set(key, loader, expire=expire,
+                                    lock_expire=lock_expire,
+                                    lock_wait=lock_wait,
+                                    poll_interval=poll_interval,
+                                    negative_expire=negative_expire)
+        if not isinstance(value, Envelope):
+            return _present(value)
+        stale = _present(value.value)
+        if not value.stale:
+            return stale
+
+        lock_key = _suffixed(key, LOCK_SUFFIX)
+        if not self.add(lock_key, b'1', expire=lock_expire, noreply=False):
+            return stale
+
+        executor = getattr(self, 'command_executor', None)
+        if executor is not None:
+            try:
+                executor.submit(self._refresh, key, loader, expire, lock_key,
+                                negative_expire)
+                return stale
+            except RuntimeError:
+                # queue full, refresh it ourselves
+                pass
+
+        fresh = self._refresh(key, loader, expire, lock_key, negative_expire)
+        if fresh is _MISSING:
+            return stale
+        return fresh
+
+    def _refresh(self, key, loader, expire, lock_key, negative_expire):
+        try:
+            return self._load(key, loader, expire, False, negative_expire)
+        except Exception:
+            logger.exception('refreshing %r failed', key)
+            return _MISSING
+        finally:
+            self.delete(lock_key, noreply=True)
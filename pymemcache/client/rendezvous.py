@@ -1,11 +1,23 @@
+import heapq
+import math
+
 from pymemcache.client.murmur3 import murmur3_32
 
 
+# murmur3_32 produces unsigned 32 bit integers, this is used to map a hash
+# onto the open interval (0, 1) for weighted scoring.
+HASH_SPACE = float(2 ** 32 + 1)
+
+
 class RendezvousHash(object):
     """
         Implements the Highest Random Weight (HRW) hashing algorithm most
         commonly referred to as rendezvous hashing.
 
+        Nodes can optionally be given a weight, in which case the weighted
+        rendezvous score ``-weight / ln(h)`` is used so that every node
+        receives a share of the keys proportional to its weight.
+
         Originally developed as part of python-clandestined.
 
         Copyright (c) 2014 Ernest W. Durbin III
@@ -15,28 +27,50 @@ class RendezvousHash(object):
         Constructor.
         """
         self.nodes = []
+        self.weights = {}
         self.seed = seed
         if nodes is not None:
             self.nodes = nodes
         self.hash_function = lambda x: hash_function(x, seed)
+        self._weighted = False
+
+    def add_node(self, node, weight=1):
+        if weight <= 0:
+            raise ValueError("Weight of node %s must be positive" % (node))
 
-    def add_node(self, node):
         if node not in self.nodes:
             self.nodes.append(node)
+        self.weights[node] = weight
+        self._update_weighted()
 
     def remove_node(self, node):
         if node in self.nodes:
             self.nodes.remove(node)
+            self.weights.pop(node, None)
+            self._update_weighted()
         else:
             raise ValueError("No such node %s to remove" % (node))
 
+    def _update_weighted(self):
+        # When every node has the same weight the weighted score is a
+        # monotonic function of the raw hash, so the (cheaper) unweighted
+        # comparison picks the same winner.
+        weights = set(self.weights.get(node, 1) for node in self.nodes)
+        self._weighted = len(weights) > 1
+
+    def _score(self, node, key):
+        score = self.hash_function("%s-%s" % (node, key))
+        if self._weighted:
+            weight = self.weights.get(node, 1)
+            score = -weight / math.log((score + 1) / HASH_SPACE)
+        return score
+
     def get_node(self, key):
         high_score = -1
         winner = None
 
         for node in self.nodes:
-            score = self.hash_function(
-                "%s-%s" % (node, key))
+            score = self._score(node, key)
 
             if score > high_score:
                 (high_score, winner) = (score, node)
@@ -44,3 +78,13 @@ class RendezvousHash(object):
                 (high_score, winner) = (score, max(str(node), str(winner)))
 
         return winner
+
+    def get_nodes(self, key, count):
+        """
+        Returns up to count nodes for key, best scoring first, the first of
+        them being the node get_node returns.
+        """
+        scores = [
+            (self._score(node, key), str(node), node) for node in self.nodes
+        ]
+        return [node for _, _, node in heapq.nlargest(count, scores)]
@@ -0,0 +1,55 @@
+import sys
+import threading
+
+import six
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key.
+
+    While a call for a key is in flight, other threads calling ``do`` for
+    that key wait for it and share its result, or its exception, instead of
+    making calls of their own. Calls made after it completed start a new
+    one, nothing is cached. ``calls`` counts the calls that were made and
+    ``shared`` those that waited for another one.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._flights.get(key)
+            leader = call is None
+            if leader:
+                call = self._flights[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.exc_info is not None:
+                six.reraise(*call.exc_info)
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            call.done.set()
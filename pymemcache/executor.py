@@ -0,0 +1,168 @@
+"""
+Running commands of the sync clients in a thread pool.
+
+:py:class:`.CommandExecutor` is a ``concurrent.futures`` thread pool with a
+bounded queue, and :py:class:`.FuturesMixin` gives the thread-safe clients
+``submit_*`` methods that run their commands on one and return futures, so
+applications can overlap cache calls with other work::
+
+    future = client.submit_get_many(keys)
+    rows = db.query(...)
+    values = future.result()
+"""
+import threading
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+from pymemcache import fork
+
+
+class CommandExecutor(object):
+    """
+    A pool of ``max_workers`` threads running submitted calls.
+
+    At most ``max_queue`` calls wait for a thread, further submits raise a
+    RuntimeError right away rather than queueing work the threads can't
+    keep up with. The threads are only started on the first submit, and
+    are started again in forked children.
+
+    Requires ``concurrent.futures`` (the ``futures`` package on python 2).
+    """
+
+    def __init__(self, max_workers=4, max_queue=None):
+        if max_workers < 1:
+            raise ValueError('"max_workers" must be a positive integer')
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        fork.register(self)
+
+    def _after_fork(self):
+        # the threads and the calls they were running stay in the parent
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Returns a future of the result of ``func(*args, **kwargs)``.
+        """
+        fork.check(self)
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self.rejected += 1
+                raise RuntimeError('Too many queued commands, %s >= %s'
+                                   % (self._queued, self.max_queue))
+            if self._executor is None:
+                if futures is None:
+                    raise ImportError(
+                        'submitting commands requires concurrent.futures, '
+                        'install the "futures" package on python 2'
+                    )
+                self._executor = futures.ThreadPoolExecutor(self.max_workers)
+            self._queued += 1
+            self.submitted += 1
+            return self._executor.submit(self._run, func, args, kwargs)
+
+    def _run(self, func, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+
+    def stats(self):
+        """
+        Returns a dict of the executor's size, queue depth and counters.
+        """
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queued': self._queued,
+            'running': self._running,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+
+
+class FuturesMixin(object):
+    """
+    ``submit_*`` methods running the commands of a thread-safe client on
+    its ``command_executor``, a :py:class:`.CommandExecutor`. Clients that
+    aren't thread-safe set it to None, and the methods raise a ValueError.
+    """
+
+    def _get_command_executor(self):
+        if self.command_executor is None:
+            raise ValueError('submitting commands requires a thread-safe '
+                             'client, like a HashClient with use_pooling')
+        return self.command_executor
+
+    def submit(self, cmd, *args, **kwargs):
+        """
+        Runs the command named ``cmd`` in the executor, and returns a future
+        of its result.
+        """
+        return self._get_command_executor().submit(getattr(self, cmd), *args,
+                                                   **kwargs)
+
+    def submit_set(self, *args, **kwargs):
+        return self.submit('set', *args, **kwargs)
+
+    def submit_set_many(self, *args, **kwargs):
+        return self.submit('set_many', *args, **kwargs)
+
+    def submit_add(self, *args, **kwargs):
+        return self.submit('add', *args, **kwargs)
+
+    def submit_get(self, *args, **kwargs):
+        return self.submit('get', *args, **kwargs)
+
+    def submit_get_many(self, *args, **kwargs):
+        return self.submit('get_many', *args, **kwargs)
+
+    def submit_gets(self, *args, **kwargs):
+        return self.submit('gets', *args, **kwargs)
+
+    def submit_delete(self, *args, **kwargs):
+        return self.submit('delete', *args, **kwargs)
+
+    def submit_delete_many(self, *args, **kwargs):
+        return self.submit('delete_many', *args, **kwargs)
+
+    def submit_incr(self, *args, **kwargs):
+        return self.submit('incr', *args, **kwargs)
+
+    def submit_decr(self, *args, **kwargs):
+        return self.submit('decr', *args, **kwargs)
+
+    def submit_touch(self, *args, **kwargs):
+        return self.submit('touch', *args, **kwargs)
+
+    def executor_stats(self):
+        """
+        Returns the counters of the command executor, see
+        :py:meth:`.CommandExecutor.stats`.
+        """
+        return self._get_command_executor().stats()
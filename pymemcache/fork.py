@@ -0,0 +1,48 @@
+"""
+Dropping state inherited from the parent process after a fork.
+
+Sockets, locks and threads don't survive a fork: a connection opened in the
+parent is shared with the child and their replies interleave, and locks may
+be held by threads that don't exist in the child. Objects that hold such
+state call ``register`` with themselves when they are created, and
+``check`` before using it. Their ``_after_fork`` method is then called in
+the child, from an ``os.register_at_fork`` handler when available and
+otherwise from ``check`` once it notices the process id changed.
+"""
+import logging
+import os
+import weakref
+
+logger = logging.getLogger(__name__)
+
+AT_FORK = hasattr(os, 'register_at_fork')
+
+_objects = weakref.WeakSet()
+
+
+def register(obj):
+    obj._pid = os.getpid()
+    if AT_FORK:
+        _objects.add(obj)
+
+
+def check(obj):
+    if not AT_FORK and obj._pid != os.getpid():
+        _reset(obj)
+
+
+def _reset(obj):
+    obj._pid = os.getpid()
+    try:
+        obj._after_fork()
+    except Exception:
+        logger.exception('resetting %r after fork failed', obj)
+
+
+def _after_fork_in_child():
+    for obj in list(_objects):
+        _reset(obj)
+
+
+if AT_FORK:
+    os.register_at_fork(after_in_child=_after_fork_in_child)
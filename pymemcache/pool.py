@@ -12,40 +12,116 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import collections
 import contextlib
 import sys
 import threading
+import time
 
 import six
 
+from pymemcache import fork
+
 
 class ObjectPool(object):
-    """A pool of objects that release/creates/destroys as needed."""
+    """A pool of objects that release/creates/destroys as needed.
+
+    Objects are tracked in dicts keyed by their id, so getting and releasing
+    them is O(1). Taking a free object and releasing one only use single
+    dict operations, which are atomic, and don't take the lock; it is only
+    held to create new objects within ``max_size`` and to wait for one.
+
+    With ``thread_affinity`` each thread remembers the last object it
+    released and gets that one back when it is still free, so a thread
+    usually reuses its own connection.
+
+    Once ``max_size`` objects exist ``get`` raises a RuntimeError right away,
+    unless ``acquire_timeout`` is set: it then waits up to that many seconds
+    for an object to be released or destroyed.
+
+    ``min_idle`` objects are created up front, objects destroyed later on
+    aren't replaced until they are needed. Objects released when
+    ``max_idle`` are already free are removed, as are objects older than
+    ``max_lifetime`` seconds. Objects free for more than ``idle_timeout``
+    seconds are removed by ``reap``, as long as ``min_idle`` remain free;
+    ``get`` and ``release`` call it every half of the shortest of these
+    two timeouts, nothing does while the pool isn't used.
+
+    In a forked child the objects that were in use when the process forked
+    are forgotten, their users only exist in the parent, and the locks are
+    recreated.
+
+    ``stats`` reports counters of the pool's activity. They are updated
+    without taking the lock, so a few increments may be lost when many
+    threads use the pool at once.
+    """
 
     def __init__(self, obj_creator,
                  after_remove=None, max_size=None,
-                 lock_generator=None):
-        self._used_objs = collections.deque()
-        self._free_objs = collections.deque()
+                 lock_generator=None, thread_affinity=False,
+                 acquire_timeout=None, min_idle=0, max_idle=None,
+                 idle_timeout=None, max_lifetime=None):
+        self._used_objs = {}
+        # id -> (obj, time it was released)
+        self._free_objs = {}
+        # id -> creation time, of every object of the pool whether it is
+        # used, free, or moving between the two in another thread
+        self._created_at = {}
         self._obj_creator = obj_creator
-        if lock_generator is None:
-            self._lock = threading.Lock()
-        else:
-            self._lock = lock_generator()
+        self._lock_generator = lock_generator
+        self._create_lock()
         self._after_remove = after_remove
         max_size = max_size or 2 ** 31
         if not isinstance(max_size, six.integer_types) or max_size < 0:
             raise ValueError('"max_size" must be a positive integer')
         self.max_size = max_size
+        self._local = threading.local() if thread_affinity else None
+        self.acquire_timeout = acquire_timeout
+        self.acquisitions = 0
+        self.creations = 0
+        self.destroys = 0
+        self.evictions = 0
+        self.peak_used = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        timeouts = [t for t in (idle_timeout, max_lifetime) if t]
+        self._reap_interval = min(timeouts) / 2.0 if timeouts else None
+        self._next_reap = time.time()
+
+        with self._lock:
+            for _ in range(min(min_idle, max_size)):
+                obj = self._create()
+                self._used_objs.pop(id(obj))
+                self._free_objs[id(obj)] = (obj, time.time())
+        fork.register(self)
+
+    def _create_lock(self):
+        if self._lock_generator is None:
+            self._lock = threading.Lock()
+        else:
+            self._lock = self._lock_generator()
+        self._available = threading.Condition(self._lock)
+        self._waiters = 0
+
+    def _after_fork(self):
+        for obj_id in list(self._used_objs):
+            self._created_at.pop(obj_id, None)
+        self._used_objs.clear()
+        self._create_lock()
 
     @property
     def used(self):
-        return tuple(self._used_objs)
+        return tuple(self._used_objs.values())
 
     @property
     def free(self):
-        return tuple(self._free_objs)
+        return tuple(obj for obj, _ in self._free_objs.values())
 
     @contextlib.contextmanager
     def get_and_release(self, destroy_on_fail=False):
@@ -61,54 +137,222 @@ class ObjectPool(object):
             six.reraise(exc_info[0], exc_info[1], exc_info[2])
         self.release(obj)
 
+    def stats(self):
+        """
+        Returns a dict of the pool's counters and current sizes.
+        """
+        return {
+            'used': len(self._used_objs),
+            'free': len(self._free_objs),
+            'max_size': self.max_size,
+            'peak_used': self.peak_used,
+            'acquisitions': self.acquisitions,
+            'creations': self.creations,
+            'destroys': self.destroys,
+            'evictions': self.evictions,
+            'waits': self.waits,
+            'wait_time': self.wait_time,
+            'max_wait_time': self.max_wait_time,
+            'timeouts': self.timeouts,
+        }
+
     def get(self):
+        fork.check(self)
+        self._maybe_reap()
+        obj = self._acquire()
+        self.acquisitions += 1
+        used = len(self._used_objs)
+        if used > self.peak_used:
+            self.peak_used = used
+        return obj
+
+    def _acquire(self):
+        obj = self._take_free()
+        if obj is not None:
+            return obj
+
         with self._lock:
-            if not self._free_objs:
-                curr_count = len(self._used_objs)
-                if curr_count >= self.max_size:
-                    raise RuntimeError("Too many objects,"
-                                       " %s >= %s" % (curr_count,
-                                                      self.max_size))
-                obj = self._obj_creator()
-                self._used_objs.append(obj)
+            # another thread may have released an object meanwhile
+            obj = self._take_free()
+            if obj is not None:
                 return obj
-            else:
-                obj = self._free_objs.pop()
-                self._used_objs.append(obj)
+
+            obj = self._create()
+            if obj is not None:
                 return obj
 
-    def destroy(self, obj, silent=True):
-        was_dropped = False
-        with self._lock:
-            try:
-                self._used_objs.remove(obj)
-                was_dropped = True
-            except ValueError:
-                if not silent:
-                    raise
-        if was_dropped and self._after_remove is not None:
+            if self.acquire_timeout is not None:
+                obj = self._wait(self.acquire_timeout)
+                if obj is not None:
+                    return obj
+
+            curr_count = len(self._created_at)
+            raise RuntimeError("Too many objects,"
+                               " %s >= %s" % (curr_count,
+                                              self.max_size))
+
+    def _create(self):
+        # Called with the lock held. Returns None when the pool is full.
+        # Objects are counted in _created_at, which only grows here, as
+        # _take_free and release move them between _free_objs and
+        # _used_objs without the lock.
+        if len(self._created_at) >= self.max_size:
+            return None
+        obj = self._obj_creator()
+        self.creations += 1
+        self._created_at[id(obj)] = time.time()
+        self._used_objs[id(obj)] = obj
+        return obj
+
+    def _wait(self, timeout):
+        # Called with the lock held. Returns None on timeout.
+        start = time.time()
+        deadline = start + timeout
+        obj = None
+        self._waiters += 1
+        try:
+            while True:
+                # checked after registering as a waiter, so a release that
+                # didn't see us has made its object visible by now
+                obj = self._take_free()
+                if obj is None:
+                    obj = self._create()
+                if obj is not None:
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    break
+                self._available.wait(remaining)
+        finally:
+            self._waiters -= 1
+
+        waited = time.time() - start
+        self.waits += 1
+        self.wait_time += waited
+        self.max_wait_time = max(self.max_wait_time, waited)
+        return obj
+
+    def _notify(self):
+        if self._waiters:
+            with self._lock:
+                self._available.notify()
+
+    def _take_free(self):
+        while True:
+            obj = None
+            if self._local is not None:
+                mine = getattr(self._local, 'obj', None)
+                # only one thread can pop it, so it is ours if we get it back
+                if (
+                    mine is not None and
+                    self._free_objs.pop(id(mine), None) is not None
+                ):
+                    obj = mine
+
+            if obj is None:
+                try:
+                    _, (obj, _) = self._free_objs.popitem()
+                except KeyError:
+                    return None
+
+            if not self._too_old(obj, time.time()):
+                self._used_objs[id(obj)] = obj
+                return obj
+            self.evictions += 1
+            self._remove(obj)
+
+    def _too_old(self, obj, now):
+        return (
+            self.max_lifetime is not None and
+            now - self._created_at.get(id(obj), now) > self.max_lifetime
+        )
+
+    def _remove(self, obj):
+        self._created_at.pop(id(obj), None)
+        if self._after_remove is not None:
             self._after_remove(obj)
 
+    def destroy(self, obj, silent=True):
+        was_dropped = self._used_objs.pop(id(obj), None) is not None
+        if not was_dropped and not silent:
+            raise ValueError('%r is not in use' % (obj,))
+        if was_dropped:
+            self.destroys += 1
+            # removed first, a waiter woken up must see the free slot
+            self._remove(obj)
+            self._notify()
+
     def release(self, obj, silent=True):
-        with self._lock:
-            try:
-                self._used_objs.remove(obj)
-                self._free_objs.append(obj)
-            except ValueError:
-                if not silent:
-                    raise
+        if self._used_objs.pop(id(obj), None) is None:
+            if not silent:
+                raise ValueError('%r is not in use' % (obj,))
+            return
+
+        now = time.time()
+        if self._too_old(obj, now) or (
+            self.max_idle is not None and
+            len(self._free_objs) >= self.max_idle
+        ):
+            self.evictions += 1
+            self._remove(obj)
+            self._notify()
+            return
+
+        self._free_objs[id(obj)] = (obj, now)
+        if self._local is not None:
+            self._local.obj = obj
+        self._notify()
+        self._maybe_reap()
+
+    def _maybe_reap(self):
+        if self._reap_interval is None:
+            return
+        now = time.time()
+        if now < self._next_reap:
+            return
+        self._next_reap = now + self._reap_interval
+        self.reap()
+
+    def reap(self):
+        """
+        Removes the free objects that were idle for more than idle_timeout,
+        keeping at least min_idle of them, and those older than
+        max_lifetime.
+        """
+        now = time.time()
+        # oldest released first
+        free = sorted(self._free_objs.items(), key=lambda item: item[1][1])
+        keep = len(free)
+        for obj_id, (obj, released) in free:
+            too_idle = (
+                self.idle_timeout is not None and
+                now - released > self.idle_timeout and
+                keep > self.min_idle
+            )
+            if not too_idle and not self._too_old(obj, now):
+                continue
+            entry = self._free_objs.pop(obj_id, None)
+            if entry is None:
+                # taken by a get meanwhile
+                continue
+            if entry[1] != released:
+                # taken and released again meanwhile
+                self._free_objs[obj_id] = entry
+                continue
+            keep -= 1
+            self.evictions += 1
+            self._remove(obj)
 
     def clear(self):
+        with self._lock:
+            needs_destroy = list(self._used_objs.values())
+            needs_destroy.extend(obj for obj, _ in self._free_objs.values())
+            self._free_objs.clear()
+            self._used_objs.clear()
+            self._created_at.clear()
+            self._available.notify_all()
         if self._after_remove is not None:
-            needs_destroy = []
-            with self._lock:
-                needs_destroy.extend(self._used_objs)
-                needs_destroy.extend(self._free_objs)
-                self._free_objs.clear()
-                self._used_objs.clear()
             for obj in needs_destroy:
                 self._after_remove(obj)
-        else:
-            with self._lock:
-                self._free_objs.clear()
-                self._used_objs.clear()
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import time
 from io import BytesIO
 import six
 from six.moves import cPickle as pickle
@@ -29,6 +30,24 @@ FLAG_INTEGER = 1 << 1
 FLAG_LONG = 1 << 2
 FLAG_COMPRESSED = 1 << 3  # unused, to main compatibility with python-memcached
 FLAG_TEXT = 1 << 4
+FLAG_ENVELOPE = 1 << 5
+FLAG_ABSENT = 1 << 6
+
+
+class _Absent(object):
+    def __repr__(self):
+        return 'ABSENT'
+
+    def __reduce__(self):
+        return 'ABSENT'
+
+
+# Stored in place of values known not to exist, so negative lookups don't
+# need to reach the source of the data again. It is serialized to an empty
+# value with FLAG_ABSENT. The get and get_many of the clients return it as
+# is, only the read-through methods and the wrappers of pymemcache.client
+# read it as a miss.
+ABSENT = _Absent()
 
 # Pickle protocol version (-1 for highest available to runtime)
 # Warning with `0`: If somewhere in your value lies a slotted object,
@@ -45,7 +64,11 @@ def python_memcache_serializer(key, value):
 
     # Check against exact types so that subclasses of native types will be
     # restored as their native type
-    if value_type is bytes:
+    if value is ABSENT:
+        flags |= FLAG_ABSENT
+        value = b''
+
+    elif value_type is bytes:
         pass
 
     elif value_type is six.text_type:
@@ -74,6 +97,9 @@ def python_memcache_deserializer(key, value, flags):
     if flags == 0:
         return value
 
+    elif flags & FLAG_ABSENT:
+        return ABSENT
+
     elif flags & FLAG_TEXT:
         return value.decode('utf8')
 
@@ -96,3 +122,63 @@ def python_memcache_deserializer(key, value, flags):
             return None
 
     return value
+
+
+class Envelope(object):
+    """
+    A value and the time after which it should be refreshed.
+    """
+    def __init__(self, value, soft_expiry):
+        self.value = value
+        self.soft_expiry = soft_expiry
+
+    @property
+    def stale(self):
+        return time.time() >= self.soft_expiry
+
+    def __repr__(self):
+        return 'Envelope(%r, %r)' % (self.value, self.soft_expiry)
+
+
+class EnvelopeSerde(object):
+    """
+    Stores values with a soft expiry, for stale-while-revalidate reads.
+
+    ``serialize`` and ``deserialize`` are the serializer and deserializer
+    to give to a client. Values are serialized with ``serializer`` and
+    prefixed with the time ``soft_ttl`` seconds from now, or the one of an
+    :py:class:`.Envelope` stored directly. Reads return an
+    :py:class:`.Envelope` of the value, values stored without it are
+    deserialized with ``deserializer`` as they are.
+
+    Values should be stored with a memcached expire longer than
+    ``soft_ttl``, so they can still be served while they are refreshed, see
+    ``get_or_refresh``.
+    """
+    def __init__(self, soft_ttl, serializer=python_memcache_serializer,
+                 deserializer=python_memcache_deserializer):
+        self.soft_ttl = soft_ttl
+        self.serializer = serializer
+        self.deserializer = deserializer
+
+    def serialize(self, key, value):
+        if isinstance(value, Envelope):
+            soft_expiry = value.soft_expiry
+            value = value.value
+        else:
+            soft_expiry = time.time() + self.soft_ttl
+
+        value, flags = self.serializer(key, value)
+        if isinstance(value, six.text_type):
+            value = value.encode('utf8')
+        header = ('%r %d\n' % (soft_expiry, flags)).encode('ascii')
+        return header + value, flags | FLAG_ENVELOPE
+
+    def deserialize(self, key, value, flags):
+        if not flags & FLAG_ENVELOPE:
+            return self.deserializer(key, value, flags)
+
+        header, value = value.split(b'\n', 1)
+        soft_expiry, flags = header.split()
+        return Envelope(self.deserializer(key, value, int(flags)),
+                        float(soft_expiry))
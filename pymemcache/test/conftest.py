@@ -1,5 +1,11 @@
 import pytest
 import socket
+import sys
+
+# asyncio support needs the async/await syntax
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
 
 
 def pytest_addoption(parser):
@@ -0,0 +1,445 @@
+import asyncio
+import socket
+
+import pytest
+
+from pymemcache.client.aio import (
+    AsyncClient,
+    AsyncHashClient,
+    AsyncPooledClient,
+    _MemcacheProtocol,
+)
+from pymemcache.exceptions import (
+    MemcacheServerError,
+    MemcacheUnexpectedCloseError,
+)
+
+
+class FakeTransport(object):
+    def __init__(self, protocol, replies):
+        self.protocol = protocol
+        self.replies = list(replies)
+        self.written = []
+        self.closed = False
+
+    def write(self, data):
+        self.written.append(data)
+        if self.replies:
+            reply = self.replies.pop(0)
+            asyncio.get_event_loop().call_soon(
+                self.protocol.data_received, reply
+            )
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(*replies, **kwargs):
+    client = AsyncClient(('127.0.0.1', 11211), **kwargs)
+    protocol = _MemcacheProtocol()
+    protocol.connection_made(FakeTransport(protocol, replies))
+    client._protocol = protocol
+    return client
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.mark.unit()
+def test_set_and_get():
+    async def test():
+        client = make_client(
+            b'STORED\r\n',
+            b'VALUE key 0 5\r\nvalue\r\nEND\r\n',
+        )
+        assert await client.set(b'key', b'value', noreply=False) is True
+        assert await client.get(b'key') == b'value'
+        assert client._protocol.transport.written == [
+            b'set key 0 0 5\r\nvalue\r\n',
+            b'get key\r\n',
+        ]
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_get_not_found():
+    async def test():
+        client = make_client(b'END\r\n')
+        assert await client.get(b'key', b'default') == b'default'
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pipelined_requests():
+    async def test():
+        client = make_client()
+        protocol = client._protocol
+        first = asyncio.ensure_future(client.get(b'key1'))
+        second = asyncio.ensure_future(client.incr(b'key2', 1))
+        await asyncio.sleep(0)
+
+        assert protocol.transport.written == [
+            b'get key1\r\n',
+            b'incr key2 1\r\n',
+        ]
+        protocol.data_received(b'VALUE key1 0 6\r\nval')
+        protocol.data_received(b'ue1\r\nEND\r\n2')
+        protocol.data_received(b'\r\n')
+        assert await first == b'value1'
+        assert await second == 2
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_multi_key_commands():
+    async def test():
+        client = make_client(
+            b'VALUE key1 0 1\r\n1\r\nVALUE key2 0 1\r\n2\r\nEND\r\n',
+            b'TOUCHED\r\nNOT_FOUND\r\n',
+            b'DELETED\r\nNOT_FOUND\r\n',
+        )
+        assert await client.get_many([b'key1', b'key2']) == {
+            b'key1': b'1',
+            b'key2': b'2',
+        }
+        assert await client.touch_many([b'key1', b'key2'], noreply=False) == {
+            b'key1': True,
+            b'key2': False,
+        }
+        assert await client.delete_many([b'key1', b'key2'],
+                                        noreply=False) is True
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_noreply():
+    async def test():
+        client = make_client()
+        assert await client.set(b'key', b'value') is True
+        assert await client.delete(b'key') is True
+        assert client._protocol.transport.written == [
+            b'set key 0 0 5 noreply\r\nvalue\r\n',
+            b'delete key noreply\r\n',
+        ]
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_error_closes_connection():
+    async def test():
+        client = make_client()
+        protocol = client._protocol
+        first = asyncio.ensure_future(client.get(b'key1'))
+        second = asyncio.ensure_future(client.get(b'key2'))
+        await asyncio.sleep(0)
+
+        protocol.data_received(b'SERVER_ERROR out of memory\r\n')
+        with pytest.raises(MemcacheServerError):
+            await first
+        with pytest.raises(MemcacheUnexpectedCloseError):
+            await second
+        assert protocol.closed
+        assert protocol.transport.closed
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_ignore_exc():
+    async def test():
+        client = make_client(b'SERVER_ERROR out of memory\r\n',
+                             ignore_exc=True)
+        assert await client.get(b'key') is None
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_timeout():
+    async def test():
+        client = make_client(timeout=0.01)
+        protocol = client._protocol
+        with pytest.raises(socket.timeout):
+            await client.get(b'key')
+        assert protocol.closed
+        assert client._protocol is None
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_stats_and_version():
+    async def test():
+        client = make_client(
+            b'STAT pid 23\r\nSTAT version 1.4.4\r\nEND\r\n',
+            b'VERSION 1.4.4\r\n',
+        )
+        assert await client.stats() == {b'pid': 23, b'version': b'1.4.4'}
+        assert await client.version() == b'1.4.4'
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_connects_once():
+    async def test():
+        received = []
+
+        class Server(asyncio.Protocol):
+            def connection_made(self, transport):
+                received.append(transport)
+                self.transport = transport
+
+            def data_received(self, data):
+                for _ in range(data.count(b'get ')):
+                    self.transport.write(b'END\r\n')
+
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(Server, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncClient(('127.0.0.1', port), timeout=5)
+        try:
+            results = await asyncio.gather(
+                *[client.get(b'key', i) for i in range(10)]
+            )
+            assert results == list(range(10))
+            assert len(received) == 1
+        finally:
+            client.close()
+            server.close()
+            await server.wait_closed()
+
+    run(test())
+
+
+def make_pooled_client(replies, **kwargs):
+    client = AsyncPooledClient(('127.0.0.1', 11211), **kwargs)
+    created = []
+
+    def new_client():
+        created.append(make_client(*replies.pop(0)))
+        return created[-1]
+
+    client._new_client = new_client
+    return client, created
+
+
+@pytest.mark.unit()
+def test_pooled_reuses_clients():
+    async def test():
+        client, created = make_pooled_client([
+            [b'STORED\r\n', b'VALUE key 0 5\r\nvalue\r\nEND\r\n'],
+        ])
+        assert await client.set(b'key', b'value', noreply=False) is True
+        assert await client.get(b'key') == b'value'
+        assert len(created) == 1
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_bounded():
+    async def test():
+        client, created = make_pooled_client([
+            [b'END\r\n', b'END\r\n'],
+            [b'END\r\n'],
+        ], max_pool_size=1)
+        results = await asyncio.gather(
+            client.get(b'key', 1), client.get(b'key', 2)
+        )
+        assert results == [1, 2]
+        assert len(created) == 1
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_acquire_timeout():
+    async def test():
+        client, created = make_pooled_client([[]], max_pool_size=1,
+                                             acquire_timeout=0.01)
+        held = await client._acquire()
+        with pytest.raises(RuntimeError):
+            await client.get(b'key')
+        await client._release(held, False)
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_destroys_failed_clients():
+    async def test():
+        client, created = make_pooled_client([
+            [b'SERVER_ERROR error\r\n'],
+            [b'END\r\n'],
+        ])
+        with pytest.raises(MemcacheServerError):
+            await client.get(b'key')
+        assert created[0]._protocol is None
+        assert await client.get(b'key') is None
+        assert len(created) == 2
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_ignore_exc():
+    async def test():
+        client, _ = make_pooled_client([[b'SERVER_ERROR error\r\n']],
+                                       ignore_exc=True)
+        assert await client.get_many([b'key']) == {}
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_ignore_exc_get_default():
+    async def test():
+        client, _ = make_pooled_client([[b'SERVER_ERROR error\r\n']],
+                                       ignore_exc=True)
+        assert await client.get(b'key', b'default') == b'default'
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_pooled_check_key():
+    client, created = make_pooled_client([], key_prefix=b'p:')
+    assert client.check_key(b'key') == b'p:key'
+    assert created == []
+
+
+class FailingClient(object):
+    def __init__(self, server):
+        self.server = server
+        self.calls = 0
+
+    async def get(self, *args, **kwargs):
+        self.calls += 1
+        raise socket.error('connection refused')
+
+    get_many = get
+
+    def close(self):
+        pass
+
+
+def make_hash_client(replies, **kwargs):
+    client = AsyncHashClient(
+        [('127.0.0.1', 11211), ('127.0.0.1', 11212)], **kwargs
+    )
+    for key, server_replies in replies.items():
+        server = client.clients[key].server
+        client.clients[key] = make_client(*server_replies)
+        client.clients[key].server = server
+    return client
+
+
+@pytest.mark.unit()
+def test_hash_get_many_gathers():
+    async def test():
+        client = make_hash_client({})
+        keys = [b'key1', b'key2', b'key3', b'key4']
+        batches, _ = client._group_keys(keys)
+        assert len(batches) == 2
+        for server, server_keys in batches.items():
+            reply = b''.join(
+                b'VALUE ' + key + b' 0 1\r\nv\r\n' for key in server_keys
+            )
+            fake = make_client(reply + b'END\r\n')
+            fake.server = server
+            client.clients['%s:%s' % server] = fake
+
+        result = await client.get_many(keys)
+        assert result == dict((key, b'v') for key in keys)
+        for server_client in client.clients.values():
+            assert len(server_client._protocol.transport.written) == 1
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_hash_set_many():
+    async def test():
+        client = make_hash_client({
+            '127.0.0.1:11211': [b'STORED\r\n' * 3],
+            '127.0.0.1:11212': [b'STORED\r\n' * 3],
+        })
+        values = {b'key1': b'a', b'key2': b'b', b'key3': b'c'}
+        assert await client.set_many(values, noreply=False) is True
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_hash_dead_server():
+    async def test():
+        client = make_hash_client({}, retry_attempts=1, retry_timeout=0,
+                                  ignore_exc=True)
+        failing = FailingClient(('127.0.0.1', 11211))
+        client.clients['127.0.0.1:11211'] = failing
+        client.clients['127.0.0.1:11212'] = FailingClient(
+            ('127.0.0.1', 11212)
+        )
+        client.hasher.remove_node('127.0.0.1:11212')
+
+        # first failure, a retry, then the server is out of attempts
+        for _ in range(3):
+            assert await client.get(b'key') is None
+        assert failing.calls == 3
+        assert ('127.0.0.1', 11211) in client._dead_clients
+
+        # no servers left
+        assert await client.get(b'key') is None
+        assert failing.calls == 3
+
+    run(test())
+
+
+class SlowFailingClient(FailingClient):
+    async def get(self, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0)
+        raise socket.error('connection refused')
+
+
+@pytest.mark.unit()
+def test_hash_concurrent_failures_remove_server_once():
+    async def test():
+        client = make_hash_client({}, retry_attempts=0, ignore_exc=True)
+        failing = SlowFailingClient(('127.0.0.1', 11211))
+        client.clients['127.0.0.1:11211'] = failing
+        client.hasher.remove_node('127.0.0.1:11212')
+
+        results = await asyncio.gather(client.get(b'a'), client.get(b'a'))
+        assert results == [None, None]
+        assert failing.calls == 2
+        assert ('127.0.0.1', 11211) in client._dead_clients
+        assert client._failed_clients == {}
+
+    run(test())
+
+
+@pytest.mark.unit()
+def test_hash_socket_error_raises():
+    async def test():
+        client = make_hash_client({})
+        client.clients['127.0.0.1:11211'] = FailingClient(
+            ('127.0.0.1', 11211)
+        )
+        client.hasher.remove_node('127.0.0.1:11212')
+        with pytest.raises(socket.error):
+            await client.get(b'key')
+        assert ('127.0.0.1', 11211) in client._failed_clients
+
+    run(test())
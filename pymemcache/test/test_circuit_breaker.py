@@ -0,0 +1,118 @@
+import mock
+import pytest
+
+from pymemcache.client.circuit_breaker import (
+    CircuitBreaker,
+    CLOSED,
+    HALF_OPEN,
+    OPEN
+)
+
+
+def make_breaker(**kwargs):
+    kwargs.setdefault('min_requests', 4)
+    return CircuitBreaker(('127.0.0.1', 11211), **kwargs)
+
+
+@pytest.mark.unit()
+def test_invalid_failure_rate():
+    with pytest.raises(ValueError):
+        make_breaker(failure_rate=0)
+
+
+@pytest.mark.unit()
+def test_opens_on_failure_rate():
+    breaker = make_breaker()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+
+@pytest.mark.unit()
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker(slow_call_duration=0.1)
+    for _ in range(4):
+        breaker.record_success(duration=0.5)
+
+    assert breaker.state == OPEN
+
+
+@pytest.mark.unit()
+def test_window_expires_outcomes():
+    breaker = make_breaker(window=10)
+    with mock.patch('time.time', return_value=0):
+        for _ in range(3):
+            breaker.record_failure()
+
+    with mock.patch('time.time', return_value=20):
+        breaker.record_failure()
+        assert breaker.stats() == {
+            'state': CLOSED,
+            'requests': 1,
+            'failures': 1,
+            'failure_rate': 1.0,
+        }
+
+
+@pytest.mark.unit()
+def test_half_open_admits_single_probe():
+    breaker = make_breaker(min_requests=1, open_timeout=5)
+    with mock.patch('time.time', return_value=0):
+        breaker.record_failure()
+
+    with mock.patch('time.time', return_value=6):
+        assert breaker.allow() is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow() is True
+
+
+@pytest.mark.unit()
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker(min_requests=1, open_timeout=5)
+    with mock.patch('time.time', return_value=0):
+        breaker.record_failure()
+
+    with mock.patch('time.time', return_value=6):
+        assert breaker.allow() is True
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+
+
+@pytest.mark.unit()
+def test_half_open_cancel_releases_probe():
+    breaker = make_breaker(min_requests=1, open_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow() is True
+    breaker.cancel()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+
+
+@pytest.mark.unit()
+def test_state_change_events():
+    events = []
+    breaker = make_breaker(
+        min_requests=1, open_timeout=0,
+        on_state_change=lambda *args: events.append(args),
+    )
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_success()
+
+    server = ('127.0.0.1', 11211)
+    assert events == [
+        (server, CLOSED, OPEN),
+        (server, OPEN, HALF_OPEN),
+        (server, HALF_OPEN, CLOSED),
+    ]
@@ -21,11 +21,13 @@ import unittest
 import pytest
 
 from pymemcache.client.base import PooledClient, Client
+from pymemcache.client.single_flight import SingleFlight
 from pymemcache.exceptions import (
     MemcacheClientError,
     MemcacheServerError,
     MemcacheUnknownCommandError,
     MemcacheUnknownError,
+    MemcacheUnexpectedCloseError,
     MemcacheIllegalInputError
 )
 
@@ -317,6 +319,29 @@ class ClientTestMixin(object):
         result = client.decr(b'key', 1, noreply=False)
         assert result == 1
 
+    def test_touch_many(self):
+        client = self.make_client([
+            b'STORED\r\n',
+            b'TOUCHED\r\nNOT_',
+            b'FOUND\r\n'
+        ])
+        client.set(b'key1', b'value', noreply=False)
+        result = client.touch_many([b'key1', b'key2'], noreply=False)
+        assert result == {b'key1': True, b'key2': False}
+
+    def test_touch_many_noreply(self):
+        client = self.make_client([])
+        result = client.touch_many([b'key1', b'key2'], noreply=True)
+        assert result == {b'key1': True, b'key2': True}
+
+    def test_incr_many(self):
+        client = self.make_client([b'STORED\r\n', b'3\r\nNOT_FOUND\r\n'])
+        client.set(b'key1', 1, noreply=False)
+        result = client.incr_many(
+            collections.OrderedDict([(b'key1', 2), (b'key2', 1)])
+        )
+        assert result == {b'key1': 3, b'key2': None}
+
 
 class TestClient(ClientTestMixin, unittest.TestCase):
 
@@ -484,6 +509,26 @@ class TestClient(ClientTestMixin, unittest.TestCase):
         result = client.touch(b'key', noreply=False)
         assert result is True
 
+    def test_delete_many_pipelined(self):
+        client = self.make_client([b'DELETED\r\nNOT_FOUND\r\n'])
+        result = client.delete_many([b'key1', b'key2'], noreply=False)
+        assert result is True
+        assert client.sock.send_bufs == [
+            b'delete key1\r\ndelete key2\r\n'
+        ]
+
+    def test_incr_many_noreply(self):
+        client = self.make_client([])
+        result = client.incr_many({b'key1': 1}, noreply=True)
+        assert result == {b'key1': None}
+        assert client.sock.send_bufs == [b'incr key1 1 noreply\r\n']
+
+    def test_touch_many_unexpected_close(self):
+        client = self.make_client([b'TOUCHED\r\n', b''])
+        with pytest.raises(MemcacheUnexpectedCloseError):
+            client.touch_many([b'key1', b'key2'], noreply=False)
+        assert client.sock is None
+
     def test_quit(self):
         client = self.make_client([])
         result = client.quit()
@@ -901,6 +946,46 @@ class TestPooledClient(ClientTestMixin, unittest.TestCase):
                                     [b'__FAKE_RESPONSE__\r\n'])
         self._default_noreply_true('flush_all', (), [b'__FAKE_RESPONSE__\r\n'])
 
+    def test_pool_stats(self):
+        client = self.make_client([socket.error()])
+        with pytest.raises(socket.error):
+            client.get(b'key')
+
+        stats = client.pool_stats()
+        assert stats['acquisitions'] == 1
+        assert stats['destroys'] == 1
+        assert stats['used'] == 0
+
+    def test_min_idle_connect_failure(self):
+        socket_module = MockSocketModule(connect_failure=socket.error())
+        client = PooledClient(('127.0.0.1', 11211), min_idle=1,
+                              socket_module=socket_module)
+        assert len(socket_module.sockets) == 1
+        assert [c.sock for c in client.client_pool.free] == [None]
+
+    def test_min_idle_connect_other_errors_raise(self):
+        socket_module = MockSocketModule(connect_failure=ValueError())
+        with pytest.raises(ValueError):
+            PooledClient(('127.0.0.1', 11211), min_idle=1,
+                         socket_module=socket_module)
+
+    def test_single_flight_get(self):
+        client = self.make_client(
+            [b'VALUE key 0 5\r\nvalue\r\nEND\r\n', b'END\r\n']
+        )
+        client.single_flight = SingleFlight()
+        assert client.get(b'key') == b'value'
+        assert client.get(b'key', b'default') == b'default'
+        assert client.single_flight.calls == 2
+
+    def test_submit_get(self):
+        client = self.make_client([b'VALUE key 0 5\r\nvalue\r\nEND\r\n'])
+        try:
+            assert client.submit_get(b'key').result() == b'value'
+            assert client.executor_stats()['completed'] == 1
+        finally:
+            client.command_executor.shutdown()
+
 
 class TestMockClient(ClientTestMixin, unittest.TestCase):
     def make_client(self, mock_socket_values, **kwargs):
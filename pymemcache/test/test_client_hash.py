@@ -1,13 +1,28 @@
-from pymemcache.client.hash import HashClient
+from pymemcache.client.hash import HashClient, LatencyTracker
 from pymemcache.client.base import Client, PooledClient
-from pymemcache.exceptions import MemcacheError, MemcacheUnknownError
+from pymemcache.client.circuit_breaker import CircuitBreaker, OPEN
+from pymemcache.client.hot_keys import HotKeyCache
+from pymemcache.client.single_flight import SingleFlight
+from pymemcache.executor import CommandExecutor
+from pymemcache.exceptions import (
+    MemcacheClientError,
+    MemcacheError,
+    MemcacheIllegalInputError,
+    MemcacheServerError,
+    MemcacheUnknownError
+)
 from pymemcache import pool
 
-from .test_client import ClientTestMixin, MockSocket
+from .test_client import ClientTestMixin, MockSocket, MockSocketModule
+import collections
+import functools
 import unittest
 import pytest
 import mock
 import socket
+import threading
+
+from concurrent import futures
 
 
 class TestHashClient(ClientTestMixin, unittest.TestCase):
@@ -213,4 +228,666 @@ class TestHashClient(ClientTestMixin, unittest.TestCase):
         result = client.get_many(['foo', 'bar'])
         assert result == {'foo': False, 'bar': False}
 
+    def test_setup_client_with_weights(self):
+        client = HashClient([
+            ('127.0.0.1', 11211, 1),
+            ('127.0.0.1', 11212, 3),
+            ('127.0.0.1', 11213),
+        ])
+
+        assert client.hasher.weights == {
+            '127.0.0.1:11211': 1,
+            '127.0.0.1:11212': 3,
+            '127.0.0.1:11213': 1,
+        }
+
+    def test_dead_server_keeps_weight(self):
+        client = HashClient([('127.0.0.1', 11211, 3)])
+        client._failed_clients[('127.0.0.1', 11211)] = {}
+        client.remove_server('127.0.0.1', 11211)
+        assert client.hasher.nodes == []
+
+        client.add_server('127.0.0.1', 11211)
+        assert client.hasher.weights == {'127.0.0.1:11211': 3}
+
+    def test_route_cache_hits(self):
+        client = HashClient([
+            ('127.0.0.1', 11211),
+            ('127.0.0.1', 11212),
+        ], route_cache_size=10)
+
+        first = client._get_client(b'key')
+        assert client._get_client(b'key') is first
+
+        stats = client.route_cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+        assert stats['size'] == 1
+
+    def test_route_cache_evicts_least_recently_used(self):
+        client = HashClient([('127.0.0.1', 11211)], route_cache_size=2)
+
+        client._get_client(b'key1')
+        client._get_client(b'key2')
+        client._get_client(b'key1')
+        client._get_client(b'key3')
+
+        routes = client.route_cache._routes
+        assert list(routes) == [b'key1', b'key3']
+
+    def test_route_cache_invalidated_on_membership_change(self):
+        client = HashClient([('127.0.0.1', 11211)], route_cache_size=10)
+        client._get_client(b'key')
+        generation = client.route_cache.generation
+
+        client.add_server('127.0.0.1', 11212)
+        assert client.route_cache.generation == generation + 1
+        assert client.route_cache.stats()['size'] == 0
+
+        client._failed_clients[('127.0.0.1', 11212)] = {}
+        client.remove_server('127.0.0.1', 11212)
+        assert client.route_cache.generation == generation + 2
+
+    def test_route_cache_ignores_stale_generation(self):
+        client = HashClient([('127.0.0.1', 11211)], route_cache_size=10)
+        _, generation = client.route_cache.get(b'key')
+        client.route_cache.invalidate()
+        client.route_cache.set(b'key', '127.0.0.1:11211', generation)
+
+        assert client.route_cache.stats()['size'] == 0
+
+    def test_route_cache_checks_key(self):
+        client = HashClient([('127.0.0.1', 11211)], route_cache_size=10)
+
+        with pytest.raises(MemcacheIllegalInputError):
+            client._get_client(b'key with space')
+
+        assert client.route_cache.stats()['size'] == 0
+
+    def test_get_many_parallel(self):
+        client = self.make_client(*[
+            [b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n', ],
+            [b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n', ],
+        ])
+        client._executor = futures.ThreadPoolExecutor(2)
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        result = client.get_many([b'key1', b'key3'])
+        assert result == {b'key1': b'value1', b'key3': b'value2'}
+
+    def test_get_many_parallel_waits_for_all_batches(self):
+        client = self.make_client(*[
+            [b'VAXLUE key3 0 6\r\nvalue2\r\nEND\r\n', ],
+            [b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n', ],
+        ])
+        client._executor = futures.ThreadPoolExecutor(2)
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        with pytest.raises(MemcacheUnknownError):
+            client.get_many([b'key1', b'key3'])
+
+        assert client.clients['127.0.0.1:11013'].sock.recv_bufs == \
+            collections.deque()
+
+    def test_setup_client_parallel_workers(self):
+        client = HashClient([], parallel_workers=4)
+        assert client._executor._max_workers == 4
+
+    def test_single_flight_get(self):
+        client = self.make_client([
+            b'VALUE key 0 5\r\nvalue\r\nEND\r\n',
+            b'END\r\n',
+        ])
+        client.single_flight = SingleFlight()
+        assert client.get(b'key') == b'value'
+        assert client.get(b'key', b'default') == b'default'
+        assert client.single_flight.calls == 2
+
+    def test_get_many_async(self):
+        client = self.make_client(*[
+            [b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n', ],
+            [b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n', ],
+        ])
+        client.command_executor = CommandExecutor(1, max_queue=8)
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        try:
+            future = client.get_many_async([b'key1', b'key3'])
+            assert future.result() == {b'key1': b'value1', b'key3': b'value2'}
+            stats = client.executor_stats()
+            assert stats['max_workers'] == 1
+            assert stats['max_queue'] == 8
+            assert stats['completed'] == 1
+        finally:
+            client.command_executor.shutdown()
+
+    def test_submit_requires_pooling(self):
+        client = HashClient([('127.0.0.1', 11211)])
+        assert client.command_executor is None
+        with pytest.raises(ValueError):
+            client.submit_get(b'key')
+        with pytest.raises(ValueError):
+            client.get_many_async([b'key'])
+        client.close()
+
+    def make_selector_client(self, *responses, **kwargs):
+        client = HashClient([], use_selectors=True, **kwargs)
+        servers = []
+        for i, response in enumerate(responses):
+            node = '127.0.0.1:%s' % (11012 + i)
+            mock_client = Client(('127.0.0.1', 11012 + i))
+            mock_client.sock, server = socket.socketpair()
+            server.sendall(response)
+            client.clients[node] = mock_client
+            client.hasher.add_node(node)
+            servers.append(server)
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+        return client, servers
+
+    def make_pooled_selector_client(self, *responses, **kwargs):
+        client, servers = self.make_selector_client(*responses, **kwargs)
+        for node, connection in list(client.clients.items()):
+            pooled = PooledClient(connection.server)
+            pooled.client_pool = pool.ObjectPool(
+                lambda connection=connection: connection, max_size=1
+            )
+            client.clients[node] = pooled
+        return client, servers
+
+    def test_get_many_selectors_releases_on_acquire_error(self):
+        client, servers = self.make_pooled_selector_client(
+            b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n',
+            b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n',
+        )
+        failing = client.clients['127.0.0.1:11012'].client_pool
+        failing.get = mock.Mock(side_effect=RuntimeError('Too many objects'))
+
+        with pytest.raises(RuntimeError):
+            client.get_many([b'key1', b'key3'])
+        assert client.clients['127.0.0.1:11013'].client_pool.used == ()
+
+    def test_get_many_selectors_cancels_probe_on_acquire_error(self):
+        client, servers = self.make_pooled_selector_client(
+            b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n',
+            b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n',
+        )
+        for node, pooled in client.clients.items():
+            client.circuit_breakers[pooled.server] = CircuitBreaker(
+                pooled.server, open_timeout=0
+            )
+        breaker = client.circuit_breakers[('127.0.0.1', 11012)]
+        breaker.state = OPEN
+        breaker._opened_time = 0
+        failing = client.clients['127.0.0.1:11012'].client_pool
+        failing.get = mock.Mock(side_effect=RuntimeError('Too many objects'))
+
+        with pytest.raises(RuntimeError):
+            client.get_many([b'key1', b'key3'])
+        assert breaker._probing is False
+        assert breaker.allow()
+
+    def test_get_many_selectors(self):
+        client, servers = self.make_selector_client(
+            b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n',
+            b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n',
+        )
+
+        result = client.get_many([b'key1', b'key3'])
+        assert result == {b'key1': b'value1', b'key3': b'value2'}
+        assert servers[0].recv(1024) == b'get key3\r\n'
+        assert servers[1].recv(1024) == b'get key1\r\n'
+
+    def test_set_many_selectors(self):
+        client, servers = self.make_selector_client(
+            b'STORED\r\n',
+            b'STORED\r\n',
+        )
+
+        assert client.set_many({b'key1': b'value1', b'key3': b'value2'},
+                               noreply=False)
+        assert servers[0].recv(1024) == b'set key3 0 0 6\r\nvalue2\r\n'
+        assert servers[1].recv(1024) == b'set key1 0 0 6\r\nvalue1\r\n'
+
+    def test_delete_many_selectors(self):
+        client, servers = self.make_selector_client(b'', b'')
+
+        assert client.delete_many([b'key1', b'key2', b'key3'])
+        assert servers[0].recv(1024) == b'delete key3 noreply\r\n'
+        assert servers[1].recv(1024) == \
+            b'delete key1 noreply\r\ndelete key2 noreply\r\n'
+
+    def test_get_many_selectors_server_error(self):
+        client, servers = self.make_selector_client(
+            b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n',
+            b'SERVER_ERROR busy\r\n',
+        )
+
+        with pytest.raises(MemcacheServerError):
+            client.get_many([b'key1', b'key3'])
+
+    def test_get_many_selectors_failure_ignored(self):
+        client, servers = self.make_selector_client(
+            b'VALUE key3 0 6\r\nvalue2\r\nEND\r\n',
+            b'',
+            ignore_exc=True,
+        )
+        servers[1].close()
+
+        result = client.get_many([b'key1', b'key3'])
+        assert result == {b'key3': b'value2'}
+        assert ('127.0.0.1', 11013) in client._failed_clients
+
+    def test_delete_many_grouped(self):
+        client = self.make_client(*[
+            [b'DELETED\r\n', ],
+            [b'DELETED\r\nNOT_FOUND\r\n', ],
+        ])
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        assert client.delete_many([b'key1', b'key2', b'key3'], noreply=False)
+        assert client.clients['127.0.0.1:11012'].sock.send_bufs == [
+            b'delete key3\r\n'
+        ]
+        assert client.clients['127.0.0.1:11013'].sock.send_bufs == [
+            b'delete key1\r\ndelete key2\r\n'
+        ]
+
+    def test_touch_many_grouped(self):
+        client = self.make_client(*[
+            [b'NOT_FOUND\r\n', ],
+            [b'TOUCHED\r\n', ],
+        ])
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        result = client.touch_many([b'key1', b'key3'], noreply=False)
+        assert result == {b'key1': True, b'key3': False}
+
+    def test_incr_many_grouped(self):
+        client = self.make_client(*[
+            [b'4\r\n', ],
+            [b'NOT_FOUND\r\n', ],
+        ])
+
+        def get_clients(key):
+            if key == b'key3':
+                return client.clients['127.0.0.1:11012']
+            else:
+                return client.clients['127.0.0.1:11013']
+
+        client._get_client = get_clients
+
+        result = client.incr_many({b'key1': 1, b'key3': 2})
+        assert result == {b'key1': None, b'key3': 4}
+
+    def test_incr_many_no_servers_left(self):
+        client = HashClient([], ignore_exc=True)
+
+        result = client.incr_many({b'key1': 1})
+        assert result == {b'key1': False}
+
+    def test_check_servers_clears_healthy_failed_server(self):
+        client = HashClient([('127.0.0.1', 11211)], retry_attempts=2)
+        client._failed_clients[('127.0.0.1', 11211)] = {
+            'failed_time': 0,
+            'attempts': 0,
+        }
+        client._probe_server = lambda server: True
+
+        client._check_servers()
+        assert client._failed_clients == {}
+        assert client.hasher.nodes == ['127.0.0.1:11211']
+
+    def test_check_servers_marks_unhealthy_server_dead(self):
+        client = HashClient([('127.0.0.1', 11211)], retry_attempts=2)
+        client._failed_clients[('127.0.0.1', 11211)] = {
+            'failed_time': 0,
+            'attempts': 0,
+        }
+        client._probe_server = lambda server: False
+
+        client._check_servers()
+        assert client._failed_clients[('127.0.0.1', 11211)]['attempts'] == 1
+        assert client.hasher.nodes == ['127.0.0.1:11211']
+
+        client._check_servers()
+        assert ('127.0.0.1', 11211) in client._dead_clients
+        assert client.hasher.nodes == []
+
+    def test_check_servers_brings_dead_server_back(self):
+        client = HashClient([('127.0.0.1', 11211)])
+        client._failed_clients[('127.0.0.1', 11211)] = {}
+        client.remove_server('127.0.0.1', 11211)
+
+        client._probe_server = lambda server: False
+        client._check_servers()
+        assert client.hasher.nodes == []
+
+        client._probe_server = lambda server: True
+        client._check_servers()
+        assert client._dead_clients == {}
+        assert client.hasher.nodes == ['127.0.0.1:11211']
+
+    def test_health_checker_skips_failed_servers(self):
+        client = HashClient([('127.0.0.1', 11211)], health_check_interval=60)
+        client._failed_clients[('127.0.0.1', 11211)] = {
+            'failed_time': 0,
+            'attempts': 0,
+        }
+
+        assert client._should_try_server(('127.0.0.1', 11211)) is False
+        client.close()
+        client._health_checker.join(1)
+        assert not client._health_checker.is_alive()
+
+    def test_health_checker_probes(self):
+        probed = threading.Event()
+        client = HashClient([], health_check_interval=0.01)
+        client._dead_clients[('127.0.0.1', 11211)] = 0
+
+        def probe_server(server):
+            probed.set()
+            return True
+
+        client._probe_server = probe_server
+        assert probed.wait(1)
+        client.close()
+        client._health_checker.join(1)
+        assert client.hasher.nodes == ['127.0.0.1:11211']
+
+    def test_probe_server(self):
+        client = HashClient([], socket_module=MockSocketModule())
+        with mock.patch.object(Client, 'version') as version:
+            assert client._probe_server(('127.0.0.1', 11211)) is True
+            version.side_effect = socket.error()
+            assert client._probe_server(('127.0.0.1', 11211)) is False
+
+    def test_circuit_breaker_opens(self):
+        client = self.make_client(*[
+            [socket.error(), ],
+        ], ignore_exc=True)
+        client._circuit_breaker = functools.partial(
+            CircuitBreaker, min_requests=1
+        )
+        client.add_server('127.0.0.1', 11012)
+        client.clients['127.0.0.1:11012'].sock = MockSocket([socket.error()])
+
+        assert client.get(b'key') is None
+        breaker = client.circuit_breakers[('127.0.0.1', 11012)]
+        assert breaker.state == OPEN
+        assert client._failed_clients == {}
+
+        # requests fail fast without touching the server
+        client.clients['127.0.0.1:11012'].sock = None
+        assert client.get(b'key') is None
+        assert client.clients['127.0.0.1:11012'].sock is None
+
+    def test_circuit_breaker_server_errors(self):
+        client = HashClient(
+            [('127.0.0.1', 11012)],
+            circuit_breaker=functools.partial(
+                CircuitBreaker, min_requests=2, failure_rate=0.75
+            ),
+        )
+        mock_client = client.clients['127.0.0.1:11012']
+
+        mock_client.sock = MockSocket([b'SERVER_ERROR busy\r\n'])
+        with pytest.raises(MemcacheServerError):
+            client.get(b'key')
+
+        mock_client.sock = MockSocket([b'CLIENT_ERROR bad\r\n'])
+        with pytest.raises(MemcacheClientError):
+            client.get(b'key')
+
+        breaker = client.circuit_breakers[('127.0.0.1', 11012)]
+        assert breaker.stats()['failures'] == 1
+        assert breaker.stats()['requests'] == 2
+
+    def make_replicated_client(self, *sockets, **kwargs):
+        client = HashClient([
+            ('127.0.0.1', 11012),
+            ('127.0.0.1', 11013),
+        ], use_pooling=True, replicas=2, **kwargs)
+
+        nodes = client.hasher.get_nodes(b'key', 2)
+        for node, sock in zip(nodes, sockets):
+            mock_client = Client(None)
+            mock_client.sock = sock
+            client.clients[node].client_pool = pool.ObjectPool(
+                lambda mock_client=mock_client: mock_client
+            )
+        return client, nodes
+
+    def test_replicated_set(self):
+        client, nodes = self.make_replicated_client(
+            MockSocket([b'STORED\r\n']),
+            MockSocket([b'STORED\r\n']),
+        )
+
+        assert client.set(b'key', b'value', noreply=False) is True
+        for node in nodes:
+            mock_client = client.clients[node].client_pool.get()
+            assert mock_client.sock.send_bufs == [
+                b'set key 0 0 5\r\nvalue\r\n'
+            ]
+
+    def test_replicated_incr_invalidates(self):
+        client, nodes = self.make_replicated_client(
+            MockSocket([b'2\r\n']),
+            MockSocket([]),
+        )
+
+        assert client.incr(b'key', 1) == 2
+        mock_client = client.clients[nodes[1]].client_pool.get()
+        assert mock_client.sock.send_bufs == [b'delete key noreply\r\n']
+
+    def test_hedged_get_fast_primary(self):
+        client, nodes = self.make_replicated_client(
+            MockSocket([b'VALUE key 0 5\r\nfirst\r\nEND\r\n']),
+            MockSocket([b'VALUE key 0 6\r\nsecond\r\nEND\r\n']),
+            hedge_delay=1,
+        )
+
+        assert client.hedged_get(b'key') == b'first'
+        mock_client = client.clients[nodes[1]].client_pool.get()
+        assert mock_client.sock.send_bufs == []
+
+    def test_hedged_get_slow_primary(self):
+        primary_replied = threading.Event()
+
+        class SlowSocket(MockSocket):
+            def recv(self, size):
+                primary_replied.wait(1)
+                return super(SlowSocket, self).recv(size)
+
+        client, nodes = self.make_replicated_client(
+            SlowSocket([b'VALUE key 0 5\r\nfirst\r\nEND\r\n']),
+            MockSocket([b'VALUE key 0 6\r\nsecond\r\nEND\r\n']),
+            hedge_delay=0.01,
+        )
+
+        assert client.hedged_get_many([b'key']) == {b'key': b'second'}
+        primary_replied.set()
+
+    def test_hedged_get_failed_primary(self):
+        client, nodes = self.make_replicated_client(
+            MockSocket([socket.error()]),
+            MockSocket([b'VALUE key 0 6\r\nsecond\r\nEND\r\n']),
+            hedge_delay=1,
+        )
+
+        assert client.hedged_get(b'key') == b'second'
+
+    def test_hedged_get_requires_pooling(self):
+        client = HashClient([('127.0.0.1', 11012)])
+
+        with pytest.raises(ValueError):
+            client.hedged_get(b'key')
+
+    def test_latency_tracker(self):
+        tracker = LatencyTracker(size=100, min_samples=10)
+        for i in range(9):
+            tracker.add(i)
+        assert tracker.value() is None
+
+        for i in range(9, 100):
+            tracker.add(i)
+        assert tracker.value() == 95
+
+    def make_hot_key_client(self, *mock_socket_values):
+        client = self.make_client(*mock_socket_values)
+        client.hot_keys = HotKeyCache(sample_rate=1, min_samples=1,
+                                      threshold=0.5)
+        return client
+
+    def test_get_hot_key_served_locally(self):
+        client = self.make_hot_key_client([
+            b'VALUE key 0 5\r\nvalue\r\nEND\r\n',
+        ])
+
+        assert client.get(b'key') == b'value'
+        assert client.get(b'key') == b'value'
+        assert client.hot_keys.hits == 1
+        assert client.hot_keys.hot_keys() == [(b'key', 1.0)]
+
+    def test_get_hot_key_miss_not_stored(self):
+        client = self.make_hot_key_client([
+            b'END\r\n',
+            b'END\r\n',
+        ])
+
+        assert client.get(b'key', b'default') == b'default'
+        assert client.get(b'key') is None
+        assert client.hot_keys.hits == 0
+
+    def test_get_many_hot_key_served_locally(self):
+        client = self.make_hot_key_client([
+            b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n',
+            b'VALUE key2 0 6\r\nvalue2\r\nEND\r\n',
+        ])
+
+        assert client.get(b'key1') == b'value1'
+        result = client.get_many([b'key1', b'key2'])
+        assert result == {b'key1': b'value1', b'key2': b'value2'}
+
+    def test_set_invalidates_hot_key(self):
+        client = self.make_hot_key_client([
+            b'VALUE key 0 5\r\nvalue\r\nEND\r\n',
+            b'STORED\r\n',
+            b'VALUE key 0 3\r\nnew\r\nEND\r\n',
+        ])
+
+        assert client.get(b'key') == b'value'
+        assert client.set(b'key', b'new', noreply=False) is True
+        assert client.get(b'key') == b'new'
+
+    def make_migrating_client(self, old_values, new_values, **kwargs):
+        client = self.make_client(old_values, **kwargs)
+        client.migration_window = 60
+        client.add_server('127.0.0.1', 11013)
+
+        new_client = self.make_client_pool(('127.0.0.1', 11013), new_values)
+        client.clients['127.0.0.1:11013'] = new_client
+        client._get_client = lambda key: new_client
+        return client, client.clients['127.0.0.1:11012'], new_client
+
+    def test_migration_reads_previous_owner(self):
+        client, old_client, new_client = self.make_migrating_client(
+            [b'VALUE key 0 3\r\nold\r\nEND\r\n'],
+            [b'END\r\n'],
+        )
+
+        assert client.get(b'key') == b'old'
+        assert new_client.sock.send_bufs == [b'get key\r\n']
+
+    def test_migration_get_many_reads_previous_owner(self):
+        client, old_client, new_client = self.make_migrating_client(
+            [b'VALUE key1 0 3\r\nold\r\nEND\r\n'],
+            [b'VALUE key2 0 3\r\nnew\r\nEND\r\n'],
+        )
+
+        result = client.get_many([b'key1', b'key2'])
+        assert result == {b'key1': b'old', b'key2': b'new'}
+        assert old_client.sock.send_bufs == [b'get key1\r\n']
+
+    def test_migration_backfills(self):
+        client, old_client, new_client = self.make_migrating_client(
+            [b'VALUE key 0 3\r\nold\r\nEND\r\n'],
+            [b'END\r\n'],
+        )
+        client.migration_backfill_expire = 30
+
+        assert client.get(b'key') == b'old'
+        assert new_client.sock.send_bufs[-1] == (
+            b'set key 0 30 3 noreply\r\nold\r\n'
+        )
+
+    def test_migration_deletes_from_previous_owner(self):
+        client, old_client, new_client = self.make_migrating_client(
+            [],
+            [b'DELETED\r\n'],
+        )
+
+        assert client.delete(b'key', noreply=False) is True
+        assert old_client.sock.send_bufs == [b'delete key noreply\r\n']
+
+    def test_migration_window_expires(self):
+        client, old_client, new_client = self.make_migrating_client(
+            [b'VALUE key 0 3\r\nold\r\nEND\r\n'],
+            [b'END\r\n'],
+        )
+        client._migration = (client._migration[0], 0)
+
+        assert client.get(b'key') is None
+        assert old_client.sock.send_bufs == []
+        assert client._migration is None
+
+    def test_no_migration_for_constructor_servers(self):
+        client = HashClient([('127.0.0.1', 11012), ('127.0.0.1', 11013)],
+                            migration_window=60)
+
+        assert client._migration is None
+
     # TODO: Test failover logic
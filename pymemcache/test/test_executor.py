@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from pymemcache.executor import CommandExecutor
+
+
+@pytest.mark.unit()
+def test_submit():
+    executor = CommandExecutor(2)
+    try:
+        future = executor.submit(lambda a, b=0: a + b, 1, b=2)
+        assert future.result() == 3
+        stats = executor.stats()
+        assert stats['submitted'] == 1
+        assert stats['completed'] == 1
+        assert stats['queued'] == 0
+        assert stats['running'] == 0
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.unit()
+def test_threads_started_lazily():
+    executor = CommandExecutor(2)
+    assert executor._executor is None
+    executor.submit(lambda: None).result()
+    assert executor._executor is not None
+    executor.shutdown()
+    assert executor._executor is None
+
+
+@pytest.mark.unit()
+def test_exceptions_set_on_future():
+    executor = CommandExecutor(1)
+    try:
+        def fail():
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            executor.submit(fail).result()
+        assert executor.stats()['completed'] == 1
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.unit()
+def test_queue_bounded():
+    executor = CommandExecutor(1, max_queue=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    try:
+        running = executor.submit(block)
+        started.wait()
+        queued = executor.submit(lambda: 1)
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: 2)
+
+        stats = executor.stats()
+        assert stats['running'] == 1
+        assert stats['queued'] == 1
+        assert stats['rejected'] == 1
+
+        release.set()
+        running.result()
+        assert queued.result() == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.unit()
+def test_invalid_max_workers():
+    with pytest.raises(ValueError):
+        CommandExecutor(0)
@@ -0,0 +1,82 @@
+import os
+
+import mock
+import pytest
+
+from pymemcache import fork
+from pymemcache.client.base import Client
+from pymemcache.client.hash import HashClient
+from pymemcache.pool import ObjectPool
+
+from .test_client import MockSocket
+
+
+class Obj(object):
+    pass
+
+
+def make_client():
+    client = Client(('127.0.0.1', 11211))
+    client.sock = MockSocket([])
+    return client
+
+
+def run_in_child(func):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if func() else 1)
+        finally:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status)
+
+
+@pytest.mark.unit()
+def test_client_drops_socket_in_child():
+    client = make_client()
+    sock = client.sock
+
+    assert run_in_child(lambda: client.sock is None and sock.closed) == 0
+    assert client.sock is sock
+    assert not sock.closed
+
+
+@pytest.mark.unit()
+def test_pool_forgets_used_objects_in_child():
+    pool = ObjectPool(Obj)
+    used = pool.get()
+    free = pool.get()
+    pool.release(free)
+
+    assert run_in_child(lambda: pool.used == () and pool.free == (free,)) == 0
+    assert pool.used == (used,)
+
+
+@pytest.mark.unit()
+def test_hash_client_recreates_executor_in_child():
+    client = HashClient([], parallel_workers=2)
+    executor = client._executor
+
+    def check():
+        return (
+            client._executor is not executor and
+            client._executor.submit(lambda: True).result()
+        )
+
+    assert run_in_child(check) == 0
+
+
+@pytest.mark.unit()
+def test_pid_check_without_register_at_fork():
+    with mock.patch.object(fork, 'AT_FORK', False):
+        client = make_client()
+        sock = client.sock
+
+        fork.check(client)
+        assert client.sock is sock
+
+        with mock.patch('os.getpid', return_value=client._pid + 1):
+            fork.check(client)
+        assert client.sock is None
+        assert sock.closed
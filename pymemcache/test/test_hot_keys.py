@@ -0,0 +1,89 @@
+import mock
+import pytest
+
+from pymemcache.client.hot_keys import HotKeyCache
+
+
+def make_cache(**kwargs):
+    kwargs.setdefault('sample_rate', 1)
+    kwargs.setdefault('min_samples', 4)
+    kwargs.setdefault('threshold', 0.5)
+    return HotKeyCache(**kwargs)
+
+
+@pytest.mark.unit()
+def test_detects_hot_key():
+    cache = make_cache()
+    for key in [b'hot', b'hot', b'hot', b'cold']:
+        cache.lookup(key)
+
+    assert cache.is_hot(b'hot')
+    assert not cache.is_hot(b'cold')
+    assert cache.hot_keys() == [(b'hot', 0.75)]
+
+
+@pytest.mark.unit()
+def test_needs_min_samples():
+    cache = make_cache(min_samples=10)
+    for _ in range(5):
+        cache.lookup(b'hot')
+
+    assert not cache.is_hot(b'hot')
+    assert cache.hot_keys() == []
+
+
+@pytest.mark.unit()
+def test_only_stores_hot_keys():
+    cache = make_cache()
+    for key in [b'hot', b'hot', b'hot', b'cold']:
+        cache.lookup(key)
+
+    cache.store_many({b'hot': b'value', b'cold': b'value'})
+    assert cache.lookup(b'hot') == (True, b'value')
+    assert cache.lookup(b'cold') == (False, None)
+
+
+@pytest.mark.unit()
+def test_entries_expire():
+    cache = make_cache(ttl=1)
+    for _ in range(4):
+        cache.lookup(b'hot')
+
+    with mock.patch('time.time', return_value=0):
+        cache.store(b'hot', b'value')
+    with mock.patch('time.time', return_value=2):
+        assert cache.lookup(b'hot') == (False, None)
+
+
+@pytest.mark.unit()
+def test_invalidate():
+    cache = make_cache()
+    for _ in range(4):
+        cache.lookup(b'hot')
+
+    cache.store(b'hot', b'value')
+    cache.invalidate_many([b'hot'])
+    assert cache.lookup(b'hot') == (False, None)
+
+
+@pytest.mark.unit()
+def test_space_saving_evicts_smallest():
+    cache = make_cache(capacity=2)
+    for key in [b'a', b'a', b'b', b'c']:
+        cache.lookup(key)
+
+    assert sorted(cache._counts.items()) == [(b'a', 2), (b'c', 2)]
+
+
+@pytest.mark.unit()
+def test_counts_decay():
+    with mock.patch('time.time', return_value=0):
+        cache = make_cache(decay_interval=10)
+        for key in [b'hot', b'hot', b'hot', b'cold']:
+            cache.lookup(key)
+
+    with mock.patch('time.time', return_value=11):
+        cache.lookup(b'hot')
+
+    assert cache._counts == {b'hot': 2}
+    assert cache._sampled == 3
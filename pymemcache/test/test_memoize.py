@@ -0,0 +1,147 @@
+import socket
+
+import mock
+import pytest
+
+from pymemcache.client.hash import HashClient
+from pymemcache.client.memoize import make_key, memoize, memoize_many
+from pymemcache.exceptions import MemcacheIllegalInputError
+from pymemcache.serde import (
+    ABSENT,
+    python_memcache_deserializer,
+    python_memcache_serializer,
+)
+from pymemcache.test.test_client import MockSocket
+from pymemcache.test.utils import MockMemcacheClient
+
+
+def make_client():
+    return MockMemcacheClient(serializer=python_memcache_serializer,
+                              deserializer=python_memcache_deserializer)
+
+
+@pytest.mark.unit()
+def test_memoize():
+    client = make_client()
+    calls = []
+
+    @memoize(client, expire=60)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert square(3) == 9
+    assert square(4) == 16
+    assert calls == [3, 4]
+    assert square.__name__ == 'square'
+    assert client.get(('%s.square:3' % __name__).encode('ascii')) == 9
+
+
+@pytest.mark.unit()
+def test_memoize_kwargs_and_key_fn():
+    client = make_client()
+    func = mock.Mock(return_value=b'value')
+    cached = memoize(client, prefix='p', key_fn=lambda a, b=0: '%s-%s' % (
+        a, b
+    ))(func)
+
+    assert cached(1, b=2) == b'value'
+    assert cached(1, b=2) == b'value'
+    assert func.call_count == 1
+    assert client.get(b'p:1-2') == b'value'
+
+
+@pytest.mark.unit()
+def test_memoize_none_not_cached():
+    client = make_client()
+    func = mock.Mock(return_value=None)
+    cached = memoize(client, prefix='p')(func)
+    cached(1)
+    cached(1)
+    assert func.call_count == 2
+
+
+@pytest.mark.unit()
+def test_make_key_hashes_invalid_keys():
+    client = make_client()
+    assert make_key(client, 'p', '1,2') == b'p:1,2'
+
+    key = make_key(client, 'p', 'with space')
+    assert key.startswith(b'p:')
+    assert b' ' not in key
+
+    key = make_key(client, 'p', 'x' * 300)
+    assert len(key) == 42
+    assert key == make_key(client, 'p', 'x' * 300)
+
+    with pytest.raises(MemcacheIllegalInputError):
+        make_key(client, 'bad prefix', '1')
+
+
+@pytest.mark.unit()
+def test_memoize_many():
+    client = make_client()
+    client.get_many = mock.Mock(wraps=client.get_many)
+    calls = []
+
+    @memoize_many(client, expire=60, prefix='user')
+    def load(ids, suffix=''):
+        calls.append(list(ids))
+        return dict((id_, id_ * 10 + len(suffix)) for id_ in ids if id_ != 3)
+
+    assert load([1, 2, 3]) == {1: 10, 2: 20}
+    assert load([1, 2, 3, 4]) == {1: 10, 2: 20, 4: 40}
+    assert load([1, 2]) == {1: 10, 2: 20}
+    assert calls == [[1, 2, 3], [3, 4]]
+    assert client.get_many.call_count == 3
+
+    assert load([1], suffix='!') == {1: 11}
+    assert calls[-1] == [1]
+
+
+@pytest.mark.unit()
+def test_memoize_failing_server():
+    client = HashClient([('127.0.0.1', 11211)], ignore_exc=True)
+    client.clients['127.0.0.1:11211'].sock = MockSocket([socket.error()])
+
+    @memoize(client, expire=60)
+    def square(x):
+        return x * x
+
+    assert square(3) == 9
+
+
+@pytest.mark.unit()
+def test_memoize_many_no_servers():
+    client = HashClient([], ignore_exc=True)
+    func = mock.Mock(side_effect=lambda ids: dict((i, i * i) for i in ids))
+    cached = memoize_many(client, prefix='p')(func)
+
+    assert cached([2, 3]) == {2: 4, 3: 9}
+    assert sorted(func.call_args[0][0]) == [2, 3]
+
+
+@pytest.mark.unit()
+def test_memoize_absent_values_are_misses():
+    client = make_client()
+    func = mock.Mock(return_value=b'value')
+    many = mock.Mock(side_effect=lambda ids: dict((i, b'value') for i in ids))
+    cached = memoize(client, prefix='p')(func)
+    cached_many = memoize_many(client, prefix='m')(many)
+    client.set_many({b'p:1': ABSENT, b'm:1': ABSENT})
+
+    assert cached(1) == b'value'
+    assert cached_many([1]) == {1: b'value'}
+    many.assert_called_once_with([1])
+
+
+@pytest.mark.unit()
+def test_memoize_many_caches_false():
+    client = make_client()
+    func = mock.Mock(side_effect=lambda ids: dict((i, False) for i in ids))
+    cached = memoize_many(client, prefix='p')(func)
+
+    assert cached([1]) == {1: False}
+    assert cached([1]) == {1: False}
+    assert func.call_count == 1
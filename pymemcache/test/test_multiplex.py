@@ -0,0 +1,132 @@
+import socket
+
+import pytest
+
+from pymemcache.client.base import Client, _FetchParser, _ReplyParser
+from pymemcache.client import multiplex
+from pymemcache.exceptions import (
+    MemcacheServerError,
+    MemcacheUnexpectedCloseError
+)
+
+
+def make_connected_client(response, **kwargs):
+    client = Client(None, **kwargs)
+    client.sock, server = socket.socketpair()
+    server.sendall(response)
+    return client, server
+
+
+@pytest.mark.unit()
+def test_fetch_parser_incremental():
+    client = Client(None)
+    parser = _FetchParser(client, b'get', {b'key': 'key'}, False)
+    response = b'VALUE key 0 5\r\nvalue\r\nEND\r\n'
+
+    buf = b''
+    for i in range(len(response)):
+        buf = parser.feed(buf + response[i:i + 1])
+        assert parser.done == (i == len(response) - 1)
+
+    assert buf == b''
+    assert parser.result == {'key': b'value'}
+
+
+@pytest.mark.unit()
+def test_fetch_parser_wanted():
+    client = Client(None)
+    parser = _FetchParser(client, b'gets', {b'key': b'key'}, True)
+
+    assert parser.feed(b'VALUE key 0 5 7\r\nval') == b'val'
+    assert parser.wanted == 7
+    assert parser.feed(b'value\r\nEND\r\nextra') == b'extra'
+    assert parser.result == {b'key': (b'value', b'7')}
+
+
+@pytest.mark.unit()
+def test_reply_parser():
+    client = Client(None)
+    parser = _ReplyParser(client, b'delete', [b'a', b'b', b'a'],
+                          lambda line: line == b'DELETED')
+
+    assert parser.feed(b'DELETED\r\nNOT_') == b'NOT_'
+    assert not parser.done
+    assert parser.feed(b'NOT_FOUND\r\nDELETED\r\n') == b''
+    assert parser.done
+    assert parser.result == {b'a': True, b'b': False}
+
+
+@pytest.mark.unit()
+def test_reply_parser_errors():
+    client = Client(None)
+    parser = _ReplyParser(client, b'set', [b'a'], bool)
+
+    with pytest.raises(MemcacheServerError):
+        parser.feed(b'SERVER_ERROR out of memory\r\n')
+
+
+@pytest.mark.unit()
+def test_run_requests():
+    client1, server1 = make_connected_client(
+        b'VALUE key1 0 6\r\nvalue1\r\nEND\r\n'
+    )
+    client2, server2 = make_connected_client(b'END\r\n')
+
+    cmd1, parser1 = client1._prepare_get_many([b'key1'])
+    cmd2, parser2 = client2._prepare_get_many([b'key2'])
+    request1 = multiplex.Request(client1, cmd1, parser1)
+    request2 = multiplex.Request(client2, cmd2, parser2)
+    multiplex.run_requests([request1, request2])
+
+    assert request1.error is None
+    assert request2.error is None
+    assert parser1.result == {b'key1': b'value1'}
+    assert parser2.result == {}
+    assert server1.recv(1024) == b'get key1\r\n'
+    assert server2.recv(1024) == b'get key2\r\n'
+    assert client1.sock.gettimeout() is None
+    assert request1.duration is not None
+    assert request2.duration is not None
+
+
+@pytest.mark.unit()
+def test_run_requests_pipelined_replies():
+    client, server = make_connected_client(
+        b'STORED\r\nNOT_STORED\r\n'
+    )
+    cmd, parser = client._prepare_set_many({b'key': b'value'},
+                                           noreply=False)
+    request = multiplex.Request(client, cmd, parser)
+    multiplex.run_requests([request])
+
+    assert request.error is None
+    assert parser.result is True
+    assert parser.replies == {b'key': True}
+    assert server.recv(1024) == b'set key 0 0 5\r\nvalue\r\n'
+
+
+@pytest.mark.unit()
+def test_run_requests_unexpected_close():
+    client, server = make_connected_client(b'VALUE key 0 5\r\nval')
+    server.close()
+
+    cmd, parser = client._prepare_get_many([b'key'])
+    request = multiplex.Request(client, cmd, parser)
+    multiplex.run_requests([request])
+
+    assert isinstance(request.error, (MemcacheUnexpectedCloseError,
+                                      socket.error))
+    assert client.sock is None
+
+
+@pytest.mark.unit()
+def test_run_requests_timeout():
+    client, server = make_connected_client(b'', timeout=0.01)
+
+    cmd, parser = client._prepare_get_many([b'key'])
+    request = multiplex.Request(client, cmd, parser)
+    multiplex.run_requests([request])
+
+    assert isinstance(request.error, socket.timeout)
+    assert client.sock is None
+    assert request.duration is None
@@ -0,0 +1,130 @@
+import socket
+
+import mock
+import pytest
+
+from pymemcache.client.hash import HashClient
+from pymemcache.client.namespace import Namespace
+from pymemcache.exceptions import MemcacheError
+from pymemcache.serde import (
+    ABSENT,
+    python_memcache_deserializer,
+    python_memcache_serializer,
+)
+from pymemcache.test.test_client import MockSocket
+from pymemcache.test.utils import MockMemcacheClient
+
+
+def make_namespace(**kwargs):
+    client = MockMemcacheClient()
+    client.get_many = mock.Mock(wraps=client.get_many)
+    return Namespace(client, 'tenant', **kwargs), client
+
+
+@pytest.mark.unit()
+def test_set_and_get():
+    with mock.patch('time.time', return_value=1000):
+        namespace, client = make_namespace()
+        namespace.set(b'key', b'value')
+        assert namespace.get(b'key') == b'value'
+        assert namespace.get(b'other', b'default') == b'default'
+        assert client.get(b'tenant') == b'1000000'
+        assert client.get(b'tenant:1000000:key') == b'value'
+
+
+@pytest.mark.unit()
+def test_invalidate():
+    namespace, client = make_namespace()
+    namespace.set_many({b'a': b'1', u'b': b'2'})
+    assert namespace.get_many([b'a', u'b']) == {b'a': b'1', u'b': b'2'}
+
+    generation = namespace.generation()
+    namespace.invalidate()
+    assert namespace.generation() == generation + 1
+    assert namespace.get_many([b'a', u'b']) == {}
+
+
+@pytest.mark.unit()
+def test_other_clients_see_invalidations_after_ttl():
+    with mock.patch('time.time', return_value=1000):
+        namespace, client = make_namespace(generation_ttl=5)
+        other = Namespace(client, 'tenant', generation_ttl=5)
+        namespace.set(b'key', b'value')
+        assert other.get(b'key') == b'value'
+        namespace.invalidate()
+        # still cached
+        assert other.get(b'key') == b'value'
+
+    client.get_many.reset_mock()
+    with mock.patch('time.time', return_value=1006):
+        assert other.get(b'key') is None
+    # one multiget with the generation, one with the new generation
+    assert client.get_many.call_count == 2
+
+
+@pytest.mark.unit()
+def test_generation_fetched_with_keys():
+    with mock.patch('time.time', return_value=1000):
+        namespace, client = make_namespace(generation_ttl=5)
+        namespace.set(b'key', b'value')
+
+    client.get_many.reset_mock()
+    with mock.patch('time.time', return_value=1006):
+        assert namespace.get(b'key') == b'value'
+    client.get_many.assert_called_once_with(
+        [b'tenant', b'tenant:1000000:key']
+    )
+
+
+@pytest.mark.unit()
+def test_counter_evicted():
+    with mock.patch('time.time', return_value=1000):
+        namespace, client = make_namespace()
+        namespace.set(b'key', b'value')
+    client.delete(b'tenant')
+
+    with mock.patch('time.time', return_value=2000):
+        namespace.invalidate()
+        assert namespace.generation() == 2000000
+        assert namespace.get(b'key') is None
+
+
+@pytest.mark.unit()
+def test_invalidate_failing_server():
+    client = HashClient([('127.0.0.1', 11211)], ignore_exc=True)
+    namespace = Namespace(client, 'tenant')
+    namespace._remember(1000000)
+    client.clients['127.0.0.1:11211'].sock = MockSocket([socket.error()])
+
+    with pytest.raises(MemcacheError):
+        namespace.invalidate()
+    assert namespace.key(b'key') == b'tenant:1000000:key'
+
+
+@pytest.mark.unit()
+def test_delete_and_incr():
+    namespace, client = make_namespace()
+    namespace.set(b'count', 1)
+    assert namespace.incr(b'count', 2) == 3
+    assert namespace.decr(b'count', 1) == 2
+    namespace.delete(b'count')
+    assert namespace.get(b'count') is None
+
+
+@pytest.mark.unit()
+def test_absent_values_read_as_misses():
+    client = MockMemcacheClient(serializer=python_memcache_serializer,
+                                deserializer=python_memcache_deserializer)
+    namespace = Namespace(client, 'tenant')
+    namespace.set(b'key', ABSENT)
+    assert namespace.get(b'key', b'default') == b'default'
+    assert namespace.get_many([b'key']) == {}
+
+
+@pytest.mark.unit()
+def test_false_values():
+    client = MockMemcacheClient(serializer=python_memcache_serializer,
+                                deserializer=python_memcache_deserializer)
+    namespace = Namespace(client, 'tenant')
+    namespace.set(b'key', False)
+    assert namespace.get(b'key', b'default') is False
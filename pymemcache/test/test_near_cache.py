@@ -0,0 +1,196 @@
+import mock
+import pytest
+
+from pymemcache.client.near_cache import NearCacheClient
+from pymemcache.serde import (
+    ABSENT,
+    python_memcache_deserializer,
+    python_memcache_serializer,
+)
+from pymemcache.test.utils import MockMemcacheClient
+
+
+def make_client(**kwargs):
+    backend = MockMemcacheClient(serializer=python_memcache_serializer,
+                                 deserializer=python_memcache_deserializer)
+    backend.get = mock.Mock(wraps=backend.get)
+    backend.get_many = mock.Mock(wraps=backend.get_many)
+    return NearCacheClient(backend, **kwargs), backend
+
+
+@pytest.mark.unit()
+def test_get_served_locally():
+    client, backend = make_client()
+    client.set(b'key', b'value')
+    assert client.get(b'key') == b'value'
+    assert client.get(b'key') == b'value'
+    assert backend.get.call_count == 1
+
+    stats = client.near_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+    assert stats['size'] == 1
+    assert stats['bytes'] == 5
+
+
+@pytest.mark.unit()
+def test_misses_not_cached():
+    client, backend = make_client()
+    assert client.get(b'key', b'default') == b'default'
+    assert client.get(b'key') is None
+    assert backend.get.call_count == 2
+
+
+@pytest.mark.unit()
+def test_get_many_fetches_remaining():
+    client, backend = make_client()
+    client.set_many({b'a': b'1', b'b': b'2'})
+    assert client.get(b'a') == b'1'
+
+    result = client.get_many([b'a', b'b', b'c'])
+    assert result == {b'a': b'1', b'b': b'2'}
+    backend.get_many.assert_called_once_with([b'b', b'c'])
+
+    assert client.get_many([b'a', b'b']) == {b'a': b'1', b'b': b'2'}
+    assert backend.get_many.call_count == 1
+
+
+@pytest.mark.unit()
+def test_writes_invalidate():
+    client, backend = make_client()
+    client.set(b'key', b'value')
+    assert client.get(b'key') == b'value'
+
+    client.set(b'key', b'other')
+    assert client.get(b'key') == b'other'
+
+    client.delete(b'key')
+    assert client.get(b'key') is None
+
+    client.set(b'key', b'value')
+    client.get(b'key')
+    client.delete_many([b'key'])
+    assert client.get(b'key') is None
+
+
+@pytest.mark.unit()
+def test_text_keys_share_entries():
+    client, backend = make_client()
+    client.set(b'key', b'value')
+    client.get(b'key')
+    client.invalidate(u'key')
+    assert client.near_cache_stats()['size'] == 0
+
+
+@pytest.mark.unit()
+def test_ttl():
+    client, backend = make_client(ttl=10)
+    client.set(b'key', b'value')
+    with mock.patch('time.time', return_value=1000):
+        client.get(b'key')
+    with mock.patch('time.time', return_value=1009):
+        client.get(b'key')
+    assert backend.get.call_count == 1
+    with mock.patch('time.time', return_value=1011):
+        client.get(b'key')
+    assert backend.get.call_count == 2
+
+
+@pytest.mark.unit()
+def test_per_key_ttl():
+    client, backend = make_client(
+        ttl=lambda key: None if key.startswith(b'live') else 60
+    )
+    client.set_many({b'live': b'1', b'static': b'2'})
+    for _ in range(2):
+        client.get(b'live')
+        client.get(b'static')
+    assert backend.get.call_count == 3
+
+
+@pytest.mark.unit()
+def test_max_items_evicts_lru():
+    client, backend = make_client(max_items=2)
+    client.set_many({b'a': b'1', b'b': b'2', b'c': b'3'})
+    client.get_many([b'a', b'b'])
+    client.get(b'a')
+    client.get(b'c')
+
+    assert list(client._values) == [b'a', b'c']
+    assert client.near_cache_stats()['evictions'] == 1
+
+
+@pytest.mark.unit()
+def test_max_bytes():
+    client, backend = make_client(max_bytes=10)
+    client.set_many({b'a': b'12345', b'b': b'123456', b'c': b'x' * 11})
+    client.get(b'a')
+    client.get(b'b')
+    client.get(b'c')
+
+    assert list(client._values) == [b'b']
+    assert client.near_cache_stats()['bytes'] == 6
+
+
+@pytest.mark.unit()
+def test_flush_all_clears():
+    client, backend = make_client()
+    client.set(b'key', b'value')
+    client.get(b'key')
+    backend.flush_all = mock.Mock()
+    client.flush_all()
+    assert client.near_cache_stats()['size'] == 0
+
+
+@pytest.mark.unit()
+def test_passes_other_methods_through():
+    client, backend = make_client()
+    assert client.server is backend.server
+    client.set(b'key', b'value')
+    assert client.touch(b'key') is True
+
+
+@pytest.mark.unit()
+def test_negative_ttl():
+    client, backend = make_client(negative_ttl=5)
+    with mock.patch('time.time', return_value=1000):
+        assert client.get(b'key', b'default') == b'default'
+        assert client.get(b'key') is None
+        assert backend.get.call_count == 1
+        assert client.get_many([b'key', b'other']) == {}
+        assert client.get_many([b'other']) == {}
+    backend.get_many.assert_called_once_with([b'other'])
+    assert client.near_cache_stats()['hits'] == 3
+
+    backend.get.reset_mock()
+    with mock.patch('time.time', return_value=1006):
+        client.get(b'key')
+    assert backend.get.call_count == 1
+
+
+@pytest.mark.unit()
+def test_negative_ttl_requires_errors():
+    backend = MockMemcacheClient(ignore_exc=True)
+    with pytest.raises(ValueError):
+        NearCacheClient(backend, negative_ttl=5)
+    NearCacheClient(backend)
+
+
+@pytest.mark.unit()
+def test_negative_ttl_invalidated_by_set():
+    client, backend = make_client(negative_ttl=5)
+    assert client.get(b'key') is None
+    client.set(b'key', b'value')
+    assert client.get(b'key') == b'value'
+
+
+@pytest.mark.unit()
+def test_absent_values_read_as_misses():
+    client, backend = make_client()
+    client.set_many({b'a': ABSENT, b'b': b'2'})
+    assert client.get(b'a', b'default') == b'default'
+    assert client.get(b'a') is None
+    assert backend.get.call_count == 1
+    assert client.get_many([b'a', b'b']) == {b'b': b'2'}
+    backend.get_many.assert_called_once_with([b'b'])
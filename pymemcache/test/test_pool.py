@@ -0,0 +1,291 @@
+import threading
+
+import mock
+import pytest
+
+from pymemcache.pool import ObjectPool
+
+
+class Obj(object):
+    pass
+
+
+@pytest.mark.unit()
+def test_get_and_release():
+    pool = ObjectPool(Obj)
+    obj = pool.get()
+    assert pool.used == (obj,)
+    assert pool.free == ()
+
+    pool.release(obj)
+    assert pool.used == ()
+    assert pool.free == (obj,)
+    assert pool.get() is obj
+
+
+@pytest.mark.unit()
+def test_max_size():
+    pool = ObjectPool(Obj, max_size=1)
+    pool.get()
+    with pytest.raises(RuntimeError):
+        pool.get()
+
+
+@pytest.mark.unit()
+def test_max_size_counts_objects_being_taken():
+    pool = ObjectPool(Obj, max_size=1)
+    pool.release(pool.get())
+
+    # another thread popped it from the free objects and didn't mark it
+    # as used yet
+    pool._free_objs.popitem()
+    with pytest.raises(RuntimeError):
+        pool.get()
+
+
+@pytest.mark.unit()
+def test_release_unknown():
+    pool = ObjectPool(Obj)
+    pool.release(Obj())
+    with pytest.raises(ValueError):
+        pool.release(Obj(), silent=False)
+    assert pool.free == ()
+
+
+@pytest.mark.unit()
+def test_destroy():
+    removed = []
+    pool = ObjectPool(Obj, after_remove=removed.append)
+    obj = pool.get()
+    pool.destroy(obj)
+    assert removed == [obj]
+    assert pool.used == ()
+    assert pool.free == ()
+
+
+@pytest.mark.unit()
+def test_get_and_release_destroy_on_fail():
+    removed = []
+    pool = ObjectPool(Obj, after_remove=removed.append)
+    with pytest.raises(ValueError):
+        with pool.get_and_release(destroy_on_fail=True) as obj:
+            raise ValueError()
+    assert removed == [obj]
+
+
+@pytest.mark.unit()
+def test_clear():
+    removed = []
+    pool = ObjectPool(Obj, after_remove=removed.append)
+    used = pool.get()
+    free = pool.get()
+    pool.release(free)
+    pool.clear()
+    assert sorted(map(id, removed)) == sorted([id(used), id(free)])
+    assert pool.used == ()
+    assert pool.free == ()
+
+
+@pytest.mark.unit()
+def test_thread_affinity():
+    pool = ObjectPool(Obj, thread_affinity=True)
+    mine = pool.get()
+    other = []
+    got = threading.Event()
+    released = threading.Event()
+
+    def use_other():
+        other.append(pool.get())
+        got.set()
+        released.wait()
+        pool.release(other[0])
+
+    thread = threading.Thread(target=use_other)
+    thread.start()
+    got.wait()
+    pool.release(mine)
+    released.set()
+    thread.join()
+
+    # the other thread released its object last, but we get ours back
+    assert other[0] is not mine
+    assert pool.get() is mine
+
+
+@pytest.mark.unit()
+def test_acquire_timeout_waits_for_release():
+    pool = ObjectPool(Obj, max_size=1, acquire_timeout=5)
+    obj = pool.get()
+    timer = threading.Timer(0.05, pool.release, (obj,))
+    timer.start()
+
+    assert pool.get() is obj
+    timer.join()
+    assert pool.waits == 1
+    assert 0 < pool.wait_time < 5
+    assert pool.max_wait_time == pool.wait_time
+    assert pool.timeouts == 0
+
+
+@pytest.mark.unit()
+def test_acquire_timeout_waits_for_destroy():
+    pool = ObjectPool(Obj, max_size=1, acquire_timeout=5)
+    obj = pool.get()
+    timer = threading.Timer(0.05, pool.destroy, (obj,))
+    timer.start()
+
+    assert pool.get() is not obj
+    timer.join()
+
+
+@pytest.mark.unit()
+@pytest.mark.parametrize('drop', ['destroy', 'evict'])
+def test_waiters_notified_after_slot_freed(drop):
+    pool = ObjectPool(Obj, max_size=1, max_idle=0)
+    obj = pool.get()
+    free_slots = []
+
+    def notify():
+        # what a waiter woken up now would see
+        free_slots.append(pool._create() is not None)
+
+    with mock.patch.object(pool, '_notify', side_effect=notify):
+        if drop == 'destroy':
+            pool.destroy(obj)
+        else:
+            pool.release(obj)
+    assert free_slots == [True]
+
+
+@pytest.mark.unit()
+def test_acquire_timeout_expires():
+    pool = ObjectPool(Obj, max_size=1, acquire_timeout=0.01)
+    pool.get()
+
+    with pytest.raises(RuntimeError):
+        pool.get()
+    assert pool.waits == 1
+    assert pool.timeouts == 1
+
+
+@pytest.mark.unit()
+def test_min_idle():
+    pool = ObjectPool(Obj, min_idle=2, max_size=3)
+    assert len(pool.free) == 2
+    assert pool.used == ()
+
+
+@pytest.mark.unit()
+def test_min_idle_not_refilled():
+    pool = ObjectPool(Obj, min_idle=1)
+    pool.destroy(pool.get())
+    assert pool.free == ()
+
+
+@pytest.mark.unit()
+def test_idle_timeout_only_reaped_on_use():
+    removed = []
+    with mock.patch('time.time', return_value=0):
+        pool = ObjectPool(Obj, after_remove=removed.append, idle_timeout=10)
+        idle = pool.get()
+        pool.release(idle)
+
+    with mock.patch('time.time', return_value=11):
+        assert pool.free == (idle,)
+        assert removed == []
+        assert pool.get() is not idle
+    assert removed == [idle]
+
+
+@pytest.mark.unit()
+def test_max_idle():
+    removed = []
+    pool = ObjectPool(Obj, after_remove=removed.append, max_idle=1)
+    first = pool.get()
+    second = pool.get()
+    pool.release(first)
+    pool.release(second)
+    assert pool.free == (first,)
+    assert removed == [second]
+
+
+@pytest.mark.unit()
+def test_max_lifetime():
+    removed = []
+    with mock.patch('time.time', return_value=0):
+        pool = ObjectPool(Obj, after_remove=removed.append, max_lifetime=10)
+        old = pool.get()
+        pool.release(old)
+
+    with mock.patch('time.time', return_value=11):
+        new = pool.get()
+        assert new is not old
+        assert removed == [old]
+
+        pool.release(new)
+        assert pool.free == (new,)
+
+
+@pytest.mark.unit()
+def test_max_lifetime_on_release():
+    removed = []
+    with mock.patch('time.time', return_value=0):
+        pool = ObjectPool(Obj, after_remove=removed.append, max_lifetime=10)
+        obj = pool.get()
+
+    with mock.patch('time.time', return_value=11):
+        pool.release(obj)
+    assert removed == [obj]
+    assert pool.free == ()
+
+
+@pytest.mark.unit()
+def test_idle_timeout_keeps_min_idle():
+    removed = []
+    with mock.patch('time.time', return_value=0):
+        pool = ObjectPool(Obj, after_remove=removed.append, min_idle=1,
+                          idle_timeout=10)
+        first = pool.get()
+        second = pool.get()
+        pool.release(first)
+        pool.release(second)
+
+    with mock.patch('time.time', return_value=11):
+        pool.reap()
+    assert removed == [first]
+    assert pool.free == (second,)
+
+
+@pytest.mark.unit()
+def test_idle_timeout_reaped_on_release():
+    removed = []
+    with mock.patch('time.time', return_value=0):
+        pool = ObjectPool(Obj, after_remove=removed.append, idle_timeout=10)
+        idle = pool.get()
+        busy = pool.get()
+        pool.release(idle)
+
+    with mock.patch('time.time', return_value=11):
+        pool.release(busy)
+    assert removed == [idle]
+    assert pool.free == (busy,)
+
+
+@pytest.mark.unit()
+def test_stats():
+    pool = ObjectPool(Obj, max_idle=1)
+    first = pool.get()
+    second = pool.get()
+    pool.release(first)
+    pool.release(second)
+    pool.destroy(pool.get())
+
+    stats = pool.stats()
+    assert stats['used'] == 0
+    assert stats['free'] == 0
+    assert stats['peak_used'] == 2
+    assert stats['acquisitions'] == 3
+    assert stats['creations'] == 2
+    assert stats['destroys'] == 1
+    assert stats['evictions'] == 1
+    assert stats['waits'] == 0
@@ -0,0 +1,319 @@
+import socket
+import threading
+import time
+
+import mock
+import pytest
+
+from pymemcache.client.base import Client
+from pymemcache.client.hash import HashClient
+from pymemcache.client.read_through import _should_recompute
+from pymemcache.exceptions import MemcacheIllegalInputError
+from pymemcache.executor import CommandExecutor
+from pymemcache.serde import (
+    ABSENT,
+    Envelope,
+    EnvelopeSerde,
+    python_memcache_deserializer,
+    python_memcache_serializer,
+)
+from pymemcache.test.test_client import MockSocket
+from pymemcache.test.utils import MockMemcacheClient
+
+
+@pytest.mark.unit()
+def test_get_or_set():
+    client = MockMemcacheClient()
+    loader = mock.Mock(return_value=b'value')
+    assert client.get_or_set(b'key', loader, expire=60) == b'value'
+    assert client.get_or_set(b'key', loader, expire=60) == b'value'
+    assert loader.call_count == 1
+    assert client.get(b'key.lock') is None
+
+
+@pytest.mark.unit()
+def test_get_or_set_releases_lock_on_error():
+    client = MockMemcacheClient()
+    loader = mock.Mock(side_effect=ValueError('boom'))
+    with pytest.raises(ValueError):
+        client.get_or_set(b'key', loader)
+    assert client.get(b'key.lock') is None
+
+
+@pytest.mark.unit()
+def test_get_or_set_waits_for_lock_holder():
+    client = MockMemcacheClient()
+    client.set(b'key.lock', b'1')
+    loader = mock.Mock(return_value=b'mine')
+
+    def sleep(interval):
+        # the holder stores the value while we wait
+        client.set(b'key', b'theirs')
+
+    with mock.patch('time.sleep', side_effect=sleep):
+        assert client.get_or_set(b'key', loader) == b'theirs'
+    assert not loader.called
+
+
+@pytest.mark.unit()
+def test_get_or_set_loads_after_lock_wait():
+    client = MockMemcacheClient()
+    client.set(b'key.lock', b'1')
+    loader = mock.Mock(return_value=b'mine')
+
+    with mock.patch('time.sleep'):
+        assert client.get_or_set(b'key', loader, lock_wait=0) == b'mine'
+    assert loader.call_count == 1
+    # the lock belongs to someone else
+    assert client.get(b'key.lock') == b'1'
+
+
+@pytest.mark.unit()
+def test_get_or_set_xfetch():
+    client = MockMemcacheClient()
+    loader = mock.Mock(side_effect=[b'first', b'second'])
+    assert client.get_or_set(b'key', loader, expire=60, beta=1) == b'first'
+    assert client.get(b'key.xfetch') is not None
+
+    with mock.patch('pymemcache.client.read_through._should_recompute',
+                    return_value=False):
+        assert client.get_or_set(b'key', loader, expire=60,
+                                 beta=1) == b'first'
+    with mock.patch('pymemcache.client.read_through._should_recompute',
+                    return_value=True):
+        assert client.get_or_set(b'key', loader, expire=60,
+                                 beta=1) == b'second'
+
+
+@pytest.mark.unit()
+def test_get_or_set_xfetch_serves_stale_while_locked():
+    client = MockMemcacheClient()
+    client.get_or_set(b'key', lambda: b'old', expire=60, beta=1)
+    client.set(b'key.lock', b'1')
+    loader = mock.Mock(return_value=b'new')
+
+    with mock.patch('pymemcache.client.read_through._should_recompute',
+                    return_value=True):
+        assert client.get_or_set(b'key', loader, expire=60,
+                                 beta=1) == b'old'
+    assert not loader.called
+
+
+@pytest.mark.unit()
+def test_should_recompute():
+    meta = b'1.0 1000.0'
+    with mock.patch('random.random', return_value=0.5):
+        # 1 * log(0.5) is about -0.69
+        assert not _should_recompute(meta, 1, 999.0)
+        assert _should_recompute(meta, 1, 999.5)
+        assert _should_recompute(meta, 2, 999.0)
+    assert not _should_recompute(None, 1, 2000.0)
+    assert not _should_recompute(b'garbage', 1, 2000.0)
+
+
+@pytest.mark.unit()
+def test_get_many_or_set():
+    client = MockMemcacheClient()
+    client.set(b'a', b'1')
+    batch_loader = mock.Mock(return_value={b'b': b'2'})
+
+    result = client.get_many_or_set([b'a', b'b', b'c'], batch_loader,
+                                    expire=60)
+    assert result == {b'a': b'1', b'b': b'2'}
+    batch_loader.assert_called_once_with([b'b', b'c'])
+    assert client.get(b'b') == b'2'
+    assert client.get_many([b'a.lock', b'b.lock', b'c.lock']) == {}
+
+
+@pytest.mark.unit()
+def test_get_many_or_set_waits_for_locked_keys():
+    client = MockMemcacheClient()
+    client.set(b'b.lock', b'1')
+    batch_loader = mock.Mock(side_effect=lambda keys: dict(
+        (key, b'mine') for key in keys
+    ))
+
+    def sleep(interval):
+        client.set(b'b', b'theirs')
+
+    with mock.patch('time.sleep', side_effect=sleep):
+        result = client.get_many_or_set([b'a', b'b'], batch_loader)
+    assert result == {b'a': b'mine', b'b': b'theirs'}
+    batch_loader.assert_called_once_with([b'a'])
+
+
+@pytest.mark.unit()
+def test_get_many_or_set_xfetch():
+    client = MockMemcacheClient()
+    client.get_many_or_set([b'a'], lambda keys: {b'a': b'old'}, expire=60,
+                           beta=1)
+    assert client.get(b'a.xfetch') is not None
+
+    with mock.patch('pymemcache.client.read_through._should_recompute',
+                    return_value=True):
+        result = client.get_many_or_set(
+            [b'a'], lambda keys: {b'a': b'new'}, expire=60, beta=1
+        )
+    assert result == {b'a': b'new'}
+
+
+@pytest.mark.unit()
+def test_get_or_set_failing_server():
+    client = HashClient([('127.0.0.1', 11211)], ignore_exc=True)
+    client.clients['127.0.0.1:11211'].sock = MockSocket([socket.error()])
+    loader = mock.Mock(return_value=b'value')
+
+    assert client.get_or_set(b'key', loader, expire=60) == b'value'
+    assert loader.call_count == 1
+
+
+@pytest.mark.unit()
+def test_get_many_or_set_no_servers():
+    client = HashClient([], ignore_exc=True)
+    batch_loader = mock.Mock(return_value={b'a': b'1'})
+
+    result = client.get_many_or_set([b'a', b'b'], batch_loader, expire=60)
+    assert result == {b'a': b'1'}
+    batch_loader.assert_called_once_with([b'a', b'b'])
+
+
+def make_serde_client():
+    return MockMemcacheClient(serializer=python_memcache_serializer,
+                              deserializer=python_memcache_deserializer)
+
+
+@pytest.mark.unit()
+def test_get_or_set_negative_expire():
+    client = make_serde_client()
+    loader = mock.Mock(return_value=None)
+    assert client.get_or_set(b'key', loader, negative_expire=60) is None
+    assert client.get_or_set(b'key', loader, negative_expire=60) is None
+    assert loader.call_count == 1
+    assert client.get(b'key') is ABSENT
+
+
+@pytest.mark.unit()
+def test_get_or_set_negative_expire_requires_serializer():
+    client = Client(None)
+    client.sock = MockSocket([b'END\r\n', b'STORED\r\n'])
+    loader = mock.Mock(return_value=None)
+
+    with pytest.raises(MemcacheIllegalInputError):
+        client.get_or_set(b'key', loader, negative_expire=60)
+    assert not any(b'ABSENT' in buf for buf in client.sock.send_bufs)
+
+
+@pytest.mark.unit()
+def test_get_or_set_none_not_stored():
+    client = make_serde_client()
+    loader = mock.Mock(return_value=None)
+    client.get_or_set(b'key', loader)
+    client.get_or_set(b'key', loader)
+    assert loader.call_count == 2
+
+
+@pytest.mark.unit()
+def test_get_many_or_set_negative_expire():
+    client = make_serde_client()
+    batch_loader = mock.Mock(return_value={b'a': b'1', b'b': None})
+
+    for _ in range(2):
+        result = client.get_many_or_set([b'a', b'b', b'c'], batch_loader,
+                                        negative_expire=60)
+        assert result == {b'a': b'1'}
+    assert batch_loader.call_count == 1
+    assert client.get(b'c') is ABSENT
+
+
+@pytest.mark.unit()
+def test_get_many_or_set_caches_false():
+    client = make_serde_client()
+    batch_loader = mock.Mock(return_value={b'a': False})
+
+    for _ in range(2):
+        assert client.get_many_or_set([b'a'], batch_loader) == {b'a': False}
+    assert batch_loader.call_count == 1
+
+
+def make_envelope_client(soft_ttl=10):
+    serde = EnvelopeSerde(soft_ttl)
+    return MockMemcacheClient(serializer=serde.serialize,
+                              deserializer=serde.deserialize)
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_loads_missing():
+    client = make_envelope_client()
+    loader = mock.Mock(return_value=b'value')
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'value'
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'value'
+    assert loader.call_count == 1
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_inline():
+    client = make_envelope_client()
+    client.set(b'key', Envelope(b'old', time.time() - 1), expire=60)
+    loader = mock.Mock(return_value=b'new')
+
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'new'
+    assert client.get(b'key').value == b'new'
+    assert not client.get(b'key').stale
+    assert client.get(b'key.lock') is None
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_serves_stale_when_locked():
+    client = make_envelope_client()
+    client.set(b'key', Envelope(b'old', time.time() - 1), expire=60)
+    client.set(b'key.lock', b'1')
+    loader = mock.Mock(return_value=b'new')
+
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'old'
+    assert not loader.called
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_serves_stale_on_error():
+    client = make_envelope_client()
+    client.set(b'key', Envelope(b'old', time.time() - 1), expire=60)
+    loader = mock.Mock(side_effect=ValueError('boom'))
+
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'old'
+    assert client.get(b'key.lock') is None
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_inline_without_pooling():
+    client = HashClient([('127.0.0.1', 11211)])
+    serde = EnvelopeSerde(10)
+    client.clients['127.0.0.1:11211'] = MockMemcacheClient(
+        ('127.0.0.1', 11211), serializer=serde.serialize,
+        deserializer=serde.deserialize
+    )
+    client.set(b'key', Envelope(b'old', time.time() - 1), expire=60)
+    loader = mock.Mock(return_value=b'new')
+
+    assert client.get_or_refresh(b'key', loader, expire=60) == b'new'
+    assert client.get(b'key').value == b'new'
+
+
+@pytest.mark.unit()
+def test_get_or_refresh_in_background():
+    client = make_envelope_client()
+    client.command_executor = CommandExecutor(1)
+    client.set(b'key', Envelope(b'old', time.time() - 1), expire=60)
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.wait()
+        return b'new'
+
+    try:
+        assert client.get_or_refresh(b'key', loader, expire=60) == b'old'
+        refreshed.set()
+        client.command_executor.shutdown()
+        assert client.get(b'key').value == b'new'
+    finally:
+        refreshed.set()
+        client.command_executor.shutdown()
@@ -201,3 +201,72 @@ def test_rendezvous_names():
 
     for i in range(10):
         assert 'a' == rendezvous.get_node(i)
+
+
+@pytest.mark.unit()
+def test_add_node_invalid_weight():
+    rendezvous = RendezvousHash()
+
+    with pytest.raises(ValueError):
+        rendezvous.add_node('1', weight=0)
+
+    assert 0 == len(rendezvous.nodes)
+
+
+@pytest.mark.unit()
+def test_equal_weights_match_unweighted():
+    unweighted = RendezvousHash(nodes=['0', '1', '2'])
+    weighted = RendezvousHash()
+    for node in ['0', '1', '2']:
+        weighted.add_node(node, weight=4)
+
+    for i in range(1000):
+        assert unweighted.get_node(str(i)) == weighted.get_node(str(i))
+
+
+@pytest.mark.unit()
+def test_weighted_placement():
+    rendezvous = RendezvousHash()
+    rendezvous.add_node('small', weight=1)
+    rendezvous.add_node('large', weight=4)
+
+    placements = {'small': 0, 'large': 0}
+    for i in range(10000):
+        placements[rendezvous.get_node(str(i))] += 1
+
+    ratio = placements['large'] / float(placements['small'])
+    assert 3.5 < ratio < 4.5
+
+
+@pytest.mark.unit()
+def test_weighted_remove_node():
+    rendezvous = RendezvousHash()
+    rendezvous.add_node('0', weight=1)
+    rendezvous.add_node('1', weight=2)
+    rendezvous.remove_node('1')
+
+    assert {'0': 1} == rendezvous.weights
+    assert '0' == rendezvous.get_node('ok')
+
+
+@pytest.mark.unit()
+def test_get_nodes():
+    nodes = ['0', '1', '2']
+    rendezvous = RendezvousHash(nodes=nodes)
+
+    for i in range(100):
+        replicas = rendezvous.get_nodes(str(i), 2)
+        assert 2 == len(replicas)
+        assert replicas[0] == rendezvous.get_node(str(i))
+        assert replicas[0] != replicas[1]
+
+    assert 3 == len(rendezvous.get_nodes('ok', 5))
+    assert [] == RendezvousHash().get_nodes('ok', 2)
+
+
+@pytest.mark.unit()
+def test_get_nodes_collision():
+    nodes = ['c', 'b', 'a']
+    rendezvous = RendezvousHash(nodes, hash_function=collide)
+
+    assert ['c', 'b'] == rendezvous.get_nodes('ok', 2)
@@ -3,7 +3,11 @@ from unittest import TestCase
 
 from pymemcache.serde import (python_memcache_serializer,
                               python_memcache_deserializer, FLAG_BYTES,
-                              FLAG_PICKLE, FLAG_INTEGER, FLAG_LONG, FLAG_TEXT)
+                              FLAG_PICKLE, FLAG_INTEGER, FLAG_LONG, FLAG_TEXT,
+                              FLAG_ENVELOPE, FLAG_ABSENT, ABSENT, Envelope,
+                              EnvelopeSerde)
+from six.moves import cPickle as pickle
+import mock
 import pytest
 import six
 
@@ -59,3 +63,42 @@ class TestSerde(TestCase):
     def test_subtype(self):
         # Subclass of a native type will be restored as the same type
         self.check(CustomInt(123123), FLAG_PICKLE)
+
+
+@pytest.mark.unit()
+def test_envelope_serde():
+    serde = EnvelopeSerde(10)
+    with mock.patch('time.time', return_value=1000):
+        value, flags = serde.serialize(b'key', {'a': 1})
+    assert flags == FLAG_PICKLE | FLAG_ENVELOPE
+
+    envelope = serde.deserialize(b'key', value, flags)
+    assert envelope.value == {'a': 1}
+    assert envelope.soft_expiry == 1010
+    with mock.patch('time.time', return_value=1009):
+        assert not envelope.stale
+    with mock.patch('time.time', return_value=1010):
+        assert envelope.stale
+
+
+@pytest.mark.unit()
+def test_envelope_serde_explicit_expiry():
+    serde = EnvelopeSerde(10)
+    value, flags = serde.serialize(b'key', Envelope(42, 123.5))
+    envelope = serde.deserialize(b'key', value, flags)
+    assert envelope.value == 42
+    assert envelope.soft_expiry == 123.5
+
+
+@pytest.mark.unit()
+def test_envelope_serde_plain_values():
+    serde = EnvelopeSerde(10)
+    assert serde.deserialize(b'key', b'value', FLAG_BYTES) == b'value'
+
+
+@pytest.mark.unit()
+def test_absent():
+    value, flags = python_memcache_serializer(b'key', ABSENT)
+    assert (value, flags) == (b'', FLAG_ABSENT)
+    assert python_memcache_deserializer(b'key', value, flags) is ABSENT
+    assert pickle.loads(pickle.dumps(ABSENT)) is ABSENT
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from pymemcache.client.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, func, count):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+@pytest.mark.unit()
+def test_concurrent_calls_share_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'value'
+
+    leader, leader_results, _ = run_concurrently(flight, 'key', func, 1)
+    started.wait()
+    followers, results, _ = run_concurrently(flight, 'key', func, 4)
+    while flight.shared < 4:
+        pass
+    release.set()
+    for thread in leader + followers:
+        thread.join()
+
+    assert leader_results == ['value']
+    assert results == ['value'] * 4
+    assert calls == [1]
+    assert flight.calls == 1
+    assert flight.shared == 4
+
+
+@pytest.mark.unit()
+def test_exception_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def func():
+        started.set()
+        release.wait()
+        raise ValueError('boom')
+
+    leader, _, leader_errors = run_concurrently(flight, 'key', func, 1)
+    started.wait()
+    follower, _, follower_errors = run_concurrently(flight, 'key', func, 1)
+    while flight.shared < 1:
+        pass
+    release.set()
+    for thread in leader + follower:
+        thread.join()
+
+    assert isinstance(leader_errors[0], ValueError)
+    assert isinstance(follower_errors[0], ValueError)
+
+
+@pytest.mark.unit()
+def test_sequential_calls_not_cached():
+    flight = SingleFlight()
+    values = iter([1, 2])
+    assert flight.do('key', lambda: next(values)) == 1
+    assert flight.do('key', lambda: next(values)) == 2
+    assert flight.calls == 2
+    assert flight.shared == 0
+
+
+@pytest.mark.unit()
+def test_different_keys_not_shared():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 'a') == 'a'
+    assert flight.do('b', lambda: 'b') == 'b'
+    assert flight._flights == {}
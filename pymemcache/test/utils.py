@@ -9,10 +9,12 @@ import time
 
 import six
 
+from pymemcache.client.base import _check_key
+from pymemcache.client.read_through import ReadThroughMixin
 from pymemcache.exceptions import MemcacheIllegalInputError
 
 
-class MockMemcacheClient(object):
+class MockMemcacheClient(ReadThroughMixin):
     """
     A (partial) in-memory mock for Clients.
 
@@ -42,6 +44,10 @@ class MockMemcacheClient(object):
         self.no_delay = no_delay
         self.ignore_exc = ignore_exc
 
+    def check_key(self, key):
+        """Checks key and add key_prefix."""
+        return _check_key(key, allow_unicode_keys=self.allow_unicode_keys)
+
     def get(self, key, default=None):
         if not self.allow_unicode_keys:
             if isinstance(key, six.text_type):
@@ -113,15 +119,30 @@ class MockMemcacheClient(object):
         current = self.get(key)
         present = current is not None
         if present:
-            self.set(key, current + value, noreply=noreply)
+            # counters stored as bytes, like memcached's, stay bytes
+            if isinstance(current, six.binary_type):
+                current = int(current)
+                self.set(key, str(current + value).encode('ascii'),
+                         noreply=noreply)
+            else:
+                self.set(key, current + value, noreply=noreply)
         return None if noreply or not present else current + value
 
+    def incr_many(self, values, noreply=False):
+        return dict((key, self.incr(key, value, noreply))
+                    for key, value in six.iteritems(values))
+
     def decr(self, key, value, noreply=False):
         current = self.get(key)
         if current is None:
             return
 
-        self.set(key, current - value, noreply=noreply)
+        if isinstance(current, six.binary_type):
+            current = int(current)
+            self.set(key, str(current - value).encode('ascii'),
+                     noreply=noreply)
+        else:
+            self.set(key, current - value, noreply=noreply)
         return current - value
 
     def add(self, key, value, expire=None, noreply=True):
@@ -143,6 +164,16 @@ class MockMemcacheClient(object):
 
     delete_multi = delete_many
 
+    def touch(self, key, expire=0, noreply=True):
+        current = self.get(key)
+        present = current is not None
+        if present:
+            self.set(key, current, expire, noreply)
+        return noreply or present
+
+    def touch_many(self, keys, expire=0, noreply=True):
+        return dict((key, self.touch(key, expire, noreply)) for key in keys)
+
     def stats(self):
         # I make no claim that these values make any sense, but the format
         # of the output is the same as for pymemcache.client.Client.stats()